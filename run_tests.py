@@ -0,0 +1,145 @@
+"""
+Параллельный запуск проверок обоих проектов.
+
+flake8, structure_test.py и тесты ya_news и ya_note запускаются
+одновременно в отдельных процессах. Каждый набор тестов делится на шарды
+по числу ядер; у каждого процесса pytest своя тестовая SQLite-база
+(in-memory базы не разделяются между процессами), поэтому шарды
+не мешают друг другу. Результаты собираются в порядке приоритета
+старого run_tests.sh, код возврата — первой упавшей проверки.
+"""
+import argparse
+import os
+import shutil
+import subprocess
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+BASE_DIR = Path(__file__).resolve().parent
+
+PROJECTS = {
+    'ya_news': ('yanews.settings', ' При запуске упали ваши тесты для '
+                'проекта YaNews. Проверьте тесты этого проекта '),
+    'ya_note': ('yanote.settings', ' При запуске упали ваши тесты для '
+                'проекта YaNote. Проверьте тесты этого проекта '),
+}
+FLAKE8_OK = ' flake8 завершил проверку кода, ошибок не обнаружено '
+FLAKE8_FAIL = (' flake8 обнаружил отклонения от стандартов, приведите код '
+               'в соответствие с PEP8 ')
+STRUCTURE_FAIL = (' Убедитесь, что написанные вами тесты скопированы '
+                  'в указанные в ТЗ директории ')
+
+
+def print_message(message, symbol='=', error=False):
+    """Печатает сообщение по центру строки во всю ширину терминала."""
+    width = shutil.get_terminal_size().columns
+    color = '\033[0;31m' if error else '\033[0;32m'
+    print(f'{color}{message.center(width, symbol)}\033[0m', file=sys.stderr)
+
+
+def run(args, cwd=BASE_DIR, env=None):
+    result = subprocess.run(
+        [sys.executable, *args],
+        cwd=cwd,
+        env=env,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.STDOUT,
+        text=True,
+    )
+    return result.returncode, result.stdout
+
+
+def project_env(project):
+    """
+    Окружение pytest проекта. Как в старом run_tests.sh, заданный заранее
+    DJANGO_SETTINGS_MODULE действует на ya_news, а ya_note всегда
+    запускается со своими настройками.
+    """
+    env = dict(os.environ)
+    if project != 'ya_news':
+        env.pop('DJANGO_SETTINGS_MODULE', None)
+    env.setdefault('DJANGO_SETTINGS_MODULE', PROJECTS[project][0])
+    return env
+
+
+def collect(project):
+    """Собирает идентификаторы тестов проекта."""
+    # -qqq перекрывает -vv из addopts в pytest.ini: нужен плоский список.
+    code, output = run(
+        ['-m', 'pytest', '--collect-only', '-qqq'],
+        cwd=BASE_DIR / project,
+        env=project_env(project),
+    )
+    node_ids = [line for line in output.splitlines() if '::' in line]
+    if code or not node_ids:
+        return None, output
+    return node_ids, output
+
+
+def split(node_ids, shards):
+    return [chunk for chunk in (node_ids[i::shards] for i in range(shards))
+            if chunk]
+
+
+def run_project(project, shards, pool):
+    """Запускает шарды проекта и возвращает (код, вывод упавших шардов)."""
+    node_ids, output = collect(project)
+    if node_ids is None:
+        return 1, output
+    futures = [
+        pool.submit(
+            run,
+            ['-m', 'pytest', '--tb=line', *chunk],
+            BASE_DIR / project,
+            project_env(project),
+        )
+        for chunk in split(node_ids, shards)
+    ]
+    status, failed = 0, []
+    for future in futures:
+        code, shard_output = future.result()
+        if code:
+            status = status or code
+            failed.append(shard_output)
+    return status, ''.join(failed)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip())
+    parser.add_argument(
+        '-n', '--workers', type=int, default=os.cpu_count() or 1,
+        help='Число процессов pytest на каждый проект.'
+    )
+    args = parser.parse_args()
+    shards = max(1, args.workers)
+    # Шардам нужен свободный поток, пока поток проекта ждёт их результатов.
+    with ThreadPoolExecutor(len(PROJECTS) * (shards + 1) + 2) as pool:
+        flake8 = pool.submit(run, ['-m', 'flake8', '--config=setup.cfg'])
+        structure = pool.submit(run, ['structure_test.py'])
+        projects = {
+            project: pool.submit(run_project, project, shards, pool)
+            for project in PROJECTS
+        }
+        code, output = flake8.result()
+        if code:
+            sys.stderr.write(output)
+            print_message(FLAKE8_FAIL, error=True)
+            return code
+        print_message(FLAKE8_OK)
+        code, output = structure.result()
+        if code:
+            sys.stderr.write(output)
+            print_message(STRUCTURE_FAIL, error=True)
+            return code
+        for project, future in projects.items():
+            code, output = future.result()
+            if code:
+                sys.stderr.write(output)
+                print_message(PROJECTS[project][1], error=True)
+                return code
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
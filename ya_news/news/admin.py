@@ -1,15 +1,137 @@
 from django.contrib import admin
+from django.contrib.auth import get_user_model
+from django.contrib.auth.admin import UserAdmin
+from django.core.paginator import Paginator
+from django.db.models import Count
+from django.forms.models import BaseInlineFormSet
+from django.http import QueryDict
 
-from .models import Comment, News
+from . import purge
+from .models import Comment, News, UserPurge
+
+COMMENTS_PAGE_VAR = 'comments_page'
+
+
+class CommentPageFormSet(BaseInlineFormSet):
+    """Формсет только для одной страницы комментариев новости."""
+    per_page = 20
+    page_number = 1
+    params = QueryDict()
+
+    def get_queryset(self):
+        if not hasattr(self, '_queryset'):
+            # pk различает комментарии с одинаковым created, иначе
+            # соседние страницы могут повторять и терять строки.
+            comments = super().get_queryset().select_related(
+                'author'
+            ).order_by('created', 'pk')
+            self.page = Paginator(comments, self.per_page).get_page(
+                self.page_number
+            )
+            self._queryset = self.page.object_list
+        return self._queryset
+
+    def page_query(self, number):
+        """Строка запроса страницы с остальными параметрами адреса."""
+        params = self.params.copy()
+        params[self.page_var] = number
+        return params.urlencode()
+
+    @property
+    def previous_query(self):
+        return self.page_query(self.page.previous_page_number())
+
+    @property
+    def next_query(self):
+        return self.page_query(self.page.next_page_number())
 
 
 class CommentInline(admin.StackedInline):
+    """
+    Комментарии новости постранично.
+
+    У популярной новости десятки тысяч комментариев, поэтому в форму
+    попадает одна страница, а автор показывается без выпадающего списка
+    всех пользователей. Комментарии пишут читатели на сайте, поэтому
+    добавлять их из админки нельзя.
+    """
     model = Comment
+    formset = CommentPageFormSet
+    template = 'admin/news/comment_inline.html'
+    fields = ('author', 'created', 'text')
+    readonly_fields = ('author', 'created')
     extra = 0
 
+    def has_add_permission(self, request, obj=None):
+        return False
+
+    def get_formset(self, request, obj=None, **kwargs):
+        formset = super().get_formset(request, obj, **kwargs)
+        formset.page_number = request.GET.get(COMMENTS_PAGE_VAR, 1)
+        formset.page_var = COMMENTS_PAGE_VAR
+        formset.params = request.GET
+        return formset
+
 
 @admin.register(News)
 class NewsAdmin(admin.ModelAdmin):
+    list_display = ('title', 'date', 'comments_count')
+    show_full_result_count = False
     inlines = [
         CommentInline,
     ]
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).annotate(
+            comments_count=Count('comment')
+        )
+
+    @admin.display(description='Комментариев', ordering='comments_count')
+    def comments_count(self, obj):
+        return obj.comments_count
+
+
+@admin.register(Comment)
+class CommentAdmin(admin.ModelAdmin):
+    list_display = ('__str__', 'news', 'author', 'created')
+    list_select_related = ('news', 'author')
+    raw_id_fields = ('news', 'author')
+    show_full_result_count = False
+
+
+class PurgingUserAdmin(UserAdmin):
+    """
+    Удаление пользователя ставит его в очередь purge_users.
+
+    Комментарии удаляются фоновым заданием пачками, поэтому страница
+    подтверждения их не перечисляет и не загружает.
+    """
+
+    def get_deleted_objects(self, objs, request):
+        perms_needed = set()
+        if not self.has_delete_permission(request):
+            perms_needed.add(self.opts.verbose_name)
+        return (
+            [str(obj) for obj in objs],
+            {self.opts.verbose_name_plural: len(objs)},
+            perms_needed,
+            [],
+        )
+
+    def delete_model(self, request, obj):
+        purge.schedule([obj])
+
+    def delete_queryset(self, request, queryset):
+        purge.schedule(queryset)
+
+
+admin.site.unregister(get_user_model())
+admin.site.register(get_user_model(), PurgingUserAdmin)
+
+
+@admin.register(UserPurge)
+class UserPurgeAdmin(admin.ModelAdmin):
+    list_display = ('username', 'created', 'deleted', 'finished')
+    readonly_fields = (
+        'user_id', 'username', 'created', 'last_pk', 'deleted', 'finished'
+    )
@@ -0,0 +1,41 @@
+from django.conf import settings
+from django.contrib.auth.backends import ModelBackend
+from django.core.cache import caches
+
+USER_CACHE_KEY = 'auth:user:{}'
+
+
+def user_cache_key(user_id):
+    return USER_CACHE_KEY.format(user_id)
+
+
+def user_cache():
+    return caches[settings.USER_CACHE_ALIAS]
+
+
+def forget_user(user_id):
+    """Сбрасываем закэшированного пользователя во всех процессах."""
+    user_cache().delete(user_cache_key(user_id))
+
+
+class CachedModelBackend(ModelBackend):
+    """
+    ModelBackend, который кэширует пользователя между запросами.
+
+    Вместе с кэширующим движком сессий убирает из каждого запроса
+    авторизованного пользователя выборки из django_session и auth_user.
+    Кэш USER_CACHE_ALIAS общий для рабочих процессов и сбрасывается
+    при сохранении пользователя, смене пароля и выходе из системы.
+    QuerySet.update() сигналов не шлёт: после массовой правки
+    пользователей вызывайте forget_user().
+    """
+
+    def get_user(self, user_id):
+        key = user_cache_key(user_id)
+        cache = user_cache()
+        user = cache.get(key)
+        if user is None:
+            user = super().get_user(user_id)
+            if user is not None:
+                cache.set(key, user, settings.USER_CACHE_TIMEOUT)
+        return user
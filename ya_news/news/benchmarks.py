@@ -0,0 +1,40 @@
+"""Общие помощники для команд bench_*."""
+import shutil
+import tempfile
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+from django.db import connections
+
+from yanews import testdb
+
+
+@contextmanager
+def scratch_database(alias='default'):
+    """
+    Временная файловая база со схемой из снимка тестовой БД.
+
+    Бенчмарки не трогают рабочую базу и не прогоняют миграции.
+    """
+    connection = connections[alias]
+    template, _ = testdb.snapshot(alias)
+    old_name = connection.settings_dict['NAME']
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = Path(tmp_dir, 'bench.sqlite3')
+        shutil.copyfile(template, path)
+        connection.close()
+        connection.settings_dict['NAME'] = str(path)
+        try:
+            yield path
+        finally:
+            connection.close()
+            connection.settings_dict['NAME'] = old_name
+
+
+@contextmanager
+def timer(results, name):
+    """Записывает в results[name] время выполнения блока в секундах."""
+    started = time.perf_counter()
+    yield
+    results[name] = time.perf_counter() - started
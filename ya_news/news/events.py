@@ -0,0 +1,229 @@
+"""
+Живая лента комментариев новости (Server-Sent Events).
+
+Изменение комментария превращается в одно готовое SSE-сообщение, которое
+брокер раскладывает по очередям всех подписчиков новости: база данных
+не опрашивается ни одним из них. Брокер задаётся настройкой
+NEWS_EVENTS_BROKER: InProcessBroker работает внутри одного процесса,
+SocketBroker дополнительно пересылает события соседним процессам через
+Unix-сокеты в NEWS_EVENTS_SOCKET_DIR.
+"""
+import asyncio
+import json
+import os
+import re
+import socket
+import threading
+from collections import defaultdict
+from pathlib import Path
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import close_old_connections
+from django.utils.module_loading import import_string
+
+from .models import News
+
+EVENTS_PATH = re.compile(r'^/news/(?P<pk>\d+)/events/$')
+# Текст в событии обрезается: 4000 символов UTF-8 — не больше 16 КиБ,
+# так что событие всегда помещается в датаграмму SocketBroker.
+TEXT_LIMIT = 4000
+MAX_PACKET = 1 << 16
+
+
+def comment_event(kind, comment):
+    """SSE-сообщение об изменении комментария: created, updated, deleted."""
+    data = {'id': comment.pk, 'news': comment.news_id}
+    if kind != 'deleted':
+        text = comment.text
+        if len(text) > TEXT_LIMIT:
+            text = text[:TEXT_LIMIT - 1] + '…'
+        data.update(
+            author=str(comment.author),
+            author_id=comment.author_id,
+            text=text,
+            created=comment.created.isoformat(),
+        )
+    return (
+        f'event: {kind}\n'
+        f'data: {json.dumps(data, ensure_ascii=False)}\n\n'
+    ).encode()
+
+
+class Subscription:
+
+    def __init__(self, news_id, loop):
+        self.news_id = news_id
+        self.loop = loop
+        self.queue = asyncio.Queue()
+        self.overflowed = False
+
+
+class InProcessBroker:
+    """Раздаёт события подписчикам текущего процесса."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscribers = defaultdict(set)
+
+    def subscribe(self, news_id):
+        subscription = Subscription(news_id, asyncio.get_running_loop())
+        with self._lock:
+            self._subscribers[news_id].add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            subscribers = self._subscribers[subscription.news_id]
+            subscribers.discard(subscription)
+            if not subscribers:
+                del self._subscribers[subscription.news_id]
+
+    def publish(self, news_id, message):
+        """Потокобезопасно: один вызов на цикл событий, а не на подписчика."""
+        by_loop = defaultdict(list)
+        with self._lock:
+            for subscription in self._subscribers.get(news_id, ()):
+                by_loop[subscription.loop].append(subscription)
+        for loop, subscriptions in by_loop.items():
+            loop.call_soon_threadsafe(self._deliver, subscriptions, message)
+
+    @staticmethod
+    def _deliver(subscriptions, message):
+        for subscription in subscriptions:
+            if subscription.overflowed:
+                continue
+            if subscription.queue.qsize() >= settings.NEWS_EVENTS_QUEUE_SIZE:
+                # Медленный клиент: закрываем поток, браузер переподключится.
+                subscription.overflowed = True
+                subscription.queue.put_nowait(None)
+            else:
+                subscription.queue.put_nowait(message)
+
+
+class SocketBroker(InProcessBroker):
+    """
+    Локальная замена внешнего брокера для нескольких процессов.
+
+    Каждый процесс слушает свой датаграммный Unix-сокет в общем каталоге;
+    публикация рассылает событие во все сокеты, включая собственный.
+    Пакет больше MAX_PACKET доходит только до подписчиков своего
+    процесса: публикация идёт в on_commit и не должна падать.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.directory = Path(settings.NEWS_EVENTS_SOCKET_DIR)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        address = self.directory / f'{os.getpid()}.sock'
+        address.unlink(missing_ok=True)
+        self._receiver = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        self._receiver.bind(str(address))
+        self._sender = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        threading.Thread(target=self._listen, daemon=True).start()
+
+    def publish(self, news_id, message):
+        packet = f'{news_id}\n'.encode() + message
+        if len(packet) > MAX_PACKET:
+            super().publish(news_id, message)
+            return
+        for path in self.directory.glob('*.sock'):
+            try:
+                self._sender.sendto(packet, str(path))
+            except (ConnectionRefusedError, FileNotFoundError):
+                # Процесс завершился и не убрал за собой сокет.
+                path.unlink(missing_ok=True)
+            except OSError:
+                # Переполненный буфер соседа: событие для него теряется,
+                # как при переполнении очереди подписчика.
+                continue
+
+    def _listen(self):
+        while True:
+            packet = self._receiver.recv(MAX_PACKET)
+            try:
+                news_id, message = packet.split(b'\n', 1)
+                news_id = int(news_id)
+            except ValueError:
+                # Чужой или обрезанный пакет не должен останавливать приём.
+                continue
+            super().publish(news_id, message)
+
+
+_broker = None
+
+
+def get_broker():
+    """Брокер текущего процесса; после fork создаётся заново."""
+    global _broker
+    if _broker is None or _broker[0] != os.getpid():
+        _broker = (os.getpid(), import_string(settings.NEWS_EVENTS_BROKER)())
+    return _broker[1]
+
+
+async def wait_for_disconnect(receive):
+    while (await receive())['type'] != 'http.disconnect':
+        pass
+
+
+async def stream(send, subscription):
+    await send({
+        'type': 'http.response.start',
+        'status': 200,
+        'headers': [
+            (b'content-type', b'text/event-stream; charset=utf-8'),
+            (b'cache-control', b'no-cache'),
+            (b'x-accel-buffering', b'no'),
+        ],
+    })
+    while True:
+        try:
+            message = await asyncio.wait_for(
+                subscription.queue.get(), settings.NEWS_EVENTS_KEEPALIVE
+            )
+        except asyncio.TimeoutError:
+            message = b': keepalive\n\n'
+        if message is None:
+            break
+        await send({
+            'type': 'http.response.body', 'body': message, 'more_body': True
+        })
+    await send({'type': 'http.response.body', 'body': b''})
+
+
+def news_exists(news_id):
+    """
+    Проверка в потоке sync_to_async. Запрос идёт в обход Django,
+    поэтому соединения с базой закрываются здесь, как по request_finished.
+    """
+    close_old_connections()
+    try:
+        return News.objects.filter(pk=news_id).exists()
+    finally:
+        close_old_connections()
+
+
+async def events_app(scope, receive, send):
+    """ASGI-приложение для /news/<pk>/events/."""
+    news_id = int(EVENTS_PATH.match(scope['path'])['pk'])
+    exists = await sync_to_async(news_exists)(news_id)
+    if not exists:
+        await send({
+            'type': 'http.response.start',
+            'status': 404,
+            'headers': [(b'content-type', b'text/plain')],
+        })
+        await send({'type': 'http.response.body', 'body': b'Not Found'})
+        return
+    broker = get_broker()
+    subscription = broker.subscribe(news_id)
+    disconnect = asyncio.ensure_future(wait_for_disconnect(receive))
+    streaming = asyncio.ensure_future(stream(send, subscription))
+    try:
+        await asyncio.wait(
+            {disconnect, streaming}, return_when=asyncio.FIRST_COMPLETED
+        )
+    finally:
+        broker.unsubscribe(subscription)
+        for task in (disconnect, streaming):
+            task.cancel()
@@ -0,0 +1,71 @@
+"""
+Массовое создание данных для тестов.
+
+Все объекты создаются через bulk_create с явными датами, поэтому
+функции годятся и для pytest-фикстур, и для TestCase.setUpTestData.
+SQLite не возвращает первичные ключи из bulk_create, поэтому
+пользователи и новости перечитываются одним запросом.
+"""
+from collections import namedtuple
+from datetime import date, datetime, time, timedelta
+from itertools import cycle
+
+from django.contrib.auth import get_user_model
+from django.utils import timezone
+
+from .models import Comment, CommentBucket, News, NewsMonth, make_excerpt
+
+User = get_user_model()
+
+Dataset = namedtuple('Dataset', ('users', 'news', 'comments_count'))
+
+
+def make_users(count, prefix='Пользователь'):
+    names = [f'{prefix} {index}' for index in range(count)]
+    User.objects.bulk_create(User(username=name) for name in names)
+    return list(User.objects.filter(username__in=names).order_by('pk'))
+
+
+def make_news(count, start=None, prefix='News number', text='News text'):
+    """Новости на `count` дней назад от `start`, от новых к старым."""
+    start = start or date.today()
+    titles = [f'{prefix} {index}' for index in range(count)]
+    dates = [start - timedelta(days=index) for index in range(count)]
+    News.objects.bulk_create(
+        News(title=title, text=text, excerpt=make_excerpt(text), date=day)
+        for title, day in zip(titles, dates)
+    )
+    NewsMonth.objects.add(dates)
+    return list(News.objects.filter(title__in=titles))
+
+
+def make_comments(news, authors, per_news, start=None):
+    """По `per_news` комментариев к каждой новости с шагом в день."""
+    start = start or timezone.now()
+    authors = cycle(authors)
+    comments = Comment.objects.bulk_create(
+        Comment(
+            news=item,
+            author=next(authors),
+            text=f'Comment text {index}',
+            created=start + timedelta(days=index),
+        )
+        for item in news
+        for index in range(per_news)
+    )
+    CommentBucket.objects.add(comments)
+    return comments
+
+
+def make_dataset(users=10, news=50, comments_per_news=20, start=None):
+    """
+    Граф пользователей, новостей и комментариев за несколько запросов.
+    Комментарии пишутся начиная с дня `start`.
+    """
+    start = start or date.today()
+    authors = make_users(users, prefix='Читатель')
+    items = make_news(news, start=start, prefix='Архивная новость')
+    make_comments(items, authors, comments_per_news, start=timezone.make_aware(
+        datetime.combine(start, time())
+    ))
+    return Dataset(authors, items, news * comments_per_news)
@@ -0,0 +1,225 @@
+"""
+Ленты для агрегаторов: JSON Feed, RSS и Atom.
+
+Лента последних новостей и лента комментариев каждой новости
+сериализуются во все форматы сразу, одним чтением базы, и хранятся
+в кэше FEED_CACHE_ALIAS вместе с ETag под ключом с версией ленты.
+Сигналы News и Comment, очередь комментариев и purge_users повышают
+версию; кэш общий для всех процессов, поэтому изменение из любого
+рабочего процесса или команды сбрасывает ленту во всех. В устойчивом
+состоянии запрос ленты читает из кэша только версию и готовое тело.
+Новое имя автора комментария попадёт в ленту при следующем её изменении.
+"""
+import hashlib
+import json
+import time as clock
+from datetime import datetime, time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.urls import reverse
+from django.utils import feedgenerator, timezone
+
+from .models import News
+
+NEWS_VERSION_KEY = 'feeds:news:version'
+# Отметка в кэше для ленты несуществующей новости.
+MISSING = False
+GENERATORS = {
+    'rss': feedgenerator.Rss201rev2Feed,
+    'atom': feedgenerator.Atom1Feed,
+}
+CONTENT_TYPES = {
+    'json': 'application/feed+json; charset=utf-8',
+    'rss': feedgenerator.Rss201rev2Feed.content_type,
+    'atom': feedgenerator.Atom1Feed.content_type,
+}
+
+
+def comments_version_key(news_id):
+    return f'feeds:comments:{news_id}:version'
+
+
+def feed_cache():
+    return caches[settings.FEED_CACHE_ALIAS]
+
+
+def bump(key):
+    try:
+        feed_cache().incr(key)
+    except ValueError:
+        current_version(key)
+
+
+def current_version(key):
+    """
+    Версия ленты. Вытесненная из кэша версия заводится заново от часов,
+    а не с нуля: иначе она совпала бы с одной из прежних, и под ней
+    могло бы остаться устаревшее тело.
+    """
+    cache = feed_cache()
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, clock.time_ns(), None)
+        version = cache.get(key)
+    return version
+
+
+def forget_news(news_id):
+    """Сбрасывает ленту новостей и ленту комментариев новости."""
+    bump(NEWS_VERSION_KEY)
+    bump(comments_version_key(news_id))
+
+
+def forget_comments(news_ids):
+    for news_id in set(news_ids):
+        bump(comments_version_key(news_id))
+
+
+def news_feed():
+    news = News.objects.all()[:settings.FEED_SIZE]
+    return {
+        'title': 'Новости',
+        'link': reverse('news:home'),
+        'description': 'Последние новости',
+        'items': [
+            {
+                'id': f'news-{item.pk}',
+                'title': item.title,
+                'link': reverse('news:detail', args=(item.pk,)),
+                'text': item.text,
+                'date': datetime.combine(item.date, time.min,
+                                         tzinfo=timezone.utc),
+                'author': None,
+            }
+            for item in news
+        ],
+    }
+
+
+def comment_feed(news_id):
+    news = News.objects.filter(pk=news_id).only('pk', 'title').first()
+    if news is None:
+        return None
+    link = reverse('news:detail', args=(news.pk,))
+    comments = news.comment_set.select_related('author').order_by(
+        '-created'
+    )[:settings.FEED_SIZE]
+    return {
+        'title': f'Комментарии: {news.title}',
+        'link': link,
+        'description': f'Комментарии к новости «{news.title}»',
+        'items': [
+            {
+                'id': f'comment-{comment.pk}',
+                'title': comment.author.username,
+                'link': f'{link}#comment-{comment.pk}',
+                'text': comment.text,
+                'date': comment.created,
+                'author': comment.author.username,
+            }
+            for comment in comments
+        ],
+    }
+
+
+def to_json(feed, base, feed_url):
+    data = {
+        'version': 'https://jsonfeed.org/version/1.1',
+        'title': feed['title'],
+        'home_page_url': base + feed['link'],
+        'feed_url': feed_url,
+        'description': feed['description'],
+        'language': 'ru',
+        'items': [],
+    }
+    for item in feed['items']:
+        entry = {
+            'id': item['id'],
+            'url': base + item['link'],
+            'title': item['title'],
+            'content_text': item['text'],
+            'date_published': item['date'].isoformat(),
+        }
+        if item['author']:
+            entry['authors'] = [{'name': item['author']}]
+        data['items'].append(entry)
+    return json.dumps(data, ensure_ascii=False).encode()
+
+
+def to_xml(feed, base, feed_url, fmt):
+    generator = GENERATORS[fmt](
+        title=feed['title'],
+        link=base + feed['link'],
+        description=feed['description'],
+        language='ru',
+        feed_url=feed_url,
+    )
+    for item in feed['items']:
+        generator.add_item(
+            title=item['title'],
+            link=base + item['link'],
+            description=item['text'],
+            unique_id=item['id'],
+            unique_id_is_permalink=False,
+            pubdate=item['date'],
+            author_name=item['author'],
+        )
+    return generator.writeString('utf-8').encode()
+
+
+def serialize(feed, base, feed_urls):
+    """{формат: (тело, ETag)} для всех форматов ленты."""
+    payloads = {}
+    for fmt, feed_url in feed_urls.items():
+        if fmt == 'json':
+            body = to_json(feed, base, feed_url)
+        else:
+            body = to_xml(feed, base, feed_url, fmt)
+        payloads[fmt] = (body, f'"{hashlib.sha1(body).hexdigest()}"')
+    return payloads
+
+
+def cached(name, version_key, build, fmt, base, feed_urls):
+    """
+    (тело, ETag) ленты `name` в формате `fmt` или None, если её нет.
+
+    Версия читается до сборки: изменение во время сборки повысит её,
+    и собранная лента останется под старым ключом. Отсутствие ленты
+    тоже кэшируется до следующего повышения версии.
+    """
+    cache = feed_cache()
+    version = current_version(version_key)
+    site = hashlib.sha1(base.encode()).hexdigest()[:12]
+    prefix = f'feeds:{name}:{site}:{version}:'
+    payload = cache.get(prefix + fmt)
+    if payload is None:
+        feed = build()
+        if feed is None:
+            payloads = dict.fromkeys(feed_urls, MISSING)
+        else:
+            payloads = serialize(feed, base, feed_urls)
+        cache.set_many(
+            {prefix + key: value for key, value in payloads.items()},
+            settings.FEED_CACHE_TIMEOUT,
+        )
+        payload = payloads[fmt]
+    return payload or None
+
+
+def get_news_feed(fmt, base):
+    feed_urls = {
+        key: base + reverse('news:feed', args=(key,)) for key in CONTENT_TYPES
+    }
+    return cached('news', NEWS_VERSION_KEY, news_feed, fmt, base, feed_urls)
+
+
+def get_comment_feed(news_id, fmt, base):
+    feed_urls = {
+        key: base + reverse('news:comment_feed', args=(news_id, key))
+        for key in CONTENT_TYPES
+    }
+    return cached(
+        f'comments:{news_id}', comments_version_key(news_id),
+        lambda: comment_feed(news_id), fmt, base, feed_urls,
+    )
@@ -0,0 +1,129 @@
+"""
+Отложенная запись комментариев.
+
+В режиме COMMENT_INGESTION = 'queue' проверенный комментарий не пишется
+в основную базу, а добавляется в журнал — отдельный SQLite-файл
+COMMENT_QUEUE_PATH. Команда process_comment_queue переносит комментарии
+из журнала в основную базу пачками через bulk_create, так что поток
+пишущих пользователей не упирается в блокировку записи основной базы.
+Запись из журнала удаляется только после коммита пачки (доставка
+«хотя бы один раз»); разбирать журнал должен один процесс.
+"""
+import sqlite3
+import threading
+from datetime import datetime
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import transaction
+
+from . import feeds, trending
+from .models import Comment, CommentBucket, News
+
+SCHEMA = (
+    'CREATE TABLE IF NOT EXISTS pending_comment ('
+    'id INTEGER PRIMARY KEY AUTOINCREMENT, '
+    'news_id INTEGER NOT NULL, '
+    'author_id INTEGER NOT NULL, '
+    'text TEXT NOT NULL, '
+    'created TEXT NOT NULL)',
+    'CREATE INDEX IF NOT EXISTS pending_comment_news_author '
+    'ON pending_comment (news_id, author_id)',
+)
+
+# Соединения с журналом открываются один раз на поток и путь.
+_local = threading.local()
+
+
+def is_enabled():
+    return settings.COMMENT_INGESTION == 'queue'
+
+
+class CommentQueue:
+    """Журнал комментариев, ожидающих записи в основную базу."""
+
+    def __init__(self, path=None):
+        self.path = str(path or settings.COMMENT_QUEUE_PATH)
+
+    def connect(self):
+        connections = _local.__dict__.setdefault('connections', {})
+        if self.path not in connections:
+            connection = sqlite3.connect(self.path, timeout=30)
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=FULL')
+            for statement in SCHEMA:
+                connection.execute(statement)
+            connections[self.path] = connection
+        return connections[self.path]
+
+    def enqueue(self, comment):
+        journal = self.connect()
+        with journal:
+            journal.execute(
+                'INSERT INTO pending_comment '
+                '(news_id, author_id, text, created) VALUES (?, ?, ?, ?)',
+                (comment.news_id, comment.author_id, comment.text,
+                 comment.created.isoformat()),
+            )
+
+    def pending(self, news, author):
+        """Ещё не записанные комментарии автора к новости."""
+        rows = self.connect().execute(
+            'SELECT text, created FROM pending_comment '
+            'WHERE news_id = ? AND author_id = ? ORDER BY id',
+            (news.pk, author.pk),
+        ).fetchall()
+        return [
+            Comment(news=news, author=author, text=text,
+                    created=datetime.fromisoformat(created))
+            for text, created in rows
+        ]
+
+    def __len__(self):
+        return self.connect().execute(
+            'SELECT COUNT(*) FROM pending_comment'
+        ).fetchone()[0]
+
+    def flush(self, batch_size=None):
+        """Переносит одну пачку в основную базу и возвращает её размер."""
+        batch_size = batch_size or settings.COMMENT_QUEUE_BATCH_SIZE
+        journal = self.connect()
+        rows = journal.execute(
+            'SELECT id, news_id, author_id, text, created '
+            'FROM pending_comment ORDER BY id LIMIT ?',
+            (batch_size,),
+        ).fetchall()
+        if not rows:
+            return 0
+        # Новость или автор могли быть удалены, пока комментарий ждал.
+        news_ids = set(News.objects.filter(
+            pk__in={row[1] for row in rows}
+        ).values_list('pk', flat=True))
+        author_ids = set(get_user_model().objects.filter(
+            pk__in={row[2] for row in rows}
+        ).values_list('pk', flat=True))
+        comments = [
+            Comment(news_id=news_id, author_id=author_id, text=text,
+                    created=datetime.fromisoformat(created))
+            for _, news_id, author_id, text, created in rows
+            if news_id in news_ids and author_id in author_ids
+        ]
+        with transaction.atomic():
+            Comment.objects.bulk_create(comments)
+            CommentBucket.objects.add(comments)
+        trending.bump_version()
+        feeds.forget_comments(comment.news_id for comment in comments)
+        with journal:
+            journal.execute(
+                'DELETE FROM pending_comment WHERE id <= ?', (rows[-1][0],)
+            )
+        return len(rows)
+
+    def drain(self, batch_size=None):
+        """Переносит всё содержимое журнала."""
+        total = 0
+        while True:
+            flushed = self.flush(batch_size)
+            if not flushed:
+                return total
+            total += flushed
@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+
+from news.models import News, backfill_excerpts
+
+
+class Command(BaseCommand):
+    help = (
+        'Пересчитывает краткое содержание новостей, например после '
+        'массовой загрузки в обход News.save().'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500)
+        parser.add_argument(
+            '--only-empty', action='store_true',
+            help='Только новости без краткого содержания.',
+        )
+
+    def handle(self, *args, batch_size, only_empty, **options):
+        queryset = News.objects.all()
+        if only_empty:
+            queryset = queryset.filter(excerpt='')
+        updated = backfill_excerpts(queryset, batch_size)
+        self.stdout.write(f'Обновлено новостей: {updated}')
@@ -0,0 +1,63 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from news import factories
+from news.benchmarks import scratch_database, timer
+from news.ingest import CommentQueue
+from news.models import Comment
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнивает скорость приёма комментариев при прямой записи '
+        'и через журнал с пакетной записью. Работает на временной базе.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--comments', type=int, default=2000)
+        parser.add_argument('--writers', type=int, default=8)
+        parser.add_argument('--batch-size', type=int, default=500)
+
+    def write_concurrently(self, writers, comments, write):
+        def worker(indexes):
+            try:
+                for index in indexes:
+                    write(index)
+            finally:
+                connection.close()
+
+        with ThreadPoolExecutor(writers) as pool:
+            list(pool.map(
+                worker,
+                [range(start, comments, writers) for start in range(writers)]
+            ))
+
+    def handle(self, *args, comments, writers, batch_size, **options):
+        results = {}
+        with scratch_database() as path:
+            author, = factories.make_users(1)
+            news, = factories.make_news(1)
+
+            def make_comment(index):
+                return Comment(news=news, author=author, text=f'Bench {index}')
+
+            with timer(results, 'sync'):
+                self.write_concurrently(
+                    writers, comments, lambda i: make_comment(i).save()
+                )
+            queue = CommentQueue(path.with_name('queue.sqlite3'))
+            with timer(results, 'enqueue'):
+                self.write_concurrently(
+                    writers, comments,
+                    lambda i: queue.enqueue(make_comment(i))
+                )
+            with timer(results, 'flush'):
+                queue.drain(batch_size)
+        results['queue'] = results['enqueue'] + results['flush']
+        for name in ('sync', 'enqueue', 'flush', 'queue'):
+            self.stdout.write(
+                f'{name:>8}: {results[name]:.3f}s, '
+                f'{comments / results[name]:.0f} комментариев/с'
+            )
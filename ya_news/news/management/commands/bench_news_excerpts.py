@@ -0,0 +1,60 @@
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from django.core.management.base import BaseCommand
+from django.template import engines
+from django.template.loader import get_template
+from django.test import RequestFactory
+
+from news import factories
+from news.benchmarks import scratch_database, timer
+from news.models import News
+from news.views import NewsList
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнивает рендер главной с truncatewords по полному тексту '
+        'и с сохранённым excerpt. Работает на временной базе.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--news', type=int, default=200)
+        parser.add_argument(
+            '--words', type=int, default=20000,
+            help='Число слов в тексте каждой новости.',
+        )
+        parser.add_argument('--repeat', type=int, default=50)
+
+    def render_legacy(self, template, request):
+        """Главная до появления excerpt: весь текст и truncatewords."""
+        queryset = News.objects.prefetch_related('comment_set')
+        return template.render(
+            {'object_list': queryset[:settings.NEWS_COUNT_ON_HOME_PAGE]},
+            request,
+        )
+
+    def render_current(self, request):
+        return NewsList.as_view()(request).render().content
+
+    def handle(self, *args, news, words, repeat, **options):
+        results = {}
+        request = RequestFactory().get('/')
+        request.user = AnonymousUser()
+        source = get_template('news/home.html').template.source
+        legacy = engines['django'].from_string(source.replace(
+            'news.excerpt', 'news.text|truncatewords:15'
+        ))
+        with scratch_database():
+            factories.make_news(news, text=' '.join(['слово'] * words))
+            for name, render in (
+                ('truncatewords', lambda: self.render_legacy(legacy, request)),
+                ('excerpt', lambda: self.render_current(request)),
+            ):
+                render()
+                with timer(results, name):
+                    for _ in range(repeat):
+                        render()
+        for name, seconds in results.items():
+            self.stdout.write(
+                f'{name:>14}: {seconds / repeat * 1000:.2f} мс на рендер'
+            )
@@ -0,0 +1,96 @@
+import statistics
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.template import engines
+from django.template.backends.django import DjangoTemplates
+from django.test import RequestFactory
+from django.urls import reverse
+
+from news import factories
+from news.benchmarks import scratch_database
+from news.forms import CommentForm
+from news.models import News
+from news.views import NewsList
+
+
+def django_engine(loaders):
+    params = dict(settings.TEMPLATES[0], NAME='bench')
+    params.pop('BACKEND')
+    params['OPTIONS'] = dict(params['OPTIONS'], loaders=loaders)
+    return DjangoTemplates(params)
+
+
+def jinja2_engine():
+    if 'jinja2' not in (engine.name for engine in engines.all()):
+        return None
+    return engines['jinja2']
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнивает рендеринг news/detail.html и news/home.html: Django '
+        'без кэша шаблонов, с кэшем и Jinja2 (если установлен). Работает '
+        'на временной базе.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--comments', type=int, default=500,
+            help='Комментариев у новости для news/detail.html.',
+        )
+        parser.add_argument('--repeat', type=int, default=50)
+
+    def contexts(self, comments):
+        """{шаблон: (контекст, запрос)} с уже загруженными объектами."""
+        author, = factories.make_users(1)
+        items = factories.make_news(settings.NEWS_COUNT_ON_HOME_PAGE)
+        factories.make_comments(items[:1], [author], comments)
+        factories.make_comments(items[1:], [author], 3)
+        news = News.objects.prefetch_related('comment_set__author').get(
+            pk=items[0].pk
+        )
+        request = RequestFactory().get(reverse('news:detail',
+                                               args=(news.pk,)))
+        request.user = author
+        view = NewsList()
+        view.setup(request)
+        view.object_list = list(view.get_queryset())
+        return {
+            'news/detail.html': ({
+                'news': news, 'object': news, 'form': CommentForm(),
+            }, request),
+            'news/home.html': (view.get_context_data(), request),
+        }
+
+    def measure(self, engine, name, context, request, repeat, cached):
+        timings = []
+        template = engine.get_template(name)
+        for _ in range(repeat):
+            started = time.perf_counter()
+            if not cached:
+                template = engine.get_template(name)
+            template.render(dict(context), request)
+            timings.append(time.perf_counter() - started)
+        return statistics.median(timings) * 1000
+
+    def handle(self, *args, comments, repeat, **options):
+        variants = [
+            ('django', django_engine(settings.TEMPLATE_LOADERS), False),
+            ('django+cache', django_engine(
+                settings.TEMPLATES[0]['OPTIONS']['loaders']
+            ), True),
+            ('jinja2', jinja2_engine(), True),
+        ]
+        with scratch_database():
+            contexts = self.contexts(comments)
+            for name, (context, request) in contexts.items():
+                self.stdout.write(name)
+                for label, engine, cached in variants:
+                    if engine is None:
+                        self.stdout.write(f'{label:>13}: не установлен')
+                        continue
+                    result = self.measure(engine, name, context, request,
+                                          repeat, cached)
+                    self.stdout.write(f'{label:>13}: {result:.2f} мс')
@@ -0,0 +1,10 @@
+from django.core.management.base import BaseCommand
+
+from news.trending import compact
+
+
+class Command(BaseCommand):
+    help = 'Удаляет часовые счётчики комментариев, вышедшие из всех окон.'
+
+    def handle(self, *args, **options):
+        self.stdout.write(f'Удалено ячеек: {compact()}')
@@ -0,0 +1,69 @@
+import json
+from functools import partial
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.test import override_settings
+from django.urls import reverse
+
+from news import factories
+from news.benchmarks import scratch_database
+from yanews import loadtest
+
+
+def browse(news, session, rng):
+    session.get('home', reverse('news:home'))
+    session.get('detail', reverse('news:detail', args=(rng.choice(news),)))
+
+
+def discuss(news, session, rng):
+    url = reverse('news:detail', args=(rng.choice(news),))
+    session.get('detail', url)
+    session.post('comment', url, {'text': f'Комментарий {rng.random()}'})
+
+
+class Command(BaseCommand):
+    help = (
+        'Нагрузочный тест на временной базе: виртуальные пользователи '
+        'читают главную и новости и пишут комментарии. Выводит '
+        'пропускную способность и задержки p50/p95/p99 в JSON.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=10)
+        parser.add_argument('--duration', type=float, default=10.0,
+                            help='Длительность в секундах.')
+        parser.add_argument(
+            '--workers', type=int, default=0,
+            help='Рабочих процессов с приложением; 0 — в этом процессе.',
+        )
+        parser.add_argument('--news', type=int, default=50)
+        parser.add_argument(
+            '--comment-weight', type=float, default=1.0,
+            help='Вес сценария с комментарием против 9 у чтения.',
+        )
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument(
+            '--rate-limits', action='store_true',
+            help='Не отключать RATE_LIMITS: лишние записи получат 429.',
+        )
+        parser.add_argument('--output', help='Файл для отчёта.')
+
+    def handle(self, *args, users, duration, workers, news, comment_weight,
+               seed, output, rate_limits, **options):
+        limits = settings.RATE_LIMITS if rate_limits else {}
+        with scratch_database(), override_settings(RATE_LIMITS=limits):
+            accounts = factories.make_users(users)
+            items = factories.make_news(news)
+            factories.make_comments(items, accounts, 5)
+            pks = [item.pk for item in items]
+            report = loadtest.run(
+                [(partial(browse, pks), 9),
+                 (partial(discuss, pks), comment_weight)],
+                accounts, duration, workers, seed,
+            )
+        text = json.dumps(report, ensure_ascii=False, indent=2)
+        if output:
+            with open(output, 'w', encoding='utf-8') as file:
+                file.write(text + '\n')
+        self.stdout.write(text)
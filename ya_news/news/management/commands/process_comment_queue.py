@@ -0,0 +1,32 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from news.ingest import CommentQueue
+
+
+class Command(BaseCommand):
+    help = 'Переносит комментарии из журнала в базу пачками.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--once', action='store_true',
+            help='Разобрать журнал один раз и выйти.',
+        )
+        parser.add_argument(
+            '--interval', type=float, default=1.0,
+            help='Пауза между проверками пустого журнала, секунды.',
+        )
+        parser.add_argument('--batch-size', type=int)
+
+    def handle(self, *args, once, interval, batch_size, **options):
+        queue = CommentQueue()
+        while True:
+            close_old_connections()
+            flushed = queue.drain(batch_size)
+            if flushed:
+                self.stdout.write(f'Записано комментариев: {flushed}')
+            if once:
+                return
+            time.sleep(interval)
@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from news.models import NewsMonth
+
+
+class Command(BaseCommand):
+    help = (
+        'Пересчитывает помесячные счётчики архива, например после '
+        'массовой загрузки новостей в обход сигналов.'
+    )
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            NewsMonth.objects.rebuild()
+        self.stdout.write(f'Месяцев в архиве: {NewsMonth.objects.count()}')
@@ -0,0 +1,71 @@
+import json
+from collections import defaultdict
+
+from django.core.management.base import BaseCommand
+
+from news import factories
+from news.benchmarks import scratch_database
+from news.models import Comment
+from yanews import requestlog
+
+
+class Command(BaseCommand):
+    help = (
+        'Воспроизводит журнал запросов REQUEST_LOG_PATH на временной базе '
+        'с тестовыми данными и выводит задержки по именам URL в JSON — '
+        'для сравнения версий через --baseline.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--log', help='Журнал вместо REQUEST_LOG_PATH.')
+        parser.add_argument(
+            '--speed', type=float, default=1.0,
+            help='Во сколько раз быстрее записи; 0 — без пауз.',
+        )
+        parser.add_argument('--concurrency', type=int, default=8)
+        parser.add_argument('--users', type=int, default=20)
+        parser.add_argument('--news', type=int, default=50)
+        parser.add_argument('--baseline',
+                            help='Отчёт прошлого запуска для сравнения.')
+        parser.add_argument('--output', help='Файл для отчёта.')
+
+    def seed(self, users, news):
+        """Пользователи по классам и значения для токенов аргументов URL."""
+        dataset = factories.make_dataset(users=users, news=news,
+                                         comments_per_news=5)
+        staff = factories.make_users(1, prefix='Редактор')
+        staff[0].is_staff = True
+        staff[0].save()
+        news_pks = [item.pk for item in dataset.news]
+        comments = defaultdict(list)
+        for pk, author_id in Comment.objects.values_list('pk', 'author_id'):
+            comments[author_id].append(pk)
+
+        def own_comments(user):
+            return comments[user.pk] if user else []
+
+        resolvers = {
+            ('news:detail', 'pk'): lambda user: news_pks,
+            ('news:comment_feed', 'pk'): lambda user: news_pks,
+            ('news:edit', 'pk'): own_comments,
+            ('news:delete', 'pk'): own_comments,
+        }
+        return {'user': dataset.users, 'staff': staff}, resolvers
+
+    def handle(self, *args, log, speed, concurrency, users, news, baseline,
+               output, **options):
+        records = requestlog.read_log(log)
+        with scratch_database():
+            entries, skipped = requestlog.plan(records,
+                                               *self.seed(users, news))
+            report = requestlog.replay(entries, speed, concurrency)
+        report['skipped'] = dict(skipped)
+        report['recorded'] = requestlog.recorded(records)
+        if baseline:
+            with open(baseline, encoding='utf-8') as file:
+                report['change'] = requestlog.compare(report, json.load(file))
+        text = json.dumps(report, ensure_ascii=False, indent=2)
+        if output:
+            with open(output, 'w', encoding='utf-8') as file:
+                file.write(text + '\n')
+        self.stdout.write(text)
@@ -0,0 +1,42 @@
+# Generated by Django 3.2.15 on 2026-10-19 11:34
+
+from django.db import migrations, models
+from django.utils.text import Truncator
+
+# Копия news.models.make_excerpt на момент миграции: миграции не должны
+# зависеть от кода приложения, который меняется.
+EXCERPT_WORDS = 15
+BATCH_SIZE = 500
+
+
+def fill_excerpts(apps, schema_editor):
+    News = apps.get_model('news', 'News')
+    last_pk = 0
+    while True:
+        batch = list(
+            News.objects.filter(pk__gt=last_pk).order_by('pk')
+            .only('pk', 'text')[:BATCH_SIZE]
+        )
+        if not batch:
+            return
+        for news in batch:
+            news.excerpt = Truncator(news.text).words(EXCERPT_WORDS,
+                                                      truncate=' …')
+        News.objects.bulk_update(batch, ['excerpt'])
+        last_pk = batch[-1].pk
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('news', '0002_comment_created_default'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='news',
+            name='excerpt',
+            field=models.TextField(blank=True, editable=False),
+        ),
+        migrations.RunPython(fill_excerpts, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,53 @@
+# Generated by Django 3.2.15 on 2026-10-19 11:36
+
+import datetime
+from django.db import migrations, models
+from django.db.models import Count
+from django.db.models.functions import TruncMonth
+
+
+def fill_news_months(apps, schema_editor):
+    News = apps.get_model('news', 'News')
+    NewsMonth = apps.get_model('news', 'NewsMonth')
+    rows = News.objects.annotate(
+        month=TruncMonth('date')
+    ).values('month').annotate(count=Count('pk')).order_by()
+    NewsMonth.objects.bulk_create(
+        NewsMonth(
+            year=row['month'].year, month=row['month'].month,
+            count=row['count'],
+        )
+        for row in rows
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('news', '0003_news_excerpt'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='NewsMonth',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('year', models.PositiveSmallIntegerField()),
+                ('month', models.PositiveSmallIntegerField()),
+                ('count', models.IntegerField(default=0)),
+            ],
+            options={
+                'ordering': ('-year', '-month'),
+            },
+        ),
+        migrations.AlterField(
+            model_name='news',
+            name='date',
+            field=models.DateField(db_index=True, default=datetime.datetime.today),
+        ),
+        migrations.AddConstraint(
+            model_name='newsmonth',
+            constraint=models.UniqueConstraint(fields=('year', 'month'), name='unique_news_month'),
+        ),
+        migrations.RunPython(fill_news_months, migrations.RunPython.noop),
+    ]
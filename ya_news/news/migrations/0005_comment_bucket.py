@@ -0,0 +1,57 @@
+# Generated by Django 3.2.15 on 2026-10-19 11:37
+
+from collections import Counter
+from datetime import timedelta
+
+from django.db import migrations, models
+import django.db.models.deletion
+from django.utils import timezone
+
+# Самое длинное окно TRENDING_WINDOWS на момент миграции: неделя.
+BACKFILL_HOURS = 24 * 7
+
+
+def hour_of(moment):
+    return moment.astimezone(timezone.utc).replace(
+        minute=0, second=0, microsecond=0
+    )
+
+
+def fill_buckets(apps, schema_editor):
+    Comment = apps.get_model('news', 'Comment')
+    CommentBucket = apps.get_model('news', 'CommentBucket')
+    since = timezone.now() - timedelta(hours=BACKFILL_HOURS)
+    counts = Counter(
+        (news_id, hour_of(created))
+        for news_id, created in Comment.objects.filter(
+            created__gte=since
+        ).values_list('news_id', 'created').iterator()
+    )
+    CommentBucket.objects.bulk_create(
+        CommentBucket(news_id=news_id, hour=hour, count=count)
+        for (news_id, hour), count in counts.items()
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('news', '0004_news_month_archive'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CommentBucket',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('hour', models.DateTimeField(db_index=True)),
+                ('count', models.IntegerField(default=0)),
+                ('news', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='news.news')),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='commentbucket',
+            constraint=models.UniqueConstraint(fields=('news', 'hour'), name='unique_comment_bucket'),
+        ),
+        migrations.RunPython(fill_buckets, migrations.RunPython.noop),
+    ]
@@ -1,13 +1,55 @@
+from collections import Counter
 from datetime import datetime
 
 from django.conf import settings
-from django.db import models
+from django.db import connections, models
+from django.db.models import Count, F
+from django.db.models.functions import TruncMonth
+from django.utils import timezone
+from django.utils.text import Truncator
+
+
+EXCERPT_WORDS = 15
+
+
+def make_excerpt(text):
+    """То же, что фильтр truncatewords:15 в шаблоне."""
+    return Truncator(text).words(EXCERPT_WORDS, truncate=' …')
+
+
+def backfill_excerpts(queryset, batch_size=500):
+    """Пересчитывает excerpt пачками по первичному ключу."""
+    last_pk, updated = 0, 0
+    while True:
+        batch = list(
+            queryset.filter(pk__gt=last_pk).order_by('pk').only('pk', 'text')
+            [:batch_size]
+        )
+        if not batch:
+            return updated
+        for news in batch:
+            news.excerpt = make_excerpt(news.text)
+        queryset.model.objects.bulk_update(batch, ['excerpt'])
+        last_pk = batch[-1].pk
+        updated += len(batch)
+
+
+def month_counts(queryset):
+    """Число новостей по месяцам: {(год, месяц): количество}."""
+    rows = queryset.annotate(
+        month=TruncMonth('date')
+    ).values('month').annotate(count=Count('pk')).order_by()
+    return {
+        (row['month'].year, row['month'].month): row['count'] for row in rows
+    }
 
 
 class News(models.Model):
     title = models.CharField(max_length=50)
     text = models.TextField()
-    date = models.DateField(default=datetime.today)
+    date = models.DateField(default=datetime.today, db_index=True)
+    # Начало текста для главной: список новостей не читает text целиком.
+    excerpt = models.TextField(editable=False, blank=True)
 
     class Meta:
         ordering = ('-date',)
@@ -17,6 +59,80 @@ class News(models.Model):
     def __str__(self):
         return self.title
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        news = super().from_db(db, field_names, values)
+        # Нужна счётчикам архива, если дату новости перенесут.
+        news.loaded_date = news.__dict__.get('date')
+        return news
+
+    def save(self, *args, **kwargs):
+        update_fields = kwargs.get('update_fields')
+        if update_fields is None or 'text' in update_fields:
+            self.excerpt = make_excerpt(self.text)
+            if update_fields is not None:
+                kwargs['update_fields'] = {*update_fields, 'excerpt'}
+        super().save(*args, **kwargs)
+
+
+class NewsMonthManager(models.Manager):
+
+    def shift(self, counts):
+        """
+        Прибавляет к месяцам {(год, месяц): изменение}.
+
+        Строку месяца создаёт только прибавление: вычитание из месяца
+        без строки (например, при удалении новостей до первого rebuild)
+        не оставляет в архиве месяцев с отрицательным счётчиком.
+        """
+        for (year, month), delta in counts.items():
+            if delta > 0:
+                self.get_or_create(year=year, month=month)
+            if delta:
+                self.filter(year=year, month=month).update(
+                    count=F('count') + delta
+                )
+
+    def add(self, dates, delta=1):
+        """Учитывает новости с датами `dates`; delta=-1 — удалённые."""
+        counts = Counter()
+        for date in dates:
+            counts[date.year, date.month] += delta
+        self.shift(counts)
+
+    def rebuild(self):
+        """Полный пересчёт одним GROUP BY по всей таблице новостей."""
+        self.all().delete()
+        self.bulk_create(
+            NewsMonth(year=year, month=month, count=count)
+            for (year, month), count in month_counts(News.objects).items()
+        )
+
+
+class NewsMonth(models.Model):
+    """
+    Число новостей за месяц для навигации по архиву.
+
+    Поддерживается сигналами News, поэтому навигация не считает
+    GROUP BY по всей таблице на каждом запросе.
+    """
+    year = models.PositiveSmallIntegerField()
+    month = models.PositiveSmallIntegerField()
+    count = models.IntegerField(default=0)
+
+    objects = NewsMonthManager()
+
+    class Meta:
+        ordering = ('-year', '-month')
+        constraints = [
+            models.UniqueConstraint(
+                fields=('year', 'month'), name='unique_news_month'
+            ),
+        ]
+
+    def __str__(self):
+        return f'{self.month:02}.{self.year}'
+
 
 class Comment(models.Model):
     news = models.ForeignKey(
@@ -28,10 +144,88 @@ class Comment(models.Model):
         on_delete=models.CASCADE,
     )
     text = models.TextField()
-    created = models.DateTimeField(auto_now_add=True)
+    # Не auto_now_add: фабрики и массовая загрузка передают время явно.
+    created = models.DateTimeField(default=timezone.now, editable=False)
 
     class Meta:
         ordering = ('created',)
 
     def __str__(self):
         return self.text[:50]
+
+
+def hour_of(moment):
+    """Начало часа в UTC: граница ячейки счётчика комментариев."""
+    return moment.astimezone(timezone.utc).replace(
+        minute=0, second=0, microsecond=0
+    )
+
+
+class CommentBucketManager(models.Manager):
+
+    def add(self, comments, delta=1):
+        """
+        Учитывает комментарии; delta=-1 — удалённые.
+
+        Прибавление — один UPSERT на ячейку, пачкой через executemany:
+        ORM-версия с get_or_create и F() стоит трёх запросов на ячейку.
+        Вычитание ячеек не создаёт, чтобы удаление комментариев вместе
+        с новостью не воскрешало её ячейки.
+        """
+        counts = Counter()
+        for comment in comments:
+            counts[comment.news_id, hour_of(comment.created)] += delta
+        connection = connections[self.db]
+        table = connection.ops.quote_name(self.model._meta.db_table)
+        hour_field = self.model._meta.get_field('hour')
+        rows = [
+            (news_id, hour_field.get_db_prep_value(hour, connection), change)
+            for (news_id, hour), change in counts.items() if change
+        ]
+        with connection.cursor() as cursor:
+            cursor.executemany(
+                f'INSERT INTO {table} (news_id, hour, count) '
+                f'VALUES (%s, %s, %s) ON CONFLICT (news_id, hour) '
+                f'DO UPDATE SET count = {table}.count + excluded.count',
+                [row for row in rows if row[2] > 0],
+            )
+            cursor.executemany(
+                f'UPDATE {table} SET count = count + %s '
+                f'WHERE news_id = %s AND hour = %s',
+                [(change, news_id, hour)
+                 for news_id, hour, change in rows if change < 0],
+            )
+        return bool(rows)
+
+
+class CommentBucket(models.Model):
+    """Число комментариев к новости за час, для блока «Обсуждаемое»."""
+    news = models.ForeignKey(News, on_delete=models.CASCADE)
+    hour = models.DateTimeField(db_index=True)
+    count = models.IntegerField(default=0)
+
+    objects = CommentBucketManager()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=('news', 'hour'), name='unique_comment_bucket'
+            ),
+        ]
+
+
+class UserPurge(models.Model):
+    """Задание на фоновое удаление пользователя, см. news/purge.py."""
+    # Не внешний ключ: пользователь удаляется в конце задания.
+    user_id = models.PositiveIntegerField(unique=True)
+    username = models.CharField(max_length=150)
+    created = models.DateTimeField(auto_now_add=True)
+    last_pk = models.BigIntegerField(default=0)
+    deleted = models.PositiveIntegerField(default=0)
+    finished = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ('created',)
+
+    def __str__(self):
+        return self.username
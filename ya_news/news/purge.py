@@ -0,0 +1,84 @@
+"""
+Фоновое удаление пользователей.
+
+User.delete() собирает через collector все комментарии пользователя
+и удаляет их одной транзакцией, на всё это время блокируя запись
+в SQLite. Вместо этого пользователь деактивируется и получает задание
+UserPurge, а команда purge_users удаляет его комментарии пачками
+по первичному ключу. Каждая пачка удаляется в своей короткой транзакции
+вместе с записью прогресса, поэтому прерванное задание продолжается
+с места остановки. Сам пользователь удаляется последним, когда
+у него не осталось комментариев.
+
+Пачка удаляется сырым DELETE без collector и сигналов post_delete:
+иначе каждый комментарий загружался бы целиком, а его обработчики
+выполняли бы свои запросы внутри транзакции. Вместо сигналов пачка
+один раз вычитается из счётчиков «Обсуждаемого», а кэши и живые ленты
+сбрасываются после коммита.
+"""
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.utils import timezone
+
+from . import events, feeds, trending
+from .models import Comment, CommentBucket, UserPurge
+
+
+def schedule(users):
+    """Деактивирует пользователей и ставит их в очередь на удаление."""
+    jobs = []
+    for user in users:
+        user.is_active = False
+        user.save(update_fields=['is_active'])
+        job, _ = UserPurge.objects.get_or_create(
+            user_id=user.pk, defaults={'username': user.get_username()}
+        )
+        jobs.append(job)
+    return jobs
+
+
+def pending():
+    return UserPurge.objects.filter(finished__isnull=True)
+
+
+def forget(batch):
+    """То, что для одного комментария делают сигналы post_delete."""
+    trending.bump_version()
+    feeds.forget_comments(comment.news_id for comment in batch)
+    if not settings.NEWS_EVENTS_ENABLED:
+        return
+    broker = events.get_broker()
+    for comment in batch:
+        broker.publish(
+            comment.news_id, events.comment_event('deleted', comment)
+        )
+
+
+def run(job, batch_size=500, progress=None):
+    """Выполняет задание; progress(job) вызывается после каждой пачки."""
+    comments = Comment.objects.filter(author_id=job.user_id)
+    while True:
+        batch = list(
+            comments.filter(pk__gt=job.last_pk).order_by('pk').only(
+                'pk', 'news_id', 'created'
+            )[:batch_size]
+        )
+        if not batch:
+            break
+        with transaction.atomic():
+            Comment.objects.filter(
+                pk__in=[comment.pk for comment in batch]
+            )._raw_delete(Comment.objects.db)
+            CommentBucket.objects.add(batch, delta=-1)
+            job.last_pk = batch[-1].pk
+            job.deleted += len(batch)
+            job.save(update_fields=['last_pk', 'deleted'])
+            transaction.on_commit(lambda batch=batch: forget(batch))
+        if progress is not None:
+            progress(job)
+    with transaction.atomic():
+        get_user_model().objects.filter(pk=job.user_id).delete()
+        job.finished = timezone.now()
+        job.save(update_fields=['finished'])
+    return job
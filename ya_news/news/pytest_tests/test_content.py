@@ -1,8 +1,21 @@
+from datetime import date
+
 import pytest
 from django.conf import settings
+from django.core.cache.backends.filebased import FileBasedCache
+from django.db import connection
+from django.template import engines
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
+from django.utils import timezone
 
-from news.forms import CommentForm
+from news import factories, feeds
+from news.admin import CommentPageFormSet
+from news.forms import BAD_WORDS, WARNING, CommentForm
+from news.models import Comment, News
+from news.views import NewsList
+from yanews import templating
 
 pytestmark = pytest.mark.django_db
 
@@ -15,6 +28,15 @@ def test_news_count(client):
     assert comments_count == settings.NEWS_COUNT_ON_HOME_PAGE
 
 
+# Тест: главная выводит краткое содержание без загрузки полного текста
+@pytest.mark.usefixtures('make_bulk_of_news')
+def test_home_page_defers_news_text(client):
+    res = client.get(reverse('news:home'))
+    for news in res.context['object_list']:
+        assert 'text' in news.get_deferred_fields()
+        assert news.excerpt in res.content.decode()
+
+
 # Тест: доступность формы комментария для различных пользователей
 @pytest.mark.parametrize(
     'username, is_permitted', ((pytest.lazy_fixture('admin_client'), True),
@@ -50,3 +72,225 @@ def test_comments_order(client, pk_from_news):
         key=lambda comment: comment.created
     )
     assert list(object_list) == sorted_list_of_comments
+
+
+def count_detail_queries(user, url):
+    client = Client()
+    client.force_login(user)
+    client.get(url)
+    with CaptureQueriesContext(connection) as context:
+        client.get(url)
+    return len(context.captured_queries)
+
+
+# Тест: сессия и пользователь берутся из кэша, а не из БД
+def test_cached_session_and_user_save_two_queries(settings, author,
+                                                  pk_from_news):
+    url = reverse('news:detail', args=pk_from_news)
+    cached_queries = count_detail_queries(author, url)
+    settings.SESSION_ENGINE = 'django.contrib.sessions.backends.db'
+    settings.AUTHENTICATION_BACKENDS = [
+        'django.contrib.auth.backends.ModelBackend'
+    ]
+    db_queries = count_detail_queries(author, url)
+    assert db_queries - cached_queries == 2
+
+
+# Тест: комментарии новости из общего набора данных идут по порядку
+def test_dataset_comments_order(client, news_dataset):
+    news = news_dataset.news[0]
+    res = client.get(reverse('news:detail', args=(news.pk,)))
+    comments = list(res.context['news'].comment_set.all())
+    per_news = news_dataset.comments_count // len(news_dataset.news)
+    assert len(comments) == per_news
+    assert comments == sorted(comments, key=lambda comment: comment.created)
+
+
+# Тест: админка новости показывает комментарии постранично
+@pytest.mark.parametrize('page, expected', ((1, 20), (3, 5)))
+def test_admin_comment_inline_is_paginated(admin_client, news, author,
+                                           page, expected):
+    factories.make_comments([news], [author],
+                            CommentPageFormSet.per_page * 2 + 5)
+    url = reverse('admin:news_news_change', args=(news.pk,))
+    res = admin_client.get(url, {'comments_page': page})
+    formset = res.context['inline_admin_formsets'][0].formset
+    assert len(formset.forms) == expected
+    assert formset.page.number == page
+
+
+# Тест: страницы комментариев в админке не теряют строки с одинаковым
+# временем, а ссылки сохраняют остальные параметры адреса
+def test_admin_comment_pages_are_stable(admin_client, news, author):
+    created = timezone.now()
+    Comment.objects.bulk_create(
+        Comment(news=news, author=author, text='Текст', created=created)
+        for _ in range(CommentPageFormSet.per_page * 2)
+    )
+    url = reverse('admin:news_news_change', args=(news.pk,))
+    params = {'_changelist_filters': 'q=1'}
+    seen = []
+    for page in (1, 2):
+        res = admin_client.get(url, dict(params, comments_page=page))
+        formset = res.context['inline_admin_formsets'][0].formset
+        seen += [form.instance.pk for form in formset.forms]
+    assert sorted(seen) == sorted(
+        news.comment_set.values_list('pk', flat=True)
+    )
+    assert formset.previous_query == (
+        '_changelist_filters=q%3D1&comments_page=1'
+    )
+
+
+# Тест: в списке новостей админки выводится число комментариев
+def test_admin_changelist_shows_comments_count(admin_client, comment):
+    res = admin_client.get(reverse('admin:news_news_changelist'))
+    news = res.context['cl'].result_list[0]
+    assert news.comments_count == 1
+
+
+# Тест: архив за месяц выводит его новости без GROUP BY по всей таблице
+@pytest.mark.usefixtures('make_bulk_of_news')
+def test_archive_month(client):
+    today = date.today()
+    url = reverse('news:archive', args=(today.year, today.month))
+    with CaptureQueriesContext(connection) as context:
+        res = client.get(url)
+    assert all('GROUP BY' not in query['sql']
+               for query in context.captured_queries)
+    assert all(news.date.month == today.month
+               for news in res.context['object_list'])
+    months = {(item.year, item.month): item.count
+              for item in res.context['months']}
+    expected = News.objects.filter(
+        date__year=today.year, date__month=today.month
+    ).count()
+    assert months[today.year, today.month] == expected
+
+
+# Тест: ленты во всех форматах собираются одним чтением базы
+# и до изменения новостей и комментариев отдаются из кэша
+def test_news_feeds_are_cached(client, author, django_assert_num_queries):
+    feeds.feed_cache().clear()
+    factories.make_news(settings.FEED_SIZE + 1)
+    urls = {
+        fmt: reverse('news:feed', args=(fmt,))
+        for fmt in ('json', 'rss', 'atom')
+    }
+    feed = client.get(urls['json']).json()
+    assert len(feed['items']) == settings.FEED_SIZE
+    assert feed['items'][0]['title'] == 'News number 0'
+    with django_assert_num_queries(0):
+        responses = {fmt: client.get(url) for fmt, url in urls.items()}
+        not_modified = client.get(
+            urls['rss'], HTTP_IF_NONE_MATCH=responses['rss']['ETag']
+        )
+    assert responses['rss']['Content-Type'].startswith('application/rss+xml')
+    assert b'<feed' in responses['atom'].content
+    assert not_modified.status_code == 304
+    news = News.objects.create(title='Свежая новость', text='Текст')
+    assert client.get(urls['json']).json()['items'][0]['title'] == news.title
+    comment_url = reverse('news:comment_feed', args=(news.pk, 'rss'))
+    assert client.get(comment_url).status_code == 200
+    Comment.objects.create(news=news, author=author, text='Комментарий')
+    assert 'Комментарий' in client.get(comment_url).content.decode()
+    missing = reverse('news:comment_feed', args=(news.pk + 1000, 'json'))
+    assert client.get(missing).status_code == 404
+    with django_assert_num_queries(0):
+        assert client.get(missing).status_code == 404
+
+
+# Тест: комментарий, сохранённый другим процессом, сбрасывает ленту,
+# закэшированную этим
+def test_comment_feed_is_invalidated_by_other_workers(
+    client, news, author, settings, monkeypatch
+):
+    url = reverse('news:comment_feed', args=(news.pk, 'json'))
+    assert client.get(url).json()['items'] == []
+    other_worker = FileBasedCache(settings.CACHES['shared']['LOCATION'], {})
+    with monkeypatch.context() as patch:
+        patch.setattr(feeds, 'feed_cache', lambda: other_worker)
+        Comment.objects.create(news=news, author=author, text='Из B')
+    assert [item['content_text'] for item in client.get(url).json()['items']
+            ] == ['Из B']
+
+
+# Тест: скрипт живой ленты подключается, только если она включена
+@pytest.mark.parametrize('enabled', (False, True))
+def test_detail_connects_to_events_only_when_enabled(
+    client, news, settings, enabled
+):
+    settings.NEWS_EVENTS_ENABLED = enabled
+    response = client.get(reverse('news:detail', args=(news.pk,)))
+    assert ('data-events-url' in response.content.decode()) is enabled
+
+
+# Тест: шаблоны компилируются один раз на процесс и прогреваются заранее
+def test_templates_are_cached_and_warmed_up():
+    assert templating.warm_up() >= len(
+        templating.template_names(settings.BASE_DIR / 'templates')
+    )
+    engine = engines['django']
+    assert (engine.get_template('news/detail.html').template
+            is engine.get_template('news/detail.html').template)
+
+
+# Тест: Jinja2 включается для шаблонов из JINJA2_TEMPLATES
+def test_template_engine_follows_setting(settings):
+    view = NewsList()
+    assert view.template_engine is None
+    settings.JINJA2_TEMPLATES = ('news/home.html',)
+    assert view.template_engine == 'jinja2'
+
+
+# Тест: каждый шаблон Jinja2 рендерится через своё представление.
+# Не importorskip('jinja2'): без пакета каталог jinja2/ импортируется
+# как namespace-пакет, см. settings.JINJA2_INSTALLED
+@pytest.mark.skipif(not settings.JINJA2_INSTALLED,
+                    reason='jinja2 не установлен')
+def test_jinja2_templates_render_through_views(
+    author_client, news, comment, settings
+):
+    pages = ('news/home.html', 'news/detail.html')
+    assert set(templating.template_names(settings.BASE_DIR / 'jinja2')) == {
+        *pages, 'base.html', 'includes/header.html', 'includes/errors.html',
+    }
+    settings.JINJA2_TEMPLATES = pages
+    settings.NEWS_EVENTS_ENABLED = True
+    detail_url = reverse('news:detail', args=(news.pk,))
+    home = author_client.get(reverse('news:home'))
+    detail = author_client.get(detail_url)
+    invalid = author_client.post(detail_url, {'text': BAD_WORDS[0]})
+    for response in (home, detail, invalid):
+        assert response.status_code == 200
+        # Шаблоны Django сигналят о рендеринге, Jinja2 — нет.
+        assert not set(pages) & {
+            template.name for template in response.templates
+        }
+        assert 'Пользователь: ' in response.content.decode()
+    assert news.title in home.content.decode()
+    assert comment.text in detail.content.decode()
+    assert 'data-events-url' in detail.content.decode()
+    assert WARNING in invalid.content.decode()
+
+
+# Тест: замер памяти запроса попадает в Server-Timing
+def test_memory_is_reported_in_server_timing(client, news, settings):
+    settings.MEMORY_TRACKING_ENABLED = True
+    response = client.get(reverse('news:detail', args=(news.pk,)))
+    assert response['Server-Timing'].startswith('app;dur=')
+    assert 'mem;desc="peak ' in response['Server-Timing']
+
+
+# Тест: страница новости с сотней комментариев укладывается в бюджет
+# памяти. Бюджеты с запасом на первый запрос процесса (около 600 КиБ)
+@pytest.mark.memory_budget(1024, views=('news:detail',))
+def test_detail_memory_budget(client, news, author):
+    factories.make_comments([news], [author], 100)
+    client.get(reverse('news:detail', args=(news.pk,)))
+
+
+# Тест: главная на общем наборе данных укладывается в бюджет памяти
+@pytest.mark.memory_budget(512)
+def test_home_memory_budget(client, news_dataset, make_bulk_of_news):
+    client.get(reverse('news:home'))
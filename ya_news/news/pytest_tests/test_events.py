@@ -0,0 +1,141 @@
+import asyncio
+import json
+import socket
+import threading
+
+import pytest
+
+from news import events
+from news.events import (TEXT_LIMIT, InProcessBroker, SocketBroker,
+                         comment_event, get_broker)
+from news.models import Comment
+
+pytestmark = pytest.mark.django_db
+
+
+def collect_events(broker, news_id, subscribers, publish):
+    """
+    Подписывает `subscribers` клиентов и вызывает publish вне цикла событий.
+
+    Так же публикуют синхронные представления: из другого потока,
+    пока цикл событий занят своими делами.
+    """
+    async def subscribe():
+        return [broker.subscribe(news_id) for _ in range(subscribers)]
+
+    async def receive(subscriptions):
+        return await asyncio.gather(*(
+            asyncio.wait_for(subscription.queue.get(), 5)
+            for subscription in subscriptions
+        ))
+
+    loop = asyncio.new_event_loop()
+    try:
+        subscriptions = loop.run_until_complete(subscribe())
+        publish()
+        messages = loop.run_until_complete(receive(subscriptions))
+    finally:
+        loop.close()
+    for subscription in subscriptions:
+        broker.unsubscribe(subscription)
+    return messages
+
+
+# Тест: одно событие доходит до всех подписчиков новости
+def test_broker_fans_out_one_message(comment):
+    broker = InProcessBroker()
+    message = comment_event('created', comment)
+
+    def publish():
+        publisher = threading.Thread(
+            target=broker.publish, args=(comment.news_id, message)
+        )
+        publisher.start()
+        publisher.join()
+
+    messages = collect_events(broker, comment.news_id, 2000, publish)
+    assert len(messages) == 2000
+    assert all(received is message for received in messages)
+
+
+# Тест: медленный подписчик отключается, а не копит события
+def test_broker_drops_slow_subscriber(settings, news):
+    settings.NEWS_EVENTS_QUEUE_SIZE = 2
+    broker = InProcessBroker()
+
+    async def main():
+        subscription = broker.subscribe(news.pk)
+        for index in range(5):
+            broker.publish(news.pk, str(index).encode())
+        await asyncio.sleep(0)
+        return [subscription.queue.get_nowait()
+                for _ in range(subscription.queue.qsize())]
+
+    assert asyncio.run(main()) == [b'0', b'1', None]
+
+
+# Тест: создание, правка и удаление комментария публикуются после коммита
+def test_comment_changes_are_published(django_capture_on_commit_callbacks,
+                                       settings, news, author):
+    settings.NEWS_EVENTS_ENABLED = True
+
+    def change_comment():
+        with django_capture_on_commit_callbacks(execute=True):
+            comment = Comment.objects.create(
+                news=news, author=author, text='Первый'
+            )
+            comment.text = 'Второй'
+            comment.save()
+            comment.delete()
+
+    messages = collect_events(get_broker(), news.pk, 1, change_comment)
+    kind, data = messages[0].decode().split('\n')[:2]
+    assert kind == 'event: created'
+    assert json.loads(data.removeprefix('data: '))['text'] == 'Первый'
+
+
+# Тест: испорченный пакет не останавливает приём событий от соседей
+def test_socket_broker_survives_malformed_packet(settings, tmp_path, news):
+    settings.NEWS_EVENTS_SOCKET_DIR = tmp_path
+    broker = SocketBroker()
+
+    def publish():
+        sender = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        address = str(next(tmp_path.glob('*.sock')))
+        sender.sendto(b'no news id', address)
+        sender.sendto(b'abc\nnot a number', address)
+        sender.close()
+        broker.publish(news.pk, b'event: created\n\n')
+
+    messages = collect_events(broker, news.pk, 1, publish)
+    assert messages == [b'event: created\n\n']
+
+
+# Тест: без NEWS_EVENTS_ENABLED события даже не собираются
+def test_comment_events_are_skipped_when_disabled(
+    django_capture_on_commit_callbacks, monkeypatch, news, author
+):
+    built = []
+    monkeypatch.setattr(events, 'comment_event',
+                        lambda *args: built.append(args))
+    with django_capture_on_commit_callbacks(execute=True):
+        Comment.objects.create(news=news, author=author, text='Текст').delete()
+    assert built == []
+
+
+# Тест: длинный комментарий обрезается и проходит через сокет, а пакет
+# больше датаграммы доходит до своих подписчиков без ошибки
+def test_socket_broker_handles_long_events(settings, tmp_path, comment):
+    settings.NEWS_EVENTS_SOCKET_DIR = tmp_path
+    broker = SocketBroker()
+    comment.text = 'Длинный комментарий. ' * 10000
+    message = comment_event('created', comment)
+    huge = b'event: created\ndata: ' + b'x' * 300000 + b'\n\n'
+    trimmed, = collect_events(broker, comment.news_id, 1,
+                              lambda: broker.publish(comment.news_id, message))
+    data = trimmed.decode().split('\n')[1].removeprefix('data: ')
+    assert len(json.loads(data)['text']) == TEXT_LIMIT
+    assert collect_events(
+        broker, comment.news_id, 1,
+        lambda: broker.publish(comment.news_id, huge)
+    ) == [huge]
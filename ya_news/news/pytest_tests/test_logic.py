@@ -1,12 +1,24 @@
+import gc
+from datetime import date, timedelta
 from http import HTTPStatus
+from io import StringIO
 from random import choice
 
 import pytest
+from django.core.cache.backends.filebased import FileBasedCache
+from django.core.management import call_command
+from django.db import connection
+from django.db.models.signals import post_delete
+from django.test import Client
 from django.urls import reverse
+from django.utils import timezone
 from pytest_django.asserts import assertRedirects, assertFormError
 
+from news import backends, factories, purge, trending
 from news.forms import BAD_WORDS, WARNING
-from news.models import Comment
+from news.ingest import CommentQueue
+from news.models import Comment, News, NewsMonth, make_excerpt
+from yanews import loadtest, preload, ratelimit, startup
 
 pytestmark = pytest.mark.django_db
 
@@ -26,16 +38,10 @@ def test_anonymous_user_cant_create_comment(client, pk_from_news, form_data):
 # Тест: пользователь может создать комментарий
 def test_user_can_create_comment(admin_user, admin_client, news, form_data):
     url = reverse('news:detail', args=[news.pk])
-    # Удаляем все существующие комментарии,
-    # чтобы обеспечить пустое состояние базы данных
-    Comment.objects.all().delete()
-    initial_comment_count = Comment.objects.count()
     response = admin_client.post(url, data=form_data)
     expected_url = url + '#comments'
     assertRedirects(response, expected_url)
-    final_comment_count = Comment.objects.count()
-    assert initial_comment_count + 1 == final_comment_count
-    new_comment = Comment.objects.last()
+    new_comment = news.comment_set.get()
     assert new_comment.text == form_data['text']
     assert new_comment.news == news
     assert new_comment.author == admin_user
@@ -112,3 +118,280 @@ def test_other_user_cant_delete_comment(
     assert response.status_code == HTTPStatus.NOT_FOUND
     comment_exists = Comment.objects.filter(news_id=pk_from_news).exists()
     assert comment_exists is True
+
+
+# Тест: в режиме журнала комментарий виден автору до записи в базу
+def test_queued_comment_is_pending_until_flush(settings, tmp_path,
+                                               author_client, admin_client,
+                                               news, form_data):
+    settings.COMMENT_INGESTION = 'queue'
+    settings.COMMENT_QUEUE_PATH = tmp_path / 'queue.sqlite3'
+    url = reverse('news:detail', args=[news.pk])
+    response = author_client.post(url, data=form_data)
+    assertRedirects(response, url + '#comments')
+    assert not news.comment_set.exists()
+    pending = author_client.get(url).context['pending_comments']
+    assert [comment.text for comment in pending] == [form_data['text']]
+    assert not admin_client.get(url).context['pending_comments']
+    assert CommentQueue().drain() == 1
+    comment = news.comment_set.get()
+    assert comment.text == form_data['text']
+    assert comment.created == pending[0].created
+    assert not author_client.get(url).context['pending_comments']
+
+
+# Тест: краткое содержание новости обновляется при сохранении
+def test_news_excerpt_follows_text(news):
+    news.text = ' '.join(f'слово{index}' for index in range(20))
+    news.save()
+    news.refresh_from_db()
+    assert news.excerpt == ' '.join(
+        f'слово{index}' for index in range(15)
+    ) + ' …'
+    News.objects.filter(pk=news.pk).update(excerpt='')
+    call_command('backfill_news_excerpts', '--only-empty', stdout=StringIO())
+    news_excerpt = News.objects.values_list('excerpt', flat=True).get(
+        pk=news.pk
+    )
+    assert news_excerpt == news.excerpt
+
+
+def month_count(year, month):
+    counter = NewsMonth.objects.filter(year=year, month=month).first()
+    return counter.count if counter else 0
+
+
+# Тест: счётчики архива следуют за созданием, переносом и удалением новости
+def test_news_month_counters_follow_news():
+    news = News.objects.create(title='Архив', text='Текст',
+                               date=date(2001, 1, 15))
+    assert month_count(2001, 1) == 1
+    news = News.objects.get(pk=news.pk)
+    news.date = date(2001, 2, 1)
+    news.save()
+    assert (month_count(2001, 1), month_count(2001, 2)) == (0, 1)
+    News.objects.filter(pk=news.pk).delete()
+    assert month_count(2001, 2) == 0
+    NewsMonth.objects.rebuild()
+    assert not NewsMonth.objects.filter(year=2001).exists()
+
+
+# Тест: вычитание из месяца без счётчика не создаёт строку архива
+def test_news_month_shift_does_not_create_negative_months():
+    NewsMonth.objects.shift({(2001, 3): -1})
+    assert not NewsMonth.objects.filter(year=2001, month=3).exists()
+    NewsMonth.objects.shift({(2001, 3): 2})
+    assert month_count(2001, 3) == 2
+
+
+# Тест: «Обсуждаемое» следует за комментариями и кэшируется до изменений
+def test_trending_follows_comments(author, django_assert_num_queries):
+    trending.trending_cache().clear()
+    first, second = factories.make_news(2, prefix='Обсуждаемая')
+    comments = [
+        Comment.objects.create(news=item, author=author, text='Текст')
+        for item in (first, first, first, second, second)
+    ]
+    assert trending.top_news(24)[:2] == [
+        (first.pk, first.title, 3), (second.pk, second.title, 2)
+    ]
+    with django_assert_num_queries(0):
+        trending.top_news(24)
+    for comment in comments[:2]:
+        comment.delete()
+    assert trending.top_news(24)[:2] == [
+        (second.pk, second.title, 2), (first.pk, first.title, 1)
+    ]
+
+
+# Тест: комментарий из другого процесса сбрасывает закэшированный топ
+def test_trending_is_invalidated_by_other_workers(
+    author, news, settings, monkeypatch
+):
+    trending.trending_cache().clear()
+    assert trending.top_news(24) == []
+    other_worker = FileBasedCache(settings.CACHES['shared']['LOCATION'], {})
+    with monkeypatch.context() as patch:
+        patch.setattr(trending, 'trending_cache', lambda: other_worker)
+        Comment.objects.create(news=news, author=author, text='Из B')
+    assert trending.top_news(24) == [(news.pk, news.title, 1)]
+
+
+# Тест: сжатие удаляет ячейки за пределами самого длинного окна
+def test_trending_compaction_drops_old_buckets(author, news):
+    factories.make_comments(
+        [news], [author], 1, start=timezone.now() - timedelta(days=30)
+    )
+    assert trending.compact() >= 1
+    assert not news.commentbucket_set.exists()
+
+
+# Тест: задание удаления пользователя продолжается после сбоя
+def test_user_purge_resumes_after_crash(django_user_model, author, news):
+    factories.make_comments([news], [author], 7)
+    job, = purge.schedule([author])
+    assert not django_user_model.objects.get(pk=author.pk).is_active
+
+    def crash(job):
+        raise RuntimeError
+
+    with pytest.raises(RuntimeError):
+        purge.run(job, batch_size=3, progress=crash)
+    job.refresh_from_db()
+    assert (job.deleted, news.comment_set.count()) == (3, 4)
+    call_command('purge_users', '--batch-size=3', stdout=StringIO())
+    job.refresh_from_db()
+    assert job.deleted == 7 and job.finished is not None
+    assert not django_user_model.objects.filter(pk=author.pk).exists()
+
+
+# Тест: пачка удаляется без сигналов, но счётчики и ленты обновляются
+def test_user_purge_deletes_batches_without_signals(
+    django_capture_on_commit_callbacks, client, author, news
+):
+    trending.trending_cache().clear()
+    factories.make_comments(
+        [news], [author], 4, start=timezone.now() - timedelta(days=3)
+    )
+    assert trending.top_news(24 * 7)[0][2] == 4
+    feed_url = reverse('news:comment_feed', args=(news.pk, 'json'))
+    assert len(client.get(feed_url).json()['items']) == 4
+    deleted = []
+
+    def receiver(sender, instance, **kwargs):
+        deleted.append(instance.pk)
+
+    post_delete.connect(receiver, sender=Comment)
+    try:
+        job, = purge.schedule([author])
+        with django_capture_on_commit_callbacks(execute=True):
+            purge.run(job, batch_size=10)
+    finally:
+        post_delete.disconnect(receiver, sender=Comment)
+    assert deleted == [] and job.deleted == 4
+    assert trending.top_news(24 * 7) == []
+    assert client.get(feed_url).json()['items'] == []
+
+
+# Тест: удаление пользователя в админке только ставит его в очередь
+def test_admin_user_delete_schedules_purge(admin_client, author, comment):
+    url = reverse('admin:auth_user_delete', args=(author.pk,))
+    admin_client.post(url, {'post': 'yes'})
+    author.refresh_from_db()
+    assert not author.is_active
+    assert Comment.objects.filter(pk=comment.pk).exists()
+    assert purge.pending().filter(user_id=author.pk).exists()
+
+
+# Тест: длинный текст новости хранится обычной строкой и находится поиском
+def test_long_text_is_stored_plain(news):
+    long_text = 'Длинный текст новости. ' * 200
+    news.text = long_text
+    news.save()
+    with connection.cursor() as cursor:
+        cursor.execute('SELECT typeof(text) FROM news_news WHERE id = %s',
+                       [news.pk])
+        assert cursor.fetchone() == ('text',)
+    assert News.objects.filter(text__contains='текст новости').get() == news
+
+
+# Тест: отчёт нагрузочного теста — процентили по ближайшему рангу
+def test_loadtest_summary():
+    samples = [(index / 1000, index != 100) for index in range(1, 101)]
+    report = loadtest.summarize(samples, elapsed=2)
+    assert report['requests'] == 100
+    assert report['errors'] == 1
+    assert report['throughput'] == 50
+    assert report['latency_ms'] == {
+        'p50': 50, 'p95': 95, 'p99': 99, 'max': 100
+    }
+    assert loadtest.summarize([], elapsed=1)['latency_ms']['p99'] is None
+
+
+# Тест: комментарии сверх квоты получают 429 без обращений к базе
+def test_comments_are_rate_limited(
+    author, author_client, news, form_data, settings,
+    django_assert_num_queries
+):
+    settings.RATE_LIMITS = {'news:detail': (2, 60)}
+    url = reverse('news:detail', args=(news.pk,))
+    for _ in range(2):
+        assert author_client.post(url, data=form_data).status_code == (
+            HTTPStatus.FOUND
+        )
+    with django_assert_num_queries(0):
+        response = author_client.post(url, data=form_data)
+    assert response.status_code == HTTPStatus.TOO_MANY_REQUESTS
+    assert 0 < int(response['Retry-After']) <= 30
+    assert news.comment_set.count() == 2
+    assert author_client.get(url).status_code == HTTPStatus.OK
+    # Квота пользователя, а не сессии: новый вход её не сбрасывает.
+    other_session = Client()
+    other_session.force_login(author)
+    assert other_session.post(url, data=form_data).status_code == (
+        HTTPStatus.TOO_MANY_REQUESTS
+    )
+
+
+# Тест: вёдра общие для экземпляров над одним файлом и наполняются
+def test_token_buckets_are_shared(tmp_path):
+    path = tmp_path / 'buckets.bin'
+    first = ratelimit.TokenBuckets(path, 64)
+    second = ratelimit.TokenBuckets(path, 64)
+    assert first.take('user:1', 2, 10, now=100) == 0
+    assert second.take('user:1', 2, 10, now=100) == 0
+    assert first.take('user:1', 2, 10, now=100) == 5
+    assert second.take('user:1', 2, 10, now=105) == 0
+    assert first.take('user:2', 2, 10, now=105) == 0
+    first.close()
+    second.close()
+
+
+# Тест: разбор вывода -X importtime для bench_startup
+def test_startup_importtime_breakdown():
+    output = (
+        'import time: self [us] | cumulative | imported package\n'
+        'import time:       500 |        500 |   news.feeds\n'
+        'import time:      2000 |       2500 | news\n'
+        'import time:      1000 |       1000 | pytils\n'
+    )
+    modules = startup.parse_importtime(output)
+    assert modules == [('news.feeds', 500), ('news', 2000), ('pytils', 1000)]
+    assert startup.breakdown(modules, top=1) == {
+        'modules': 3,
+        'packages_ms': {'news': 2.5},
+        'slowest_ms': {'news': 2.0},
+    }
+
+
+# Тест: прогрев перед fork не обращается к базе и замораживает кучу
+def test_preload_does_not_touch_database(settings, django_assert_num_queries):
+    settings.PRELOAD_GC_FREEZE = True
+    try:
+        with django_assert_num_queries(0):
+            counts = preload.preload()
+    finally:
+        gc.unfreeze()
+    assert counts['urls'] > 0
+    assert counts['models'] > 0
+    assert counts['templates'] > 0
+    assert counts['frozen'] > 0
+
+
+# Тест: смена пароля сбрасывает пользователя и в кэше других процессов
+def test_password_change_invalidates_user_in_other_workers(author, settings):
+    other_worker = FileBasedCache(settings.CACHES['shared']['LOCATION'], {})
+    key = backends.user_cache_key(author.pk)
+    assert backends.CachedModelBackend().get_user(author.pk) == author
+    assert other_worker.get(key) == author
+    author.set_password('new-password')
+    author.save()
+    assert other_worker.get(key) is None
+
+
+# Тест: save(update_fields=['text']) сохраняет и новое начало текста
+def test_excerpt_follows_text_with_update_fields(news):
+    news.text = 'Совсем другой текст новости'
+    news.save(update_fields=['text'])
+    news.refresh_from_db()
+    assert news.excerpt == make_excerpt('Совсем другой текст новости')
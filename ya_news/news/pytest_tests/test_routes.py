@@ -1,9 +1,15 @@
 from http import HTTPStatus
+from io import StringIO
 
 import pytest
+from django.core.exceptions import MiddlewareNotUsed
+from django.core.management import call_command
 from django.urls import reverse
 from pytest_django.asserts import assertRedirects
 
+from news import querylog
+from yanews import profiling, requestlog
+
 
 @pytest.mark.django_db
 @pytest.mark.parametrize(
@@ -41,3 +47,83 @@ def test_protected_pages_redirect_to_login(client, page, args):
     url = reverse(page, args=args)
     response = client.get(url)
     assertRedirects(response, reverse('users:login') + f'?next={url}')
+
+
+# Тест: профилируются только запросы с подписанным заголовком
+@pytest.mark.django_db
+def test_profiling_header(client, settings, tmp_path):
+    settings.PROFILING_ENABLED = True
+    settings.PROFILING_DIR = tmp_path
+    url = reverse('news:home')
+    client.get(url, HTTP_X_PROFILE='unsigned')
+    assert not list(tmp_path.iterdir())
+    client.get(url, HTTP_X_PROFILE=profiling.sign())
+    files = {path.suffix: path for path in tmp_path.iterdir()}
+    assert set(files) == {'.prof', '.txt', '.collapsed'}
+    assert 'news-home' in files['.txt'].name
+    assert files['.txt'].read_text().startswith(f'GET {url} (news:home)')
+
+
+# Тест: выключенная middleware исключается из цепочки
+def test_profiling_disabled(settings):
+    settings.PROFILING_ENABLED = False
+    with pytest.raises(MiddlewareNotUsed):
+        profiling.ProfilingMiddleware(lambda request: None)
+
+
+# Тест: без SLOW_QUERY_MS middleware журнала исключается из цепочки
+def test_slow_query_log_disabled(settings):
+    settings.SLOW_QUERY_MS = None
+    with pytest.raises(MiddlewareNotUsed):
+        querylog.QueryLogMiddleware(lambda request: None)
+
+
+# Тест: медленные запросы попадают в журнал с представлением и планом
+@pytest.mark.django_db
+def test_slow_query_log(client, settings, tmp_path, news):
+    settings.SLOW_QUERY_MS = 0
+    settings.SLOW_QUERY_LOG = tmp_path / 'slow.jsonl'
+    querylog.install()
+    client.get(reverse('news:detail', args=(news.pk,)))
+    records = [record for record in querylog.read_log()
+               if record['sql'].startswith('SELECT')
+               and '"news_news"' in record['sql']]
+    assert records and records[0]['view'] == 'news:detail'
+    assert records[0]['plan']
+    assert str(news.pk) not in records[0]['sql']
+    out = StringIO()
+    call_command('slow_queries', stdout=out)
+    assert records[0]['fingerprint'] in out.getvalue()
+
+
+# Тест: журнал запросов обезличен и переводится в запросы к локальной базе
+@pytest.mark.django_db
+def test_request_log_is_anonymized(author_client, settings, tmp_path, news,
+                                   author):
+    settings.REQUEST_LOG_ENABLED = True
+    settings.REQUEST_LOG_RATE = 1
+    settings.REQUEST_LOG_PATH = tmp_path / 'requests.jsonl'
+    url = reverse('news:detail', args=(news.pk,))
+    author_client.get(url)
+    author_client.post(url, {'text': 'Секретный комментарий'})
+    author_client.get(reverse('news:archive', args=(2020, 1)) + '?page=1')
+    detail, comment, archive = records = requestlog.read_log()
+    assert (detail['v'], detail['m'], detail['u']) == (
+        'news:detail', 'GET', 'user'
+    )
+    assert detail['k']['pk'].startswith('#')
+    assert detail['i'] == comment['i'] != str(author.pk)
+    assert comment['d'] == {'text': len('Секретный комментарий')}
+    assert 'Секретный' not in settings.REQUEST_LOG_PATH.read_text()
+    assert (archive['k'], archive['q']) == ({'year': 2020, 'month': 1},
+                                            {'page': '1'})
+    entries, skipped = requestlog.plan(
+        records, {'user': [author]},
+        {('news:detail', 'pk'): lambda user: [news.pk]}
+    )
+    assert not skipped
+    assert [entry[2:5] for entry in entries] == [
+        (author, 'GET', url), (author, 'POST', url),
+        (author, 'GET', '/archive/2020/1/?page=1'),
+    ]
+    assert len(entries[1][5]['text']) == len('Секретный комментарий')
@@ -0,0 +1,126 @@
+"""
+Журнал медленных запросов.
+
+Обёртка выполнения запросов ставится на каждое соединение с базой
+и пишет в SLOW_QUERY_LOG (JSON Lines) каждый запрос дольше SLOW_QUERY_MS
+миллисекунд: представление, отпечаток SQL без значений, время и план
+EXPLAIN QUERY PLAN. Представление запоминает QueryLogMiddleware.
+Сводка по отпечаткам — команда slow_queries. SLOW_QUERY_MS = None
+выключает журнал, а с ним и middleware (MiddlewareNotUsed).
+"""
+import contextvars
+import hashlib
+import json
+import re
+import threading
+import time
+from pathlib import Path
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.utils import timezone
+
+current_view = contextvars.ContextVar('current_view', default='')
+_lock = threading.Lock()
+
+EXPLAINABLE = re.compile(r'^\s*(SELECT|INSERT|UPDATE|DELETE|WITH)\b', re.I)
+LITERALS = (
+    (re.compile(r"'(?:[^']|'')*'"), '?'),
+    (re.compile(r'(?<![\w"])-?\d+(?:\.\d+)?'), '?'),
+    (re.compile(r'%s'), '?'),
+    (re.compile(r'\bIN \((?:\?, )*\?\)', re.I), 'IN (...)'),
+    (re.compile(r'\s+'), ' '),
+)
+
+
+def normalize(sql):
+    """SQL без значений: запросы, отличающиеся только ими, совпадают."""
+    for pattern, replacement in LITERALS:
+        sql = pattern.sub(replacement, sql)
+    return sql.strip()
+
+
+def fingerprint(sql):
+    return hashlib.sha1(normalize(sql).encode()).hexdigest()[:12]
+
+
+def explain(connection, sql, params):
+    if connection.vendor != 'sqlite' or not EXPLAINABLE.match(sql):
+        return []
+    # Курсор без обёрток соединения: EXPLAIN не попадает в журнал сам.
+    cursor = connection.create_cursor()
+    try:
+        cursor.execute(f'EXPLAIN QUERY PLAN {sql}', params)
+        return [row[-1] for row in cursor.fetchall()]
+    finally:
+        cursor.close()
+
+
+def log_query(connection, sql, params, many, duration):
+    record = {
+        'time': timezone.now().isoformat(),
+        'view': current_view.get(),
+        'fingerprint': fingerprint(sql),
+        'ms': round(duration, 3),
+        'sql': normalize(sql),
+        'plan': [] if many else explain(connection, sql, params),
+    }
+    path = Path(settings.SLOW_QUERY_LOG)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    line = json.dumps(record, ensure_ascii=False) + '\n'
+    with _lock, path.open('a', encoding='utf-8') as log:
+        log.write(line)
+
+
+def log_slow_queries(execute, sql, params, many, context):
+    started = time.perf_counter()
+    result = execute(sql, params, many, context)
+    duration = (time.perf_counter() - started) * 1000
+    threshold = settings.SLOW_QUERY_MS
+    if threshold is not None and duration >= threshold:
+        log_query(context['connection'], sql, params, many, duration)
+    return result
+
+
+def add_wrapper(connection, **kwargs):
+    if log_slow_queries not in connection.execute_wrappers:
+        connection.execute_wrappers.append(log_slow_queries)
+
+
+def install():
+    """Вызывается из AppConfig.ready()."""
+    if settings.SLOW_QUERY_MS is None:
+        return
+    connection_created.connect(add_wrapper)
+    for connection in connections.all():
+        add_wrapper(connection)
+
+
+def read_log(path=None):
+    path = Path(path or settings.SLOW_QUERY_LOG)
+    if not path.exists():
+        return
+    with path.open(encoding='utf-8') as log:
+        for line in log:
+            yield json.loads(line)
+
+
+class QueryLogMiddleware:
+    """Запоминает представление для записей журнала."""
+
+    def __init__(self, get_response):
+        if settings.SLOW_QUERY_MS is None:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        token = current_view.set('')
+        try:
+            return self.get_response(request)
+        finally:
+            current_view.reset(token)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        current_view.set(request.resolver_match.view_name)
@@ -0,0 +1,91 @@
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.signals import user_logged_out
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from . import events, feeds, trending
+from .backends import forget_user
+from .models import Comment, CommentBucket, News, NewsMonth
+
+User = get_user_model()
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def invalidate_cached_user(sender, instance, **kwargs):
+    """Смена пароля и любые правки пользователя проходят через save()."""
+    forget_user(instance.pk)
+
+
+@receiver(user_logged_out)
+def invalidate_cached_user_on_logout(sender, user, **kwargs):
+    if user is not None:
+        forget_user(user.pk)
+
+
+def publish_on_commit(news_id, message):
+    transaction.on_commit(
+        lambda: events.get_broker().publish(news_id, message)
+    )
+
+
+@receiver(post_save, sender=Comment)
+def count_comment(sender, instance, created, **kwargs):
+    if created and CommentBucket.objects.add([instance]):
+        trending.bump_version()
+
+
+@receiver(post_delete, sender=Comment)
+def uncount_comment(sender, instance, **kwargs):
+    if CommentBucket.objects.add([instance], delta=-1):
+        trending.bump_version()
+
+
+@receiver(post_save, sender=Comment)
+def publish_comment_saved(sender, instance, created, **kwargs):
+    if not settings.NEWS_EVENTS_ENABLED:
+        return
+    kind = 'created' if created else 'updated'
+    publish_on_commit(instance.news_id, events.comment_event(kind, instance))
+
+
+@receiver(post_delete, sender=Comment)
+def publish_comment_deleted(sender, instance, **kwargs):
+    if not settings.NEWS_EVENTS_ENABLED:
+        return
+    publish_on_commit(
+        instance.news_id, events.comment_event('deleted', instance)
+    )
+
+
+@receiver(post_save, sender=News)
+def count_news_month(sender, instance, created, **kwargs):
+    old_date = getattr(instance, 'loaded_date', None)
+    if created:
+        NewsMonth.objects.add([instance.date])
+    elif old_date and (old_date.year, old_date.month) != (
+        instance.date.year, instance.date.month
+    ):
+        NewsMonth.objects.add([old_date], delta=-1)
+        NewsMonth.objects.add([instance.date])
+    instance.loaded_date = instance.date
+
+
+@receiver(post_delete, sender=News)
+def uncount_news_month(sender, instance, **kwargs):
+    date = getattr(instance, 'loaded_date', None) or instance.date
+    NewsMonth.objects.add([date], delta=-1)
+
+
+@receiver(post_save, sender=News)
+@receiver(post_delete, sender=News)
+def forget_news_feeds(sender, instance, **kwargs):
+    feeds.forget_news(instance.pk)
+
+
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+def forget_comment_feed(sender, instance, **kwargs):
+    feeds.forget_comments([instance.news_id])
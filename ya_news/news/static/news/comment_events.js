@@ -0,0 +1,29 @@
+// Живая лента: новые, изменённые и удалённые комментарии без перезагрузки.
+// Адрес потока событий — в data-events-url тега <script>.
+(() => {
+  const comments = document.getElementById('comment-list');
+  const source = new EventSource(document.currentScript.dataset.eventsUrl);
+  const render = (node, comment) => {
+    node.id = 'comment-' + comment.id;
+    node.innerHTML = '<b></b>, <span></span><p class="mb-0 comment-text"></p>';
+    node.querySelector('b').textContent = comment.author;
+    node.querySelector('span').textContent = new Date(comment.created).toLocaleString();
+    node.querySelector('p').textContent = comment.text;
+  };
+  source.addEventListener('created', (event) => {
+    const comment = JSON.parse(event.data);
+    if (document.getElementById('comment-' + comment.id)) return;
+    const node = document.createElement('div');
+    render(node, comment);
+    comments.append(node, document.createElement('br'));
+  });
+  source.addEventListener('updated', (event) => {
+    const comment = JSON.parse(event.data);
+    const node = document.getElementById('comment-' + comment.id);
+    if (node) node.querySelector('.comment-text').textContent = comment.text;
+  });
+  source.addEventListener('deleted', (event) => {
+    const node = document.getElementById('comment-' + JSON.parse(event.data).id);
+    if (node) node.remove();
+  });
+})();
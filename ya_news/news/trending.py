@@ -0,0 +1,83 @@
+"""
+Блок «Обсуждаемое»: новости с наибольшим числом комментариев за окно.
+
+Комментарии считаются в часовых ячейках CommentBucket, которые
+обновляются при создании и удалении комментария. Топ окна хранится
+в кэше под ключом, включающим текущий час и версию ячеек: он
+пересчитывается только после изменения ячеек или смены часа. Кэш
+TRENDING_CACHE_ALIAS общий для всех процессов: комментарий, очередь
+или purge_users в любом из них сбрасывают топ во всех.
+"""
+import time as clock
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db.models import Sum
+from django.utils import timezone
+
+from .models import CommentBucket, News, hour_of
+
+VERSION_KEY = 'trending:version'
+
+
+def trending_cache():
+    return caches[settings.TRENDING_CACHE_ALIAS]
+
+
+def bump_version():
+    """Сбрасывает закэшированные топы всех окон."""
+    try:
+        trending_cache().incr(VERSION_KEY)
+    except ValueError:
+        current_version()
+
+
+def current_version():
+    """
+    Версия ячеек. Вытесненная версия заводится заново от часов, чтобы
+    не совпасть с версией топов, ещё лежащих в кэше.
+    """
+    cache = trending_cache()
+    version = cache.get(VERSION_KEY)
+    if version is None:
+        cache.add(VERSION_KEY, clock.time_ns(), None)
+        version = cache.get(VERSION_KEY)
+    return version
+
+
+def top_news(hours, limit=None):
+    """[(pk, заголовок, комментариев)] за последние `hours` часов."""
+    limit = limit or settings.TRENDING_SIZE
+    current_hour = hour_of(timezone.now())
+    cache = trending_cache()
+    version = current_version()
+    key = f'trending:{hours}:{limit}:{current_hour:%Y%m%d%H}:{version}'
+    top = cache.get(key)
+    if top is None:
+        counts = list(
+            CommentBucket.objects.filter(
+                hour__gt=current_hour - timedelta(hours=hours),
+                hour__lte=current_hour,
+            ).values('news').annotate(
+                total=Sum('count')
+            ).filter(total__gt=0).order_by('-total', 'news')[:limit]
+        )
+        titles = dict(News.objects.filter(
+            pk__in=[row['news'] for row in counts]
+        ).values_list('pk', 'title'))
+        top = [(row['news'], titles[row['news']], row['total'])
+               for row in counts if row['news'] in titles]
+        cache.set(key, top, 60 * 60)
+    return top
+
+
+def compact(now=None):
+    """Удаляет ячейки старше самого длинного окна."""
+    hours = max(settings.TRENDING_WINDOWS.values())
+    deleted, _ = CommentBucket.objects.filter(
+        hour__lte=hour_of(now or timezone.now()) - timedelta(hours=hours)
+    ).delete()
+    if deleted:
+        bump_version()
+    return deleted
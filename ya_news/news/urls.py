@@ -1,12 +1,36 @@
-from django.urls import path
+from django.urls import path, register_converter
 
 from news import views
 
+
+class FeedFormatConverter:
+    regex = 'json|rss|atom'
+
+    def to_python(self, value):
+        return value
+
+    def to_url(self, value):
+        return value
+
+
+register_converter(FeedFormatConverter, 'feed')
+
 app_name = 'news'
 
 urlpatterns = [
     path('', views.NewsList.as_view(), name='home'),
     path('news/<int:pk>/', views.NewsDetailView.as_view(), name='detail'),
+    path('feeds/news.<feed:fmt>', views.FeedView.as_view(), name='feed'),
+    path(
+        'news/<int:pk>/comments.<feed:fmt>',
+        views.CommentFeedView.as_view(),
+        name='comment_feed'
+    ),
+    path(
+        'archive/<int:year>/<int:month>/',
+        views.NewsArchive.as_view(),
+        name='archive'
+    ),
     path(
         'delete_comment/<int:pk>/',
         views.CommentDelete.as_view(),
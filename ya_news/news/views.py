@@ -1,14 +1,19 @@
 from django.conf import settings
 from django.contrib.auth.mixins import LoginRequiredMixin
+from django.http import Http404, HttpResponse
 from django.shortcuts import get_object_or_404
 from django.urls import reverse
+from django.utils.cache import get_conditional_response
 from django.views import generic
 
+from yanews.templating import TemplateEngineMixin
+
+from . import feeds, ingest, trending
 from .forms import CommentForm
-from .models import Comment, News
+from .models import Comment, News, NewsMonth
 
 
-class NewsList(generic.ListView):
+class NewsList(TemplateEngineMixin, generic.ListView):
     """Список новостей."""
     model = News
     template_name = 'news/home.html'
@@ -18,13 +23,67 @@ class NewsList(generic.ListView):
         Выводим только несколько последних новостей.
 
         Их количество определяется в настройках проекта.
+        Полный текст не загружается: на главной выводится excerpt.
         """
-        return self.model.objects.prefetch_related(
+        return self.model.objects.defer('text').prefetch_related(
             'comment_set'
         )[:settings.NEWS_COUNT_ON_HOME_PAGE]
 
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['trending'] = {
+            name: trending.top_news(hours)
+            for name, hours in settings.TRENDING_WINDOWS.items()
+        }
+        return context
+
+
+class FeedView(generic.View):
+    """Лента из кэша feeds: база читается только после изменений."""
+
+    def get_payload(self, fmt, base):
+        return feeds.get_news_feed(fmt, base)
+
+    def get(self, request, fmt, **kwargs):
+        payload = self.get_payload(fmt, request.build_absolute_uri('/')[:-1])
+        if payload is None:
+            raise Http404
+        body, etag = payload
+        response = get_conditional_response(request, etag=etag)
+        if response is None:
+            response = HttpResponse(
+                body, content_type=feeds.CONTENT_TYPES[fmt]
+            )
+        response['ETag'] = etag
+        return response
+
+
+class CommentFeedView(FeedView):
+
+    def get_payload(self, fmt, base):
+        return feeds.get_comment_feed(self.kwargs['pk'], fmt, base)
+
+
+class NewsArchive(generic.MonthArchiveView):
+    """Новости за месяц."""
+    model = News
+    date_field = 'date'
+    month_format = '%m'
+    allow_empty = True
+    paginate_by = settings.NEWS_COUNT_ON_HOME_PAGE
+    template_name = 'news/archive.html'
+
+    def get_queryset(self):
+        return self.model.objects.defer('text')
+
+    def get_context_data(self, **kwargs):
+        """Навигация по месяцам берётся из готовых счётчиков NewsMonth."""
+        context = super().get_context_data(**kwargs)
+        context['months'] = NewsMonth.objects.filter(count__gt=0)
+        return context
+
 
-class NewsDetail(generic.DetailView):
+class NewsDetail(TemplateEngineMixin, generic.DetailView):
     model = News
     template_name = 'news/detail.html'
 
@@ -37,13 +96,19 @@ class NewsDetail(generic.DetailView):
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
+        context['events_enabled'] = settings.NEWS_EVENTS_ENABLED
         if self.request.user.is_authenticated:
             context['form'] = CommentForm()
+            if ingest.is_enabled():
+                context['pending_comments'] = ingest.CommentQueue().pending(
+                    self.object, self.request.user
+                )
         return context
 
 
 class NewsComment(
         LoginRequiredMixin,
+        TemplateEngineMixin,
         generic.detail.SingleObjectMixin,
         generic.FormView
 ):
@@ -59,7 +124,10 @@ class NewsComment(
         comment = form.save(commit=False)
         comment.news = self.object
         comment.author = self.request.user
-        comment.save()
+        if ingest.is_enabled():
+            ingest.CommentQueue().enqueue(comment)
+        else:
+            comment.save()
         return super().form_valid(form)
 
     def get_success_url(self):
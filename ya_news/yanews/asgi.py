@@ -9,8 +9,20 @@ https://docs.djangoproject.com/en/3.2/howto/deployment/asgi/
 
 import os
 
+from django.conf import settings
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'yanews.settings')
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+from news.events import EVENTS_PATH, events_app  # noqa: E402
+
+
+async def application(scope, receive, send):
+    """Живая лента комментариев обслуживается в обход Django."""
+    if (settings.NEWS_EVENTS_ENABLED and scope['type'] == 'http'
+            and EVENTS_PATH.match(scope['path'])):
+        await events_app(scope, receive, send)
+    else:
+        await django_application(scope, receive, send)
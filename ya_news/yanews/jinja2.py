@@ -0,0 +1,32 @@
+"""Окружение Jinja2 для шаблонов из каталога jinja2/."""
+from pathlib import Path
+
+from django.conf import settings
+from django.template.defaultfilters import linebreaksbr
+from django.templatetags.static import static
+from django.urls import reverse
+from django.utils import formats
+from django.utils.timezone import template_localtime
+from jinja2 import Environment, FileSystemBytecodeCache
+
+
+def url(name, *args, **kwargs):
+    return reverse(name, args=args, kwargs=kwargs)
+
+
+def localize(value):
+    """Дата и время так же, как {{ value }} в шаблоне Django."""
+    return formats.localize(template_localtime(value))
+
+
+def environment(**options):
+    if settings.JINJA2_BYTECODE_CACHE:
+        # Скомпилированные шаблоны общие для всех процессов.
+        path = Path(settings.JINJA2_BYTECODE_CACHE)
+        path.mkdir(parents=True, exist_ok=True)
+        options.setdefault('bytecode_cache',
+                           FileSystemBytecodeCache(str(path)))
+    env = Environment(**options)
+    env.globals.update(url=url, static=static)
+    env.filters.update(linebreaksbr=linebreaksbr, localize=localize)
+    return env
@@ -0,0 +1,247 @@
+"""
+Нагрузочное тестирование приложения.
+
+Виртуальные пользователи — потоки, каждый из которых до истечения
+времени выполняет сценарии: функции scenario(session, rng), которые
+делают запросы через session.get() и session.post() от имени
+session.user. Время каждого запроса записывается под именем шага.
+
+Приложение работает либо в том же процессе (django.test.Client), либо
+в рабочих процессах: yanews.wsgi загружается до fork (и прогревается
+при WSGI_PRELOAD), каждый процесс обслуживает его на своём порту
+многопоточным сервером wsgiref, а пользователи распределяются по ним
+по кругу. Пользователи входят через force_login до начала замеров,
+в рабочие процессы сессия попадает через базу (cached_db).
+"""
+import http.client
+import math
+import multiprocessing
+import random
+import socketserver
+import threading
+import time
+from collections import defaultdict
+from http.cookies import SimpleCookie
+from urllib.parse import urlencode
+from wsgiref.simple_server import WSGIRequestHandler, WSGIServer, make_server
+
+from django.conf import settings
+from django.db import connections
+from django.http import HttpRequest
+from django.middleware.csrf import get_token
+from django.test import Client
+
+HOST = '127.0.0.1'
+
+
+def percentile(values, q):
+    """Процентиль q по отсортированным значениям (ближайший ранг)."""
+    if not values:
+        return None
+    rank = max(math.ceil(q / 100 * len(values)), 1)
+    return values[rank - 1]
+
+
+def summarize(samples, elapsed):
+    """Число запросов, ошибок, запросы в секунду и задержки в мс."""
+    latencies = sorted(seconds * 1000 for seconds, _ in samples)
+    return {
+        'requests': len(samples),
+        'errors': sum(1 for _, ok in samples if not ok),
+        'throughput': round(len(samples) / elapsed, 2) if elapsed else None,
+        'latency_ms': {
+            name: round(percentile(latencies, q), 3) if latencies else None
+            for name, q in (('p50', 50), ('p95', 95), ('p99', 99),
+                            ('max', 100))
+        },
+    }
+
+
+class Session:
+    """Запросы одного виртуального пользователя с замером времени."""
+
+    def __init__(self, samples, user):
+        self.samples = samples
+        self.user = user
+
+    def get(self, step, path):
+        return self.measure(step, 'GET', path)
+
+    def post(self, step, path, data):
+        return self.measure(step, 'POST', path, data)
+
+    def measure(self, step, method, path, data=None):
+        started = time.perf_counter()
+        try:
+            status, body = self.request(method, path, data)
+        except (OSError, http.client.HTTPException):
+            status, body = None, b''
+        self.samples[step].append(
+            (time.perf_counter() - started,
+             status is not None and status < 400)
+        )
+        return status, body
+
+
+class ClientSession(Session):
+    """Приложение в том же процессе."""
+
+    def __init__(self, samples, user):
+        super().__init__(samples, user)
+        self.client = Client(raise_request_exception=False,
+                             HTTP_HOST=HOST)
+        if user is not None:
+            self.client.force_login(user)
+
+    def request(self, method, path, data):
+        if method == 'GET':
+            response = self.client.get(path)
+        else:
+            response = self.client.post(path, data)
+        return response.status_code, response.content
+
+
+def login_cookies(user):
+    """Cookie сессии и CSRF для пользователя: вход без формы логина."""
+    cookies = {}
+    if user is not None:
+        client = Client()
+        client.force_login(user)
+        cookies.update(
+            (name, morsel.value) for name, morsel in client.cookies.items()
+        )
+    request = HttpRequest()
+    token = get_token(request)
+    cookies[settings.CSRF_COOKIE_NAME] = request.META['CSRF_COOKIE']
+    return cookies, token
+
+
+class HttpSession(Session):
+    """Приложение в рабочем процессе, запросы по HTTP."""
+
+    def __init__(self, samples, user, address):
+        super().__init__(samples, user)
+        self.address = address
+        self.cookies, self.csrf_token = login_cookies(user)
+
+    def request(self, method, path, data):
+        headers = {
+            'Cookie': '; '.join(
+                f'{name}={value}' for name, value in self.cookies.items()
+            ),
+        }
+        body = None
+        if method == 'POST':
+            body = urlencode(data)
+            headers['Content-Type'] = 'application/x-www-form-urlencoded'
+            headers['X-CSRFToken'] = self.csrf_token
+        connection = http.client.HTTPConnection(*self.address, timeout=30)
+        try:
+            connection.request(method, path, body, headers)
+            response = connection.getresponse()
+            content = response.read()
+        finally:
+            connection.close()
+        for header in response.headers.get_all('Set-Cookie') or ():
+            self.cookies.update(
+                (name, morsel.value)
+                for name, morsel in SimpleCookie(header).items()
+            )
+        return response.status, content
+
+
+class ThreadingWSGIServer(socketserver.ThreadingMixIn, WSGIServer):
+    daemon_threads = True
+
+
+class QuietHandler(WSGIRequestHandler):
+
+    def log_message(self, *args):
+        pass
+
+
+def serve(application, ports):
+    server = make_server(HOST, 0, application,
+                         server_class=ThreadingWSGIServer,
+                         handler_class=QuietHandler)
+    ports.put(server.server_port)
+    server.serve_forever()
+
+
+def start_workers(count):
+    """
+    Рабочие процессы с приложением; возвращает (процессы, адреса).
+
+    Процессы порождаются через fork и наследуют прогретое приложение
+    и настройки баз, в том числе временные базы команды; открытые
+    соединения закрываются заранее.
+    """
+    from yanews.wsgi import application
+
+    connections.close_all()
+    context = multiprocessing.get_context('fork')
+    ports = context.Queue()
+    workers = [
+        context.Process(target=serve, args=(application, ports), daemon=True)
+        for _ in range(count)
+    ]
+    for worker in workers:
+        worker.start()
+    addresses = [(HOST, ports.get(timeout=30)) for _ in workers]
+    return workers, addresses
+
+
+def run(scenarios, users, duration, workers=0, seed=0):
+    """
+    Нагрузка `users` пользователями в течение `duration` секунд.
+
+    scenarios — [(сценарий, вес)], users — объекты User или None для
+    анонимов. Возвращает отчёт: итог и задержки по шагам.
+    """
+    samples = defaultdict(list)
+    processes, addresses = start_workers(workers) if workers else ([], [])
+    try:
+        sessions = [
+            HttpSession(samples, user, addresses[index % workers])
+            if workers else ClientSession(samples, user)
+            for index, user in enumerate(users)
+        ]
+        functions, weights = zip(*scenarios)
+        deadline = time.perf_counter() + duration
+
+        def virtual_user(session, rng):
+            try:
+                while time.perf_counter() < deadline:
+                    rng.choices(functions, weights)[0](session, rng)
+            finally:
+                connections.close_all()
+
+        threads = [
+            threading.Thread(target=virtual_user,
+                             args=(session, random.Random(seed + index)))
+            for index, session in enumerate(sessions)
+        ]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+    finally:
+        for process in processes:
+            process.terminate()
+            process.join()
+    report = {
+        'mode': 'workers' if workers else 'in-process',
+        'workers': workers,
+        'users': len(users),
+        'duration': round(elapsed, 3),
+    }
+    report.update(summarize(
+        [sample for step in samples.values() for sample in step], elapsed
+    ))
+    report['steps'] = {
+        step: summarize(step_samples, elapsed)
+        for step, step_samples in sorted(samples.items())
+    }
+    return report
@@ -0,0 +1,80 @@
+"""
+Замер памяти запросов.
+
+MemoryMiddleware включается настройкой MEMORY_TRACKING_ENABLED (при
+False Django исключает её из цепочки) и для доли MEMORY_TRACKING_RATE
+запросов включает tracemalloc на время обработки. Пик памяти,
+выделенной запросом, и остаток после него попадают в заголовок
+Server-Timing рядом со временем ответа, в журнал запросов (поле "kb")
+и в сигнал request_measured — по нему тесты с меткой memory_budget
+сверяют пик с бюджетом.
+
+tracemalloc один на процесс, поэтому замеряемые запросы выполняются
+по одному, а выделения параллельных незамеряемых потоков попадают
+в пик. Точные цифры даёт один поток: runserver --nothreading.
+"""
+import random
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.dispatch import Signal
+
+# Аргументы: view (имя URL или None), peak и retained в байтах.
+request_measured = Signal()
+_lock = threading.Lock()
+
+
+@contextmanager
+def tracing():
+    """
+    Замер памяти блока: по выходе в словаре peak и retained — байты,
+    выделенные сверх уже занятых, в максимуме и после блока.
+    """
+    usage = {}
+    with _lock:
+        running = tracemalloc.is_tracing()
+        if running:
+            tracemalloc.reset_peak()
+        else:
+            tracemalloc.start()
+        baseline = tracemalloc.get_traced_memory()[0]
+        try:
+            yield usage
+            current, peak = tracemalloc.get_traced_memory()
+            usage['peak'] = max(peak - baseline, 0)
+            usage['retained'] = max(current - baseline, 0)
+        finally:
+            if not running:
+                tracemalloc.stop()
+
+
+class MemoryMiddleware:
+
+    def __init__(self, get_response):
+        if not settings.MEMORY_TRACKING_ENABLED:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if random.random() >= settings.MEMORY_TRACKING_RATE:
+            return self.get_response(request)
+        with tracing() as usage:
+            started = time.perf_counter()
+            response = self.get_response(request)
+            duration = time.perf_counter() - started
+        request.memory = usage
+        match = getattr(request, 'resolver_match', None)
+        request_measured.send(
+            sender=self.__class__, view=match.view_name if match else None,
+            **usage,
+        )
+        response['Server-Timing'] = (
+            f'app;dur={duration * 1000:.1f}, '
+            f'mem;desc="peak {usage["peak"] // 1024} KiB, '
+            f'retained {usage["retained"] // 1024} KiB"'
+        )
+        return response
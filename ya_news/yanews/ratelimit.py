@@ -0,0 +1,143 @@
+"""
+Ограничение частоты записей.
+
+RateLimitMiddleware до вызова представления проверяет POST-запросы
+к маршрутам из RATE_LIMITS = {имя URL: (запросов, секунд)}: у каждого
+пользователя своё ведро токенов ёмкостью «запросов», которое наполняется
+за «секунд», общее для всех его сессий; у анонима ведро по IP. Поэтому
+middleware стоит после AuthenticationMiddleware: пользователь берётся
+из кэша CachedModelBackend. Запрос сверх квоты получает 429
+с Retry-After до формы и записи в базу.
+
+Вёдра лежат в файле RATE_LIMIT_PATH, отображённом в память (mmap),
+поэтому общие для всех рабочих процессов и не требуют запросов к базе.
+Файл — открытая адресация на RATE_LIMIT_SLOTS ячеек; при переполнении
+вытесняется самое давнее ведро, то есть квота сбрасывается в пользу
+клиента. Доступ сериализует flock.
+"""
+import fcntl
+import hashlib
+import math
+import mmap
+import os
+import struct
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+from django.conf import settings
+from django.http import HttpResponse
+
+# Хэш ключа, остаток токенов, время последнего обновления.
+SLOT = struct.Struct('<Qdd')
+PROBES = 8
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS', 'TRACE')
+
+
+def key_hash(key):
+    digest = hashlib.blake2b(key.encode(), digest_size=8).digest()
+    # Нулевой хэш означает пустую ячейку.
+    return int.from_bytes(digest, 'little') or 1
+
+
+class TokenBuckets:
+
+    def __init__(self, path, slots):
+        self.path = Path(path)
+        self.slots = slots
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o600)
+        size = slots * SLOT.size
+        if os.fstat(self.fd).st_size < size:
+            os.ftruncate(self.fd, size)
+        self.map = mmap.mmap(self.fd, size)
+        # flock не разделяет потоки одного процесса.
+        self.lock = threading.Lock()
+
+    def close(self):
+        self.map.close()
+        os.close(self.fd)
+
+    @contextmanager
+    def locked(self):
+        with self.lock:
+            fcntl.flock(self.fd, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(self.fd, fcntl.LOCK_UN)
+
+    def find(self, hashed):
+        """Ячейка ключа, пустая ячейка или самое давнее ведро."""
+        oldest = None
+        for probe in range(PROBES):
+            index = (hashed + probe) % self.slots
+            stored, _, updated = SLOT.unpack_from(self.map,
+                                                  index * SLOT.size)
+            if stored in (hashed, 0):
+                return index
+            if oldest is None or updated < oldest[1]:
+                oldest = (index, updated)
+        return oldest[0]
+
+    def take(self, key, capacity, period, now=None):
+        """Забирает токен; 0 или сколько секунд ждать следующего."""
+        now = time.time() if now is None else now
+        rate = capacity / period
+        hashed = key_hash(key)
+        with self.locked():
+            offset = self.find(hashed) * SLOT.size
+            stored, tokens, updated = SLOT.unpack_from(self.map, offset)
+            if stored != hashed:
+                tokens, updated = capacity, now
+            tokens = min(capacity, tokens + max(now - updated, 0) * rate)
+            wait = 0 if tokens >= 1 else (1 - tokens) / rate
+            SLOT.pack_into(self.map, offset, hashed,
+                           tokens if wait else tokens - 1, now)
+        return wait
+
+
+_buckets = None
+
+
+def get_buckets():
+    """Вёдра текущего процесса; после fork и смены пути открываются заново."""
+    global _buckets
+    key = (os.getpid(), Path(settings.RATE_LIMIT_PATH))
+    if _buckets is None or _buckets[0] != key:
+        if _buckets is not None and _buckets[0][0] == key[0]:
+            _buckets[1].close()
+        _buckets = (key, TokenBuckets(key[1], settings.RATE_LIMIT_SLOTS))
+    return _buckets[1]
+
+
+def client_key(request):
+    if request.user.is_authenticated:
+        return f'user:{request.user.pk}'
+    return f'ip:{request.META.get("REMOTE_ADDR", "")}'
+
+
+class RateLimitMiddleware:
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        return self.get_response(request)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if request.method in SAFE_METHODS:
+            return None
+        view_name = request.resolver_match.view_name
+        quota = settings.RATE_LIMITS.get(view_name)
+        if quota is None:
+            return None
+        wait = get_buckets().take(f'{view_name}:{client_key(request)}',
+                                  *quota)
+        if not wait:
+            return None
+        response = HttpResponse('Слишком много запросов, попробуйте позже.',
+                                status=429)
+        response['Retry-After'] = str(math.ceil(wait))
+        return response
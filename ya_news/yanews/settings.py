@@ -21,23 +21,38 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'yanews.profiling.ProfilingMiddleware',
+    'yanews.requestlog.RequestLogMiddleware',
+    'yanews.memory.MemoryMiddleware',
+    'news.querylog.QueryLogMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'yanews.ratelimit.RateLimitMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
 ROOT_URLCONF = 'yanews.urls'
 
+# Шаблоны компилируются один раз на процесс и прогреваются в wsgi.py,
+# см. yanews/templating.py.
+TEMPLATE_LOADERS = [
+    'django.template.loaders.filesystem.Loader',
+    'django.template.loaders.app_directories.Loader',
+]
+
 TEMPLATES = [
     {
         'BACKEND': 'django.template.backends.django.DjangoTemplates',
         'DIRS': [BASE_DIR / 'templates'],
-        'APP_DIRS': True,
+        'APP_DIRS': False,
         'OPTIONS': {
+            'loaders': [
+                ('django.template.loaders.cached.Loader', TEMPLATE_LOADERS),
+            ],
             'context_processors': [
                 'django.template.context_processors.debug',
                 'django.template.context_processors.request',
@@ -48,6 +63,35 @@ TEMPLATES = [
     },
 ]
 
+# Необязательный Jinja2: шаблоны с именами из JINJA2_TEMPLATES берутся
+# из каталога jinja2/ (при установленном пакете jinja2).
+JINJA2_TEMPLATES = ()
+JINJA2_BYTECODE_CACHE = BASE_DIR / '.jinja2_cache'
+try:
+    from jinja2 import Environment  # noqa: F401
+except ImportError:
+    # Без пакета каталог шаблонов jinja2/ виден как пустой
+    # namespace-пакет, поэтому проверяется импорт, а не find_spec.
+    JINJA2_INSTALLED = False
+else:
+    JINJA2_INSTALLED = True
+if JINJA2_INSTALLED:
+    TEMPLATES.append({
+        'BACKEND': 'django.template.backends.jinja2.Jinja2',
+        'DIRS': [BASE_DIR / 'jinja2'],
+        'APP_DIRS': False,
+        'OPTIONS': {
+            'environment': 'yanews.jinja2.environment',
+            'auto_reload': DEBUG,
+            'context_processors': [
+                'django.template.context_processors.request',
+                'django.contrib.auth.context_processors.auth',
+            ],
+        },
+    })
+
+TEMPLATE_WARMUP = True
+
 WSGI_APPLICATION = 'yanews.wsgi.application'
 
 
@@ -59,6 +103,38 @@ DATABASES = {
 }
 
 
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    # Общий для всех рабочих процессов: сброс сессии или пользователя
+    # в одном процессе виден остальным.
+    'shared': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': BASE_DIR / 'run' / 'cache',
+        # Сессии, пользователи и ленты: при 300 записях по умолчанию
+        # файлы вытеснялись бы уже на сотне новостей.
+        'OPTIONS': {'MAX_ENTRIES': 10000},
+    },
+}
+
+# Сессия и пользователь читаются из кэша, а не из БД на каждом запросе.
+# Для хранения сессий только в БД укажите
+# 'django.contrib.sessions.backends.db' и 'django.contrib.auth.backends.ModelBackend'.
+SESSION_ENGINE = 'django.contrib.sessions.backends.cached_db'
+SESSION_CACHE_ALIAS = 'shared'
+
+AUTHENTICATION_BACKENDS = ['news.backends.CachedModelBackend']
+
+USER_CACHE_ALIAS = 'shared'
+USER_CACHE_TIMEOUT = 60 * 5
+
+TEST_RUNNER = 'yanews.testdb.SnapshotDiscoverRunner'
+
+# Снимки схемы тестовой БД, см. yanews/testdb.py.
+TEST_DB_CACHE_DIR = BASE_DIR / '.test_db_cache'
+
+
 AUTH_PASSWORD_VALIDATORS = []
 
 
@@ -80,3 +156,81 @@ LOGIN_URL = reverse_lazy('users:login')
 LOGIN_REDIRECT_URL = reverse_lazy('news:home')
 
 NEWS_COUNT_ON_HOME_PAGE = 10
+
+# 'sync' — комментарий пишется в базу сразу, 'queue' — через журнал,
+# который разбирает команда process_comment_queue (см. news/ingest.py).
+COMMENT_INGESTION = 'sync'
+COMMENT_QUEUE_PATH = BASE_DIR / 'comment_queue.sqlite3'
+COMMENT_QUEUE_BATCH_SIZE = 500
+
+# Живая лента комментариев, см. news/events.py. Адрес событий есть
+# только в ASGI-приложении yanews/asgi.py: под WSGI и runserver лента
+# выключена, и страница новости не подключается к ней.
+# Для нескольких процессов: 'news.events.SocketBroker'.
+NEWS_EVENTS_ENABLED = False
+NEWS_EVENTS_BROKER = 'news.events.InProcessBroker'
+NEWS_EVENTS_SOCKET_DIR = BASE_DIR / 'run' / 'events'
+NEWS_EVENTS_QUEUE_SIZE = 100
+NEWS_EVENTS_KEEPALIVE = 15
+
+# Блок «Обсуждаемое» на главной: окна в часах и размер топа.
+# Старые ячейки удаляет команда compact_comment_buckets.
+TRENDING_WINDOWS = {'За сутки': 24, 'За неделю': 24 * 7}
+TRENDING_SIZE = 5
+# Общий кэш: топ сбрасывается изменениями из любого процесса.
+TRENDING_CACHE_ALIAS = 'shared'
+
+# Ленты JSON Feed, RSS и Atom, см. news/feeds.py: число записей и время
+# жизни готовых тел в кэше (сбрасываются сигналами при изменениях).
+FEED_SIZE = 20
+# Общий кэш: ленты сбрасываются изменениями из любого процесса.
+FEED_CACHE_ALIAS = 'shared'
+FEED_CACHE_TIMEOUT = 60 * 60 * 24
+
+# Профилирование запросов, см. yanews/profiling.py. Выключенная
+# middleware не участвует в обработке запросов.
+PROFILING_ENABLED = False
+PROFILING_RATE = 0.0
+PROFILING_HEADER = 'X-Profile'
+PROFILING_HEADER_MAX_AGE = 60 * 60
+PROFILING_INTERVAL = 0.005
+PROFILING_TOP = 30
+PROFILING_DIR = BASE_DIR / 'profiles'
+
+# Замер памяти запросов через tracemalloc, см. yanews/memory.py: пик
+# попадает в Server-Timing и журнал запросов. Выключенная middleware
+# не участвует в обработке запросов.
+MEMORY_TRACKING_ENABLED = False
+MEMORY_TRACKING_RATE = 1.0
+
+# Прогрев процесса в wsgi.py до fork рабочих процессов, см.
+# yanews/preload.py: URLconf, метаданные моделей, переводы и шаблоны
+# (TEMPLATE_WARMUP), затем gc.freeze() для прогретых объектов. Включается
+# только для серверов, загружающих приложение до fork (gunicorn --preload):
+# без fork прогрев лишь удлиняет старт каждого процесса.
+WSGI_PRELOAD = False
+PRELOAD_GC_FREEZE = True
+
+# Журнал медленных запросов, см. news/querylog.py и команду slow_queries.
+# None (по умолчанию) выключает журнал; порог в мс, например 200,
+# включает его при запуске процесса.
+SLOW_QUERY_MS = None
+SLOW_QUERY_LOG = BASE_DIR / 'slow_queries.jsonl'
+
+# Обезличенный журнал запросов для команды replay_requests,
+# см. yanews/requestlog.py. Значения аргументов и параметров из
+# REQUEST_LOG_PLAIN пишутся как есть, остальные — токенами.
+REQUEST_LOG_ENABLED = False
+REQUEST_LOG_RATE = 0.1
+REQUEST_LOG_PATH = BASE_DIR / 'request_log.jsonl'
+REQUEST_LOG_PLAIN = ('year', 'month', 'fmt', 'page')
+
+# Ограничение частоты записей, см. yanews/ratelimit.py:
+# {имя URL: (запросов, секунд)} на пользователя или IP анонима.
+RATE_LIMITS = {
+    'news:detail': (10, 60),
+    'news:edit': (10, 60),
+    'news:delete': (10, 60),
+}
+RATE_LIMIT_PATH = BASE_DIR / 'run' / 'ratelimit.bin'
+RATE_LIMIT_SLOTS = 1 << 14
@@ -0,0 +1,142 @@
+"""
+Тестовая база из снимка схемы.
+
+Вместо прогона миграций на каждом запуске тестов схема один раз
+собирается в SQLite-файл в TEST_DB_CACHE_DIR и затем копируется
+в in-memory тестовую базу через backup API. Имя файла содержит отпечаток
+всех файлов миграций, версии Django и роутеров, поэтому снимок
+пересобирается только после изменения миграций. При --parallel у каждого
+рабочего процесса своя копия базы, как в DiscoverRunner.
+"""
+import hashlib
+import os
+import sqlite3
+import sys
+import time
+from pathlib import Path
+
+import django
+from django.apps import apps
+from django.conf import settings
+from django.core.management import call_command
+from django.db import connections
+from django.test.runner import DiscoverRunner
+
+# Время подготовки каждой базы: {alias: ('cold' | 'warm', секунды)}.
+timings = {}
+
+
+def fingerprint(alias):
+    """Отпечаток всего, от чего зависит схема базы `alias`."""
+    digest = hashlib.sha256()
+    digest.update(django.get_version().encode())
+    digest.update(alias.encode())
+    digest.update(repr(settings.DATABASE_ROUTERS).encode())
+    for app_config in sorted(apps.get_app_configs(), key=lambda a: a.label):
+        for path in sorted(Path(app_config.path, 'migrations').glob('*.py')):
+            digest.update(f'{app_config.label}/{path.name}'.encode())
+            digest.update(path.read_bytes())
+    return digest.hexdigest()[:16]
+
+
+def build_template(alias, path):
+    """Прогоняет миграции во временный файл и атомарно кладёт его в кэш."""
+    connection = connections[alias]
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_name(f'{path.name}.{os.getpid()}.tmp')
+    old_name = connection.settings_dict['NAME']
+    connection.close()
+    connection.settings_dict['NAME'] = str(tmp_path)
+    try:
+        call_command(
+            'migrate',
+            database=alias,
+            run_syncdb=True,
+            interactive=False,
+            verbosity=0,
+        )
+    finally:
+        connection.close()
+        connection.settings_dict['NAME'] = old_name
+    os.replace(tmp_path, path)
+
+
+def snapshot(alias):
+    """Путь к снимку схемы базы `alias`; собирает его при отсутствии."""
+    template = Path(
+        settings.TEST_DB_CACHE_DIR, f'{alias}-{fingerprint(alias)}.sqlite3'
+    )
+    state = 'warm' if template.exists() else 'cold'
+    if state == 'cold':
+        build_template(alias, template)
+    return template, state
+
+
+def clone_databases(connection, parallel):
+    """Копии базы для рабочих процессов --parallel."""
+    if parallel > 1:
+        for index in range(parallel):
+            connection.creation.clone_test_db(suffix=str(index + 1),
+                                              verbosity=0)
+
+
+def setup_databases(parallel=0):
+    """Создаёт тестовые базы и возвращает конфигурацию для отката."""
+    old_config = []
+    for alias in connections:
+        connection = connections[alias]
+        old_name = connection.settings_dict['NAME']
+        started = time.perf_counter()
+        if connection.vendor != 'sqlite':
+            connection.creation.create_test_db(verbosity=0, autoclobber=True)
+            clone_databases(connection, parallel)
+            old_config.append((connection, old_name))
+            continue
+        template, state = snapshot(alias)
+        test_name = connection.creation._get_test_db_name()
+        connection.close()
+        settings.DATABASES[alias]['NAME'] = test_name
+        connection.settings_dict['NAME'] = test_name
+        connection.ensure_connection()
+        source = sqlite3.connect(f'file:{template}?mode=ro', uri=True)
+        try:
+            source.backup(connection.connection)
+        finally:
+            source.close()
+        clone_databases(connection, parallel)
+        timings[alias] = (state, time.perf_counter() - started)
+        old_config.append((connection, old_name))
+    return old_config
+
+
+def teardown_databases(old_config, parallel=0):
+    for connection, old_name in old_config:
+        if parallel > 1:
+            for index in range(parallel):
+                connection.creation.destroy_test_db(suffix=str(index + 1),
+                                                    verbosity=0)
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+
+
+def report():
+    return [
+        f'test database {alias!r}: {state} start in {seconds:.3f}s'
+        for alias, (state, seconds) in timings.items()
+    ]
+
+
+class SnapshotDiscoverRunner(DiscoverRunner):
+    """Раннер `manage.py test`, поднимающий базы из снимка."""
+
+    def setup_databases(self, **kwargs):
+        return setup_databases(self.parallel)
+
+    def teardown_databases(self, old_config, **kwargs):
+        teardown_databases(old_config, self.parallel)
+
+    def run_suite(self, suite, **kwargs):
+        result = super().run_suite(suite, **kwargs)
+        if self.verbosity:
+            for line in report():
+                sys.stderr.write(line + '\n')
+        return result
@@ -0,0 +1,77 @@
+import pytest
+from django.conf import settings
+from django.test import override_settings
+
+from yanote import memory, preload, testdb
+
+
+# Тестовая база поднимается из кэшированного снимка схемы без миграций
+@pytest.fixture(scope='session')
+def django_db_setup(django_test_environment, django_db_blocker):
+    with django_db_blocker.unblock():
+        old_config = testdb.setup_databases()
+    yield
+    with django_db_blocker.unblock():
+        testdb.teardown_databases(old_config)
+
+
+# Общий файловый кэш сессий и пользователей — во временном каталоге,
+# а не в run/ проекта
+@pytest.fixture(scope='session', autouse=True)
+def shared_cache(tmp_path_factory):
+    caches = dict(settings.CACHES)
+    caches['shared'] = dict(caches['shared'],
+                            LOCATION=tmp_path_factory.mktemp('cache'))
+    with override_settings(CACHES=caches):
+        yield
+
+
+# Вёдра ограничения частоты у каждого теста свои: пользователи и IP
+# тестового клиента повторяются от теста к тесту
+@pytest.fixture(autouse=True)
+def rate_limit_buckets(settings, tmp_path):
+    settings.RATE_LIMIT_PATH = tmp_path / 'ratelimit.bin'
+
+
+def pytest_terminal_summary(terminalreporter):
+    for line in testdb.report():
+        terminalreporter.write_line(line)
+
+
+def pytest_configure(config):
+    config.addinivalue_line(
+        'markers',
+        'memory_budget(kib, views=None): пик памяти каждого запроса теста '
+        '(или запросов к именам URL из views) не больше kib КиБ',
+    )
+
+
+# Тест с меткой memory_budget замеряет память своих запросов
+# MemoryMiddleware и падает, если пик хоть одного выше бюджета
+@pytest.hookimpl(hookwrapper=True)
+def pytest_runtest_call(item):
+    marker = item.get_closest_marker('memory_budget')
+    if marker is None:
+        yield
+        return
+    kib, views = marker.args[0], marker.kwargs.get('views')
+    # Как в рабочем процессе после wsgi.py: URLconf и шаблоны прогреты.
+    preload.warm_up()
+    peaks = []
+
+    def record(sender, view, peak, **kwargs):
+        if views is None or view in views:
+            peaks.append((view, peak // 1024))
+
+    memory.request_measured.connect(record)
+    with override_settings(MEMORY_TRACKING_ENABLED=True,
+                           MEMORY_TRACKING_RATE=1.0):
+        outcome = yield
+    memory.request_measured.disconnect(record)
+    if outcome.excinfo is not None:
+        return
+    if not peaks:
+        pytest.fail('memory_budget: тест не сделал замеренных запросов')
+    over = [f'{view}: {peak} КиБ' for view, peak in peaks if peak > kib]
+    if over:
+        pytest.fail(f'Пик памяти выше бюджета {kib} КиБ: {", ".join(over)}')
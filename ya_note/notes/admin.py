@@ -1,5 +1,46 @@
 from django.contrib import admin
+from django.contrib.auth import get_user_model
+from django.contrib.auth.admin import UserAdmin
 
-from .models import Note
+from . import purge
+from .models import Note, UserPurge
 
 admin.site.register(Note)
+
+
+class PurgingUserAdmin(UserAdmin):
+    """
+    Удаление пользователя ставит его в очередь purge_users.
+
+    Заметки удаляются фоновым заданием пачками, поэтому страница
+    подтверждения их не перечисляет и не загружает.
+    """
+
+    def get_deleted_objects(self, objs, request):
+        perms_needed = set()
+        if not self.has_delete_permission(request):
+            perms_needed.add(self.opts.verbose_name)
+        return (
+            [str(obj) for obj in objs],
+            {self.opts.verbose_name_plural: len(objs)},
+            perms_needed,
+            [],
+        )
+
+    def delete_model(self, request, obj):
+        purge.schedule([obj])
+
+    def delete_queryset(self, request, queryset):
+        purge.schedule(queryset)
+
+
+admin.site.unregister(get_user_model())
+admin.site.register(get_user_model(), PurgingUserAdmin)
+
+
+@admin.register(UserPurge)
+class UserPurgeAdmin(admin.ModelAdmin):
+    list_display = ('username', 'created', 'deleted', 'finished')
+    readonly_fields = (
+        'user_id', 'username', 'created', 'last_pk', 'deleted', 'finished'
+    )
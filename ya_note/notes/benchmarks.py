@@ -0,0 +1,42 @@
+"""Общие помощники для нагрузочных и прочих замеров."""
+import shutil
+import tempfile
+from contextlib import ExitStack, contextmanager
+from pathlib import Path
+
+from django.conf import settings
+from django.db import connections
+
+from yanote import testdb
+
+
+@contextmanager
+def scratch_database(alias='default'):
+    """
+    Временная файловая база со схемой из снимка тестовой БД.
+
+    Замеры не трогают рабочую базу и не прогоняют миграции.
+    """
+    connection = connections[alias]
+    template, _ = testdb.snapshot(alias)
+    old_name = connection.settings_dict['NAME']
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = Path(tmp_dir, f'{alias}.sqlite3')
+        shutil.copyfile(template, path)
+        connection.close()
+        connection.settings_dict['NAME'] = str(path)
+        try:
+            yield path
+        finally:
+            connection.close()
+            connection.settings_dict['NAME'] = old_name
+
+
+@contextmanager
+def scratch_databases():
+    """Временные базы для default и всех шардов заметок."""
+    with ExitStack() as stack:
+        yield {
+            alias: stack.enter_context(scratch_database(alias))
+            for alias in settings.DATABASES
+        }
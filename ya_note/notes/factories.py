@@ -0,0 +1,60 @@
+"""
+Массовое создание данных для тестов.
+
+Наборы объектов создаются через bulk_create, поэтому функции годятся
+и для TestCase.setUpTestData, и для pytest-фикстур. bulk_create не вызывает
+Note.save(), поэтому slug и HTML текста задаются явно. SQLite
+не возвращает первичные ключи из bulk_create, поэтому объекты
+перечитываются одним запросом на шард.
+"""
+from collections import defaultdict
+
+from django.contrib.auth import get_user_model
+
+from .models import Note
+from .sharding import shard_for
+
+User = get_user_model()
+
+
+def make_users(count, prefix='Пользователь'):
+    names = [f'{prefix} {index}' for index in range(count)]
+    User.objects.bulk_create(User(username=name) for name in names)
+    return list(User.objects.filter(username__in=names).order_by('pk'))
+
+
+def make_note(author, **fields):
+    """Одна заметка через save(), как из формы: slug и HTML заполняются."""
+    data = {
+        'title': 'Default title',
+        'text': 'Default text',
+        'slug': 'default-slug',
+    }
+    data.update(fields)
+    return Note.objects.create(author=author, **data)
+
+
+def make_notes(authors, per_author, prefix='note'):
+    """По `per_author` заметок каждому автору с уникальными slug."""
+    slugs = []
+    notes = []
+    for author in authors:
+        for index in range(per_author):
+            slug = f'{prefix}-{author.pk}-{index}'
+            slugs.append(slug)
+            note = Note(
+                title=f'Заметка {index}',
+                text='Текст заметки',
+                slug=slug,
+                author=author,
+            )
+            note.render_text()
+            notes.append(note)
+    by_shard = defaultdict(list)
+    for note in notes:
+        by_shard[shard_for(note.author_id)].append(note)
+    created = []
+    for alias, shard_notes in by_shard.items():
+        Note.objects.using(alias).bulk_create(shard_notes)
+        created += Note.objects.using(alias).filter(slug__in=slugs)
+    return sorted(created, key=lambda note: (note.author_id, note.pk))
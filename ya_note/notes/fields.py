@@ -0,0 +1,67 @@
+"""
+Текстовое поле со сжатием.
+
+Сжатие включается порогом threshold, а без него — настройкой
+COMPRESSED_TEXT_THRESHOLD; None (по умолчанию) выключает сжатие.
+Значение не короче порога в байтах UTF-8 сохраняется как BLOB
+со сжатием zlib, более короткое — обычной строкой: SQLite хранит оба
+вида в одной колонке TEXT, а при чтении их различает тип значения
+(bytes или str). Сжатые строки распаковываются при чтении из базы,
+поэтому и объекты, и values() с values_list() получают str; выключенное
+сжатие по-прежнему читает сохранённые раньше BLOB. Уже сохранённые
+заметки под новый порог переписывает команда compress_notes.
+
+Сжатие дорого: холодное чтение медленнее примерно втрое, а запись
+требует в несколько раз больше процессорного времени (см. команду
+bench_compressed_text). Поиск по подстроке и шаблону в SQL сжатые строки
+не находит, поэтому такие lookups на поле не поддерживаются; exact
+совпадает, только если значение записано при том же пороге.
+"""
+import zlib
+
+from django.conf import settings
+from django.db import models
+
+UNSUPPORTED_LOOKUPS = frozenset({
+    'contains', 'icontains', 'startswith', 'istartswith', 'endswith',
+    'iendswith', 'regex', 'iregex',
+})
+
+
+class CompressedTextField(models.TextField):
+
+    def __init__(self, *args, threshold=None, level=6, **kwargs):
+        self.threshold = threshold
+        self.level = level
+        super().__init__(*args, **kwargs)
+
+    def deconstruct(self):
+        name, path, args, kwargs = super().deconstruct()
+        if self.threshold is not None:
+            kwargs['threshold'] = self.threshold
+        kwargs['level'] = self.level
+        return name, path, args, kwargs
+
+    def get_lookup(self, lookup_name):
+        if lookup_name in UNSUPPORTED_LOOKUPS:
+            return None
+        return super().get_lookup(lookup_name)
+
+    def from_db_value(self, value, expression, connection):
+        if isinstance(value, bytes):
+            return zlib.decompress(value).decode()
+        return value
+
+    def get_prep_value(self, value):
+        value = super().get_prep_value(value)
+        threshold = self.threshold
+        if threshold is None:
+            threshold = settings.COMPRESSED_TEXT_THRESHOLD
+        if value is None or threshold is None:
+            return value
+        encoded = value.encode()
+        if len(encoded) < threshold:
+            return value
+        compressed = zlib.compress(encoded, self.level)
+        # Несжимаемый текст выгоднее хранить как есть.
+        return compressed if len(compressed) < len(encoded) else value
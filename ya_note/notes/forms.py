@@ -6,6 +6,7 @@ from django.core.exceptions import ValidationError
 from .models import Note
 
 WARNING = ' - такой slug уже существует, придумайте уникальное значение!'
+NOTHING_SELECTED = 'Выберите заметки или отметьте «Все заметки».'
 
 
 class NoteForm(forms.ModelForm):
@@ -22,8 +23,43 @@ class NoteForm(forms.ModelForm):
         if not slug:
             title = cleaned_data.get('title')
             slug = slugify(title)[:100]
-        if Note.objects.filter(
-                slug=slug
-        ).exclude(id=self.instance.pk).exists():
+        if Note.objects.slug_exists(slug, self.instance):
             raise ValidationError(slug + WARNING)
         return slug
+
+
+class NoteIdsField(forms.Field):
+    """Список id заметок из повторяющегося параметра запроса."""
+    widget = forms.MultipleHiddenInput
+
+    def to_python(self, value):
+        try:
+            return {int(pk) for pk in value or ()}
+        except (TypeError, ValueError):
+            raise ValidationError('Некорректный список заметок.')
+
+
+class NoteBulkDeleteForm(forms.Form):
+    """Форма массового удаления заметок."""
+    note = NoteIdsField(required=False)
+    select_all = forms.BooleanField(label='Все заметки', required=False)
+    title = forms.CharField(
+        label='Заголовок содержит', max_length=100, required=False
+    )
+
+    def clean(self):
+        cleaned_data = super().clean()
+        if not cleaned_data.get('note') and not cleaned_data.get(
+                'select_all'):
+            raise ValidationError(NOTHING_SELECTED)
+        return cleaned_data
+
+    def filter(self, queryset):
+        """Сужает queryset автора до выбранных заметок."""
+        if not self.cleaned_data['select_all']:
+            queryset = queryset.filter(pk__in=self.cleaned_data['note'])
+        if self.cleaned_data['title']:
+            queryset = queryset.filter(
+                title__icontains=self.cleaned_data['title']
+            )
+        return queryset
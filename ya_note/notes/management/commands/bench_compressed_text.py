@@ -0,0 +1,89 @@
+import random
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import connections
+from django.test import override_settings
+
+from notes.benchmarks import scratch_databases
+from notes.models import Note
+from notes.sharding import shard_for
+
+SYLLABLES = ('ка', 'ли', 'но', 'ве', 'ра', 'то', 'мы', 'се', 'ду', 'пол',
+             'стр', 'ен', 'ов', 'ать', 'ние', 'ость')
+
+
+def make_text(rng, words):
+    return ' '.join(
+        ''.join(rng.choices(SYLLABLES, k=rng.randint(1, 4)))
+        for _ in range(words)
+    )
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнивает Note.text без сжатия и со сжатием: размер базы, '
+        'чтение с новым соединением и процессорное время. Работает '
+        'на временных базах.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--notes', type=int, default=2000)
+        parser.add_argument(
+            '--words', type=int, default=1500,
+            help='Число слов в тексте каждой заметки.',
+        )
+        parser.add_argument(
+            '--threshold', type=int, default=1024,
+            help='COMPRESSED_TEXT_THRESHOLD для замера со сжатием.',
+        )
+        parser.add_argument('--repeat', type=int, default=5)
+
+    def measure(self, alias, path, author, texts, repeat):
+        notes = Note.objects.using(alias)
+        notes.all().delete()
+        started = time.process_time()
+        notes.bulk_create(
+            Note(title=f'Заметка {index}', text=text,
+                 slug=f'bench-{index}', author=author)
+            for index, text in enumerate(texts)
+        )
+        write_cpu = time.process_time() - started
+        connection = connections[alias]
+        with connection.cursor() as cursor:
+            cursor.execute('VACUUM')
+        size = path.stat().st_size
+        read_wall, read_cpu = [], []
+        for _ in range(repeat):
+            connection.close()
+            wall, cpu = time.perf_counter(), time.process_time()
+            total = sum(len(note.text) for note in notes.only('text'))
+            read_wall.append(time.perf_counter() - wall)
+            read_cpu.append(time.process_time() - cpu)
+        assert total == sum(map(len, texts))
+        return {
+            'size': size,
+            'write_cpu': write_cpu,
+            'read_wall': min(read_wall),
+            'read_cpu': min(read_cpu),
+        }
+
+    def handle(self, *args, notes, words, threshold, repeat, **options):
+        rng = random.Random(0)
+        texts = [make_text(rng, words) for _ in range(notes)]
+        with scratch_databases() as paths:
+            author = get_user_model().objects.create(username='bench')
+            alias = shard_for(author.pk)
+            arguments = (alias, paths[alias], author, texts, repeat)
+            with override_settings(COMPRESSED_TEXT_THRESHOLD=None):
+                plain = self.measure(*arguments)
+            with override_settings(COMPRESSED_TEXT_THRESHOLD=threshold):
+                compressed = self.measure(*arguments)
+        for name, result in (('без сжатия', plain), ('zlib', compressed)):
+            self.stdout.write(
+                f'{name:>11}: база {result["size"] / 2 ** 20:.1f} МиБ, '
+                f'чтение {result["read_wall"] * 1000:.1f} мс '
+                f'(CPU {result["read_cpu"] * 1000:.1f} мс), '
+                f'CPU записи {result["write_cpu"] * 1000:.1f} мс'
+            )
@@ -0,0 +1,34 @@
+import json
+import subprocess
+
+from django.core.management.base import BaseCommand, CommandError
+
+from yanote import startup
+
+
+class Command(BaseCommand):
+    help = (
+        'Замеряет холодный старт в новых интерпретаторах: django.setup(), '
+        'импорт wsgi (с прогревом при WSGI_PRELOAD) и manage.py check. '
+        'Выводит медиану времени этапов и самые медленные импорты в JSON.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--runs', type=int, default=5)
+        parser.add_argument('--top', type=int, default=10,
+                            help='Пакетов и модулей в разборе импортов.')
+        parser.add_argument('--output', help='Файл для отчёта.')
+
+    def handle(self, *args, runs, top, output, **options):
+        try:
+            report = startup.run(runs, top)
+        except subprocess.CalledProcessError as error:
+            raise CommandError(
+                f'Запуск {error.cmd} завершился с кодом {error.returncode}:'
+                f'\n{error.stderr}'
+            )
+        text = json.dumps(report, ensure_ascii=False, indent=2)
+        if output:
+            with open(output, 'w', encoding='utf-8') as file:
+                file.write(text + '\n')
+        self.stdout.write(text)
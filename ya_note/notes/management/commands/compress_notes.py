@@ -0,0 +1,37 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from notes.models import Note
+
+
+def rewrite_texts(queryset, batch_size):
+    """Переписывает text пачками по текущему порогу сжатия."""
+    updated = 0
+    last_pk = 0
+    while True:
+        batch = list(
+            queryset.filter(pk__gt=last_pk).order_by('pk').only('pk', 'text')
+            [:batch_size]
+        )
+        if not batch:
+            return updated
+        queryset.bulk_update(batch, ['text'])
+        updated += len(batch)
+        last_pk = batch[-1].pk
+
+
+class Command(BaseCommand):
+    help = (
+        'Переписывает текст всех заметок по COMPRESSED_TEXT_THRESHOLD: '
+        'с порогом сжимает длинные тексты, без порога распаковывает '
+        'сжатые раньше. Миграции данные не трогают.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500)
+
+    def handle(self, *args, batch_size, **options):
+        updated = 0
+        for alias in settings.NOTE_SHARDS:
+            updated += rewrite_texts(Note.objects.using(alias), batch_size)
+        self.stdout.write(f'Переписано заметок: {updated}')
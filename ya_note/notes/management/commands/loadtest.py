@@ -0,0 +1,83 @@
+import json
+from functools import partial
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.test import override_settings
+from django.urls import reverse
+
+from notes import factories
+from notes.benchmarks import scratch_databases
+from yanote import loadtest
+
+NOTES_PER_USER = 20
+
+
+def create(session, rng):
+    session.get('add_form', reverse('notes:add'))
+    session.post('add', reverse('notes:add'), {
+        'title': 'Новая заметка',
+        'text': f'Текст **заметки** {rng.random()}',
+        'slug': f'load-{session.user.pk}-{rng.getrandbits(64):x}',
+    })
+
+
+def browse(session, rng):
+    session.get('list', reverse('notes:list'))
+
+
+def edit(slugs, session, rng):
+    slug = rng.choice(slugs[session.user.pk])
+    url = reverse('notes:edit', args=(slug,))
+    session.get('edit_form', url)
+    session.post('edit', url, {
+        'title': 'Изменённая заметка',
+        'text': f'Новый текст {rng.random()}',
+        'slug': slug,
+    })
+
+
+class Command(BaseCommand):
+    help = (
+        'Нагрузочный тест на временных базах: виртуальные пользователи '
+        'создают, просматривают и редактируют заметки. Выводит '
+        'пропускную способность и задержки p50/p95/p99 в JSON.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=10)
+        parser.add_argument('--duration', type=float, default=10.0,
+                            help='Длительность в секундах.')
+        parser.add_argument(
+            '--workers', type=int, default=0,
+            help='Рабочих процессов с приложением; 0 — в этом процессе.',
+        )
+        parser.add_argument(
+            '--weights', type=float, nargs=3, default=(1.0, 6.0, 3.0),
+            metavar=('CREATE', 'LIST', 'EDIT'),
+            help='Веса сценариев создания, списка и правки.',
+        )
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument(
+            '--rate-limits', action='store_true',
+            help='Не отключать RATE_LIMITS: лишние записи получат 429.',
+        )
+        parser.add_argument('--output', help='Файл для отчёта.')
+
+    def handle(self, *args, users, duration, workers, weights, seed, output,
+               rate_limits, **options):
+        limits = settings.RATE_LIMITS if rate_limits else {}
+        with scratch_databases(), override_settings(RATE_LIMITS=limits):
+            accounts = factories.make_users(users)
+            slugs = {account.pk: [] for account in accounts}
+            for note in factories.make_notes(accounts, NOTES_PER_USER):
+                slugs[note.author_id].append(note.slug)
+            report = loadtest.run(
+                list(zip((create, browse, partial(edit, slugs)), weights)),
+                accounts, duration, workers, seed,
+            )
+        text = json.dumps(report, ensure_ascii=False, indent=2)
+        if output:
+            with open(output, 'w', encoding='utf-8') as file:
+                file.write(text + '\n')
+        self.stdout.write(text)
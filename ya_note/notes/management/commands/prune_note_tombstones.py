@@ -0,0 +1,24 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from notes.models import NoteTombstone
+
+
+class Command(BaseCommand):
+    help = (
+        'Удаляет следы удалённых заметок старше NOTE_TOMBSTONE_TTL_DAYS: '
+        'клиенты с таким старым курсором всё равно получают reset.'
+    )
+
+    def handle(self, *args, **options):
+        border = timezone.now() - timedelta(
+            days=settings.NOTE_TOMBSTONE_TTL_DAYS
+        )
+        for alias in settings.NOTE_SHARDS:
+            deleted, _ = NoteTombstone.objects.using(alias).filter(
+                deleted_at__lt=border
+            ).delete()
+            self.stdout.write(f'{alias}: удалено следов {deleted}')
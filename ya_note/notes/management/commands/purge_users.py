@@ -0,0 +1,35 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from notes import purge
+
+
+class Command(BaseCommand):
+    help = (
+        'Удаляет пользователей, поставленных в очередь на удаление, '
+        'вместе с их заметками пачками.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--user', action='append', default=[], dest='usernames',
+            help='Сначала поставить пользователя в очередь.',
+        )
+        parser.add_argument('--batch-size', type=int, default=500)
+
+    def handle(self, *args, usernames, batch_size, **options):
+        users = list(
+            get_user_model().objects.filter(username__in=usernames)
+        )
+        missing = set(usernames) - {user.get_username() for user in users}
+        if missing:
+            raise CommandError(
+                f'Нет пользователей: {", ".join(sorted(missing))}'
+            )
+        purge.schedule(users)
+        for job in purge.pending():
+            purge.run(job, batch_size, self.report)
+            self.stdout.write(f'{job}: удалён, заметок {job.deleted}')
+
+    def report(self, job):
+        self.stdout.write(f'{job}: удалено заметок {job.deleted}')
@@ -0,0 +1,27 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from notes.models import rebalance_notes
+
+
+class Command(BaseCommand):
+    help = (
+        'Переносит заметки на шарды их авторов после изменения '
+        'NOTE_SHARDS.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--from', action='append', default=[], dest='sources',
+            help='Дополнительная база-источник, например выведенный шард.',
+        )
+        parser.add_argument('--batch-size', type=int, default=500)
+
+    def handle(self, *args, sources, batch_size, **options):
+        unknown = set(sources) - set(connections)
+        if unknown:
+            raise CommandError(f'Нет баз: {", ".join(sorted(unknown))}')
+        for alias in dict.fromkeys([*settings.NOTE_SHARDS, *sources]):
+            moved = rebalance_notes(alias, batch_size)
+            self.stdout.write(f'{alias}: перенесено заметок {moved}')
@@ -0,0 +1,67 @@
+import json
+from collections import defaultdict
+
+from django.core.management.base import BaseCommand
+
+from notes import factories
+from notes.benchmarks import scratch_databases
+from yanote import requestlog
+
+
+class Command(BaseCommand):
+    help = (
+        'Воспроизводит журнал запросов REQUEST_LOG_PATH на временных базах '
+        'с тестовыми данными и выводит задержки по именам URL в JSON — '
+        'для сравнения версий через --baseline.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--log', help='Журнал вместо REQUEST_LOG_PATH.')
+        parser.add_argument(
+            '--speed', type=float, default=1.0,
+            help='Во сколько раз быстрее записи; 0 — без пауз.',
+        )
+        parser.add_argument('--concurrency', type=int, default=8)
+        parser.add_argument('--users', type=int, default=20)
+        parser.add_argument('--notes', type=int, default=20,
+                            help='Заметок у каждого пользователя.')
+        parser.add_argument('--baseline',
+                            help='Отчёт прошлого запуска для сравнения.')
+        parser.add_argument('--output', help='Файл для отчёта.')
+
+    def seed(self, users, notes):
+        """Пользователи по классам и значения для токенов аргументов URL."""
+        accounts = factories.make_users(users)
+        staff = factories.make_users(1, prefix='Администратор')
+        staff[0].is_staff = True
+        staff[0].save()
+        slugs = defaultdict(list)
+        for note in factories.make_notes(accounts + staff, notes):
+            slugs[note.author_id].append(note.slug)
+
+        def own_slugs(user):
+            return slugs[user.pk] if user else []
+
+        resolvers = {
+            (f'notes:{name}', 'slug'): own_slugs
+            for name in ('detail', 'edit', 'delete')
+        }
+        return {'user': accounts, 'staff': staff}, resolvers
+
+    def handle(self, *args, log, speed, concurrency, users, notes, baseline,
+               output, **options):
+        records = requestlog.read_log(log)
+        with scratch_databases():
+            entries, skipped = requestlog.plan(records,
+                                               *self.seed(users, notes))
+            report = requestlog.replay(entries, speed, concurrency)
+        report['skipped'] = dict(skipped)
+        report['recorded'] = requestlog.recorded(records)
+        if baseline:
+            with open(baseline, encoding='utf-8') as file:
+                report['change'] = requestlog.compare(report, json.load(file))
+        text = json.dumps(report, ensure_ascii=False, indent=2)
+        if output:
+            with open(output, 'w', encoding='utf-8') as file:
+                file.write(text + '\n')
+        self.stdout.write(text)
@@ -0,0 +1,31 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from notes.markdown import RENDERER_VERSION
+from notes.models import Note, rerender_notes
+
+
+class Command(BaseCommand):
+    help = (
+        'Перерисовывает HTML заметок после смены RENDERER_VERSION '
+        'или массовой загрузки в обход Note.save().'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500)
+        parser.add_argument(
+            '--all', action='store_true', dest='check_all',
+            help='Проверить хэш текста у всех заметок, а не только '
+                 'у нарисованных старой версией.',
+        )
+
+    def handle(self, *args, batch_size, check_all, **options):
+        updated = 0
+        for alias in settings.NOTE_SHARDS:
+            queryset = Note.objects.using(alias)
+            if not check_all:
+                queryset = queryset.exclude(
+                    renderer_version=RENDERER_VERSION
+                )
+            updated += rerender_notes(queryset, batch_size)
+        self.stdout.write(f'Обновлено заметок: {updated}')
@@ -0,0 +1,42 @@
+from collections import defaultdict
+
+from django.core.management.base import BaseCommand
+
+from notes.querylog import read_log
+
+
+class Command(BaseCommand):
+    help = 'Сводка журнала медленных запросов по отпечаткам SQL.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--log', help='По умолчанию SLOW_QUERY_LOG.')
+        parser.add_argument('--limit', type=int, default=20)
+        parser.add_argument(
+            '--sort', choices=('total', 'count', 'max'), default='total',
+        )
+
+    def handle(self, *args, log, limit, sort, **options):
+        stats = defaultdict(lambda: {
+            'count': 0, 'total': 0.0, 'max': 0.0, 'views': set(),
+        })
+        for record in read_log(log):
+            item = stats[record['fingerprint']]
+            item['count'] += 1
+            item['total'] += record['ms']
+            if record['ms'] >= item['max']:
+                item.update(max=record['ms'], sql=record['sql'],
+                            plan=record['plan'])
+            item['views'].add(record['view'] or '-')
+        if not stats:
+            self.stdout.write('Журнал медленных запросов пуст.')
+            return
+        top = sorted(stats.items(), key=lambda pair: -pair[1][sort])[:limit]
+        for key, item in top:
+            self.stdout.write(
+                f'{key}  {item["count"]} раз, всего {item["total"]:.1f} мс, '
+                f'максимум {item["max"]:.1f} мс, '
+                f'представления: {", ".join(sorted(item["views"]))}'
+            )
+            self.stdout.write(f'    {item["sql"]}')
+            for line in item['plan']:
+                self.stdout.write(f'    | {line}')
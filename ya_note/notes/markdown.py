@@ -0,0 +1,114 @@
+"""
+Markdown для текста заметок.
+
+Поддерживается безопасное подмножество: заголовки, абзацы, списки,
+цитаты, блоки кода, `код`, **жирный**, *курсив* и ссылки. Исходный текст
+экранируется целиком до разбора, поэтому HTML из заметки в результат
+не попадает; ссылки принимаются только с http(s), mailto и относительными
+адресами. Любое изменение вывода требует увеличить RENDERER_VERSION —
+тогда команда rerender_notes перерисует сохранённый HTML.
+"""
+import hashlib
+import re
+
+from django.utils.html import escape
+
+RENDERER_VERSION = 1
+
+HEADING = re.compile(r'^(#{1,6})\s+(.*?)\s*#*$')
+BULLET = re.compile(r'^[-*+]\s+(.*)$')
+NUMBERED = re.compile(r'^\d+[.)]\s+(.*)$')
+FENCE = '```'
+
+CODE = re.compile(r'`([^`]+)`')
+STRONG = re.compile(r'\*\*(.+?)\*\*')
+EMPHASIS = re.compile(r'(?<![*\w])\*(?!\s)(.+?)(?<!\s)\*(?![*\w])')
+LINK = re.compile(r'\[([^\]]+)\]\(([^)\s]+)\)')
+SAFE_URL = re.compile(r'^(https?://|mailto:|/|#)', re.IGNORECASE)
+
+
+def content_hash(text):
+    return hashlib.sha256(text.encode()).hexdigest()
+
+
+def _link(match):
+    label, url = match.groups()
+    if not SAFE_URL.match(url):
+        return match.group(0)
+    return f'<a href="{url}" rel="nofollow noopener">{label}</a>'
+
+
+def render_inline(text):
+    """Строчная разметка уже экранированного текста."""
+    parts = CODE.split(text)
+    for index, part in enumerate(parts):
+        # Нечётные части — содержимое `кода`, его не размечаем.
+        if index % 2:
+            parts[index] = f'<code>{part}</code>'
+        else:
+            part = LINK.sub(_link, part)
+            part = STRONG.sub(r'<strong>\1</strong>', part)
+            parts[index] = EMPHASIS.sub(r'<em>\1</em>', part)
+    return ''.join(parts)
+
+
+def _list(lines, pattern, tag):
+    items = ''.join(
+        f'<li>{render_inline(pattern.match(line).group(1))}</li>'
+        for line in lines
+    )
+    return f'<{tag}>{items}</{tag}>'
+
+
+def _block(lines):
+    if all(BULLET.match(line) for line in lines):
+        return _list(lines, BULLET, 'ul')
+    if all(NUMBERED.match(line) for line in lines):
+        return _list(lines, NUMBERED, 'ol')
+    if all(line.startswith('&gt;') for line in lines):
+        quoted = [line[4:].lstrip() for line in lines]
+        return f'<blockquote>{_block(quoted)}</blockquote>'
+    return f'<p>{"<br>".join(render_inline(line) for line in lines)}</p>'
+
+
+def _heading(match):
+    level = len(match.group(1))
+    return f'<h{level}>{render_inline(match.group(2))}</h{level}>'
+
+
+def _code(lines):
+    return f'<pre><code>{chr(10).join(lines)}</code></pre>'
+
+
+def render(text):
+    """HTML для текста заметки."""
+    html, block, code = [], [], None
+
+    def flush():
+        if block:
+            html.append(_block(block))
+            block.clear()
+
+    for line in escape(text).replace('\r\n', '\n').split('\n'):
+        stripped = line.strip()
+        heading = HEADING.match(stripped)
+        if code is not None:
+            if stripped == FENCE:
+                html.append(_code(code))
+                code = None
+            else:
+                code.append(line)
+        elif stripped.startswith(FENCE):
+            flush()
+            code = []
+        elif heading:
+            flush()
+            html.append(_heading(heading))
+        elif stripped:
+            block.append(stripped)
+        else:
+            flush()
+    if code is not None:
+        html.append(_code(code))
+    flush()
+    return '\n'.join(html)
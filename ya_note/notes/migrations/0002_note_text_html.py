@@ -0,0 +1,156 @@
+# Generated by Django 3.2.15 on 2026-10-19 11:40
+
+import hashlib
+import re
+
+from django.db import migrations, models
+from django.utils.html import escape
+
+# Разборщик notes/markdown.py версии 1, замороженный для миграции:
+# последующие версии перерисует команда rerender_notes.
+RENDERER_VERSION = 1
+BATCH_SIZE = 500
+
+HEADING = re.compile(r'^(#{1,6})\s+(.*?)\s*#*$')
+BULLET = re.compile(r'^[-*+]\s+(.*)$')
+NUMBERED = re.compile(r'^\d+[.)]\s+(.*)$')
+FENCE = '```'
+
+CODE = re.compile(r'`([^`]+)`')
+STRONG = re.compile(r'\*\*(.+?)\*\*')
+EMPHASIS = re.compile(r'(?<![*\w])\*(?!\s)(.+?)(?<!\s)\*(?![*\w])')
+LINK = re.compile(r'\[([^\]]+)\]\(([^)\s]+)\)')
+SAFE_URL = re.compile(r'^(https?://|mailto:|/|#)', re.IGNORECASE)
+
+
+def content_hash(text):
+    return hashlib.sha256(text.encode()).hexdigest()
+
+
+def _link(match):
+    label, url = match.groups()
+    if not SAFE_URL.match(url):
+        return match.group(0)
+    return f'<a href="{url}" rel="nofollow noopener">{label}</a>'
+
+
+def render_inline(text):
+    parts = CODE.split(text)
+    for index, part in enumerate(parts):
+        if index % 2:
+            parts[index] = f'<code>{part}</code>'
+        else:
+            part = LINK.sub(_link, part)
+            part = STRONG.sub(r'<strong>\1</strong>', part)
+            parts[index] = EMPHASIS.sub(r'<em>\1</em>', part)
+    return ''.join(parts)
+
+
+def _list(lines, pattern, tag):
+    items = ''.join(
+        f'<li>{render_inline(pattern.match(line).group(1))}</li>'
+        for line in lines
+    )
+    return f'<{tag}>{items}</{tag}>'
+
+
+def _block(lines):
+    if all(BULLET.match(line) for line in lines):
+        return _list(lines, BULLET, 'ul')
+    if all(NUMBERED.match(line) for line in lines):
+        return _list(lines, NUMBERED, 'ol')
+    if all(line.startswith('&gt;') for line in lines):
+        quoted = [line[4:].lstrip() for line in lines]
+        return f'<blockquote>{_block(quoted)}</blockquote>'
+    return f'<p>{"<br>".join(render_inline(line) for line in lines)}</p>'
+
+
+def _heading(match):
+    level = len(match.group(1))
+    return f'<h{level}>{render_inline(match.group(2))}</h{level}>'
+
+
+def _code(lines):
+    return f'<pre><code>{chr(10).join(lines)}</code></pre>'
+
+
+def render(text):
+    html, block, code = [], [], None
+
+    def flush():
+        if block:
+            html.append(_block(block))
+            block.clear()
+
+    for line in escape(text).replace('\r\n', '\n').split('\n'):
+        stripped = line.strip()
+        heading = HEADING.match(stripped)
+        if code is not None:
+            if stripped == FENCE:
+                html.append(_code(code))
+                code = None
+            else:
+                code.append(line)
+        elif stripped.startswith(FENCE):
+            flush()
+            code = []
+        elif heading:
+            flush()
+            html.append(_heading(heading))
+        elif stripped:
+            block.append(stripped)
+        else:
+            flush()
+    if code is not None:
+        html.append(_code(code))
+    flush()
+    return '\n'.join(html)
+
+
+def render_notes(apps, schema_editor):
+    notes = apps.get_model('notes', 'Note').objects.using(
+        schema_editor.connection.alias
+    )
+    last_pk = 0
+    while True:
+        batch = list(
+            notes.filter(pk__gt=last_pk).order_by('pk').only('pk', 'text')
+            [:BATCH_SIZE]
+        )
+        if not batch:
+            return
+        rendered = {}
+        for note in batch:
+            note.text_hash = content_hash(note.text)
+            if note.text_hash not in rendered:
+                rendered[note.text_hash] = render(note.text)
+            note.text_html = rendered[note.text_hash]
+            note.renderer_version = RENDERER_VERSION
+        notes.bulk_update(batch, ['text_html', 'text_hash', 'renderer_version'])
+        last_pk = batch[-1].pk
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notes', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='note',
+            name='renderer_version',
+            field=models.PositiveSmallIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='note',
+            name='text_hash',
+            field=models.CharField(blank=True, editable=False, max_length=64),
+        ),
+        migrations.AddField(
+            model_name='note',
+            name='text_html',
+            field=models.TextField(blank=True, editable=False),
+        ),
+        migrations.RunPython(render_notes, migrations.RunPython.noop),
+    ]
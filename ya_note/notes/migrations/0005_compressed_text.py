@@ -0,0 +1,20 @@
+# Generated by Django 3.2.15 on 2026-10-19 11:49
+
+from django.db import migrations
+
+import notes.fields
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notes', '0004_note_author_no_constraint'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='note',
+            name='text',
+            field=notes.fields.CompressedTextField(help_text='Добавьте подробностей', level=6, threshold=1024, verbose_name='Текст'),
+        ),
+    ]
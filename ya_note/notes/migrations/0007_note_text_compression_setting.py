@@ -0,0 +1,19 @@
+# Generated by Django 3.2.15 on 2026-10-19 12:37
+
+from django.db import migrations
+import notes.fields
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notes', '0006_note_sync'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='note',
+            name='text',
+            field=notes.fields.CompressedTextField(help_text='Добавьте подробностей', level=6, verbose_name='Текст'),
+        ),
+    ]
@@ -1,8 +1,160 @@
+from collections import defaultdict
+
 from django.conf import settings
-from django.db import models
+from django.db import models, router, transaction
+from django.utils import timezone
+from django.utils.safestring import mark_safe
 
 from pytils.translit import slugify
 
+from . import markdown
+from .fields import CompressedTextField
+from .sharding import shard_for
+
+
+def rerender_notes(queryset, batch_size=500):
+    """Перерисовывает устаревший HTML заметок пачками по первичному ключу."""
+    last_pk, updated = 0, 0
+    while True:
+        batch = list(
+            queryset.filter(pk__gt=last_pk).order_by('pk').only(
+                'pk', 'text', 'text_hash', 'renderer_version'
+            )[:batch_size]
+        )
+        if not batch:
+            return updated
+        # Одинаковые тексты (шаблоны, копии) разбираются один раз.
+        rendered = {}
+        stale = []
+        for note in batch:
+            text_hash = markdown.content_hash(note.text)
+            if (note.text_hash == text_hash
+                    and note.renderer_version == markdown.RENDERER_VERSION):
+                continue
+            if text_hash not in rendered:
+                rendered[text_hash] = markdown.render(note.text)
+            note.text_html = rendered[text_hash]
+            note.text_hash = text_hash
+            note.renderer_version = markdown.RENDERER_VERSION
+            stale.append(note)
+        queryset.model.objects.db_manager(queryset.db).bulk_update(
+            stale, ['text_html', 'text_hash', 'renderer_version']
+        )
+        last_pk = batch[-1].pk
+        updated += len(stale)
+
+
+def delete_in_chunks(queryset, chunk_size=500):
+    """Удаляет queryset пачками по `chunk_size` заметок, оставляя следы."""
+    deleted = 0
+    while True:
+        rows = list(queryset.order_by('pk').values_list(
+            'pk', 'author_id', 'slug'
+        )[:chunk_size])
+        if not rows:
+            return deleted
+        with transaction.atomic(using=queryset.db):
+            NoteTombstone.objects.using(queryset.db).bulk_create(
+                NoteTombstone(author_id=author_id, slug=slug)
+                for _, author_id, slug in rows
+            )
+            count, _ = queryset.model.objects.using(queryset.db).filter(
+                pk__in=[pk for pk, _, _ in rows]
+            ).delete(bury=False)
+        deleted += count
+
+
+def rebalance_notes(alias, batch_size=500):
+    """Переносит заметки из базы `alias` на шарды их авторов."""
+    last_pk, moved = 0, 0
+    while True:
+        batch = list(
+            Note.objects.using(alias).filter(pk__gt=last_pk).order_by('pk')
+            [:batch_size]
+        )
+        if not batch:
+            move_tombstones(alias)
+            return moved
+        last_pk = batch[-1].pk
+        by_shard = defaultdict(list)
+        for note in batch:
+            if shard_for(note.author_id) != alias:
+                by_shard[shard_for(note.author_id)].append(note)
+        for shard, notes in by_shard.items():
+            moved += move_notes(notes, alias, shard)
+
+
+def move_notes(notes, source, target):
+    """
+    Копирует заметки в `target` и удаляет из `source`.
+
+    Первичные ключи на шардах независимы, поэтому копия получает новый
+    pk. Если перенос прервался между копированием и удалением, повторный
+    запуск не создаст дубль: копия уже есть (конфликт slug), и из
+    `source` удаляются только заметки, найденные в `target` у того же
+    автора.
+    """
+    pks = [note.pk for note in notes]
+    for note in notes:
+        note.pk = None
+    with transaction.atomic(using=target):
+        Note.objects.using(target).bulk_create(notes, ignore_conflicts=True)
+    copied = set(Note.objects.using(target).filter(
+        slug__in=[note.slug for note in notes]
+    ).values_list('slug', 'author_id'))
+    moved = [
+        pk for pk, note in zip(pks, notes)
+        if (note.slug, note.author_id) in copied
+    ]
+    Note.objects.using(source).filter(pk__in=moved).delete(bury=False)
+    return len(moved)
+
+
+def move_tombstones(alias):
+    """Переносит следы удалённых заметок на шарды их авторов."""
+    by_shard = defaultdict(list)
+    for tombstone in NoteTombstone.objects.using(alias).all():
+        if shard_for(tombstone.author_id) != alias:
+            by_shard[shard_for(tombstone.author_id)].append(tombstone)
+    for shard, tombstones in by_shard.items():
+        pks = [tombstone.pk for tombstone in tombstones]
+        for tombstone in tombstones:
+            tombstone.pk = None
+        NoteTombstone.objects.using(shard).bulk_create(tombstones)
+        NoteTombstone.objects.using(alias).filter(pk__in=pks).delete()
+
+
+class NoteQuerySet(models.QuerySet):
+
+    def delete(self, bury=True):
+        """Удаляет заметки, оставляя следы для синхронизации."""
+        if not bury:
+            return super().delete()
+        tombstones = [
+            NoteTombstone(author_id=author_id, slug=slug)
+            for author_id, slug in self.values_list('author_id', 'slug')
+        ]
+        with transaction.atomic(using=self.db):
+            NoteTombstone.objects.using(self.db).bulk_create(tombstones)
+            return super().delete()
+
+
+class NoteManager(models.Manager.from_queryset(NoteQuerySet)):
+
+    def for_author(self, author):
+        """Заметки автора с его шарда."""
+        return self.using(shard_for(author.pk)).filter(author=author)
+
+    def slug_exists(self, slug, instance=None):
+        """Есть ли slug на каком-либо шарде, кроме самой `instance`."""
+        for alias in settings.NOTE_SHARDS:
+            notes = self.using(alias).filter(slug=slug)
+            if instance is not None and instance._state.db == alias:
+                notes = notes.exclude(pk=instance.pk)
+            if notes.exists():
+                return True
+        return False
+
 
 class Note(models.Model):
     title = models.CharField(
@@ -11,7 +163,7 @@ class Note(models.Model):
         default='Название заметки',
         help_text='Дайте короткое название заметке'
     )
-    text = models.TextField(
+    text = CompressedTextField(
         'Текст',
         help_text='Добавьте подробностей'
     )
@@ -26,13 +178,100 @@ class Note(models.Model):
     author = models.ForeignKey(
         settings.AUTH_USER_MODEL,
         on_delete=models.CASCADE,
+        # Пользователи живут только в default, заметки — на шардах.
+        db_constraint=False,
+    )
+    # Готовый HTML текста: Markdown разбирается при сохранении, а не при
+    # каждом показе заметки.
+    text_html = models.TextField(editable=False, blank=True)
+    text_hash = models.CharField(max_length=64, editable=False, blank=True)
+    renderer_version = models.PositiveSmallIntegerField(
+        default=0, editable=False
     )
+    # Курсор синхронизации, см. NoteSync.
+    updated_at = models.DateTimeField(auto_now=True)
+
+    objects = NoteManager()
+
+    class Meta:
+        indexes = [models.Index(fields=('author', 'updated_at'))]
 
     def __str__(self):
         return self.title
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        note = super().from_db(db, field_names, values)
+        # Прежний slug нужен, чтобы оставить след при его смене.
+        note.loaded_slug = note.__dict__.get('slug')
+        return note
+
     def save(self, *args, **kwargs):
         if not self.slug:
             max_slug_length = self._meta.get_field('slug').max_length
             self.slug = slugify(self.title)[:max_slug_length]
+        self.render_text()
+        loaded_slug = getattr(self, 'loaded_slug', None)
+        if loaded_slug and loaded_slug != self.slug:
+            NoteTombstone.objects.using(self._state.db).create(
+                author_id=self.author_id, slug=loaded_slug
+            )
         super().save(*args, **kwargs)
+        self.loaded_slug = self.slug
+
+    def delete(self, using=None, keep_parents=False):
+        using = using or router.db_for_write(self.__class__, instance=self)
+        with transaction.atomic(using=using):
+            NoteTombstone.objects.using(using).create(
+                author_id=self.author_id, slug=self.slug
+            )
+            return super().delete(using, keep_parents)
+
+    def render_text(self):
+        """Обновляет HTML, если изменился текст или версия разборщика."""
+        text_hash = markdown.content_hash(self.text)
+        if (self.text_hash == text_hash
+                and self.renderer_version == markdown.RENDERER_VERSION):
+            return False
+        self.text_html = markdown.render(self.text)
+        self.text_hash = text_hash
+        self.renderer_version = markdown.RENDERER_VERSION
+        return True
+
+    @property
+    def rendered_text(self):
+        """HTML для шаблона; устаревший до rerender_notes рисуется на лету."""
+        if self.renderer_version != markdown.RENDERER_VERSION:
+            return mark_safe(markdown.render(self.text))
+        return mark_safe(self.text_html)
+
+
+class NoteTombstone(models.Model):
+    """След удалённой или переименованной заметки для NoteSync."""
+    # Не внешний ключ: следы лежат на шарде автора, пользователи в default.
+    author_id = models.PositiveIntegerField()
+    slug = models.CharField(max_length=100)
+    deleted_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        indexes = [models.Index(fields=('author_id', 'id'))]
+
+    def __str__(self):
+        return self.slug
+
+
+class UserPurge(models.Model):
+    """Задание на фоновое удаление пользователя, см. notes/purge.py."""
+    # Не внешний ключ: пользователь удаляется в конце задания.
+    user_id = models.PositiveIntegerField(unique=True)
+    username = models.CharField(max_length=150)
+    created = models.DateTimeField(auto_now_add=True)
+    last_pk = models.BigIntegerField(default=0)
+    deleted = models.PositiveIntegerField(default=0)
+    finished = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ('created',)
+
+    def __str__(self):
+        return self.username
@@ -0,0 +1,64 @@
+"""
+Фоновое удаление пользователей.
+
+User.delete() собирает через collector все заметки пользователя
+и удаляет их одной транзакцией, на всё это время блокируя запись
+в SQLite. Вместо этого пользователь деактивируется и получает задание
+UserPurge, а команда purge_users удаляет его заметки пачками
+по первичному ключу. Каждая пачка удаляется в своей короткой транзакции
+вместе с записью прогресса, поэтому прерванное задание продолжается
+с места остановки. Сам пользователь удаляется последним, когда
+у него не осталось заметок.
+"""
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.utils import timezone
+
+from .models import Note, NoteTombstone, UserPurge
+from .sharding import shard_for
+
+
+def schedule(users):
+    """Деактивирует пользователей и ставит их в очередь на удаление."""
+    jobs = []
+    for user in users:
+        user.is_active = False
+        user.save(update_fields=['is_active'])
+        job, _ = UserPurge.objects.get_or_create(
+            user_id=user.pk, defaults={'username': user.get_username()}
+        )
+        jobs.append(job)
+    return jobs
+
+
+def pending():
+    return UserPurge.objects.filter(finished__isnull=True)
+
+
+def run(job, batch_size=500, progress=None):
+    """Выполняет задание; progress(job) вызывается после каждой пачки."""
+    shard = shard_for(job.user_id)
+    notes = Note.objects.using(shard).filter(author_id=job.user_id)
+    while True:
+        pks = list(
+            notes.filter(pk__gt=job.last_pk).order_by('pk').values_list(
+                'pk', flat=True
+            )[:batch_size]
+        )
+        if not pks:
+            break
+        with transaction.atomic(), transaction.atomic(using=shard):
+            # У заметки нет сигналов и зависимых моделей, поэтому delete()
+            # выполняется одним DELETE ... WHERE id IN без загрузки строк.
+            notes.filter(pk__in=pks).delete(bury=False)
+            job.last_pk = pks[-1]
+            job.deleted += len(pks)
+            job.save(update_fields=['last_pk', 'deleted'])
+        if progress is not None:
+            progress(job)
+    NoteTombstone.objects.using(shard).filter(author_id=job.user_id).delete()
+    with transaction.atomic():
+        get_user_model().objects.filter(pk=job.user_id).delete()
+        job.finished = timezone.now()
+        job.save(update_fields=['finished'])
+    return job
@@ -0,0 +1,64 @@
+"""
+Шардирование заметок по автору.
+
+Заметки автора лежат в базе NOTE_SHARDS[author_id % len(NOTE_SHARDS)],
+поэтому авторы на разных шардах не делят блокировку записи SQLite.
+Все базы, кроме default, считаются шардами заметок: в них создаются
+только таблицы Note и NoteTombstone, остальные модели живут в default.
+После изменения NOTE_SHARDS заметки переносит команда rebalance_notes.
+
+Запросы без автора роутер отправить на нужный шард не может, поэтому
+заметки автора выбираются через Note.objects.for_author().
+"""
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+
+SHARDED = {'notes.Note', 'notes.NoteTombstone'}
+
+
+def shard_for(author_id):
+    shards = settings.NOTE_SHARDS
+    return shards[author_id % len(shards)]
+
+
+def is_note(model):
+    """Заметка или след удалённой заметки — модели, живущие на шардах."""
+    return model._meta.label in SHARDED
+
+
+class NoteShardRouter:
+
+    def db_for_read(self, model, **hints):
+        if not is_note(model):
+            return DEFAULT_DB_ALIAS
+        instance = hints.get('instance')
+        if instance is None:
+            return None
+        if is_note(instance.__class__):
+            return instance._state.db
+        # note_set пользователя.
+        return shard_for(instance.pk)
+
+    def db_for_write(self, model, **hints):
+        if not is_note(model):
+            return DEFAULT_DB_ALIAS
+        instance = hints.get('instance')
+        if instance is None:
+            return None
+        if is_note(instance.__class__):
+            # Заметка остаётся там, откуда прочитана, до rebalance_notes.
+            return instance._state.db or shard_for(instance.author_id)
+        return shard_for(instance.pk)
+
+    def allow_relation(self, obj1, obj2, **hints):
+        if is_note(obj1.__class__) or is_note(obj2.__class__):
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if db == DEFAULT_DB_ALIAS:
+            return None
+        # RunPython без модели (model_name=None) тоже выполняется на шарде.
+        return app_label == 'notes' and model_name in (
+            None, 'note', 'notetombstone'
+        )
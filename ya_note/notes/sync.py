@@ -0,0 +1,229 @@
+"""
+Разностная синхронизация заметок для офлайн-клиентов.
+
+Клиент хранит курсор из прошлого ответа и получает только изменения
+после него: заметки с бо́льшим (updated_at, pk) и следы NoteTombstone
+с бо́льшим id. updated_at назначается до коммита, поэтому транзакция
+с более ранним временем может закоммититься уже после ответа; заметки,
+изменённые за NOTE_SYNC_OVERLAP_SECONDS до выдачи курсора, отдаются
+повторно, и клиент обновляет их по slug. Курсор помнит время выдачи
+и привязан к шарду автора: после rebalance_notes, как и после
+NOTE_TOMBSTONE_TTL_DAYS без синхронизации (следы к этому времени уже
+удалены), клиент получает reset и загружает заметки заново.
+"""
+import hashlib
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.db.models import Count, Max, Q
+from django.utils import timezone
+
+from .forms import WARNING
+from .models import Note, NoteTombstone
+
+EPOCH = datetime(1970, 1, 1, tzinfo=dt_timezone.utc)
+UPDATED_FIELDS = (
+    'title', 'text', 'text_html', 'text_hash', 'renderer_version',
+    'updated_at',
+)
+
+
+class BadCursor(ValueError):
+    pass
+
+
+def to_micros(moment):
+    return (moment - EPOCH) // timedelta(microseconds=1)
+
+
+def from_micros(value):
+    return EPOCH + timedelta(microseconds=int(value))
+
+
+class Cursor:
+    """
+    Позиция клиента: шард, время выдачи курсора, (updated_at, pk)
+    заметки и id следа.
+    """
+
+    def __init__(self, shard, issued=None, updated_at=EPOCH, pk=0,
+                 tombstone=0):
+        self.shard = shard
+        self.issued = issued
+        self.updated_at = updated_at
+        self.pk = pk
+        self.tombstone = tombstone
+
+    def __str__(self):
+        return (
+            f'{self.shard}.{to_micros(self.issued)}.'
+            f'{to_micros(self.updated_at)}.{self.pk}.{self.tombstone}'
+        )
+
+    @classmethod
+    def parse(cls, value):
+        try:
+            shard, issued, updated_at, pk, tombstone = value.rsplit('.', 4)
+            return cls(shard, from_micros(issued), from_micros(updated_at),
+                       int(pk), int(tombstone))
+        except (TypeError, ValueError):
+            raise BadCursor(value)
+
+    def advance(self, note):
+        if (note.updated_at, note.pk) > (self.updated_at, self.pk):
+            self.updated_at, self.pk = note.updated_at, note.pk
+
+
+def tombstones_for(notes, author):
+    return NoteTombstone.objects.using(notes.db).filter(author_id=author.pk)
+
+
+def etag(notes, author, since):
+    """ETag ответа без выборки самих заметок: два агрегата."""
+    state = notes.aggregate(Max('updated_at'), Count('pk'))
+    last_tombstone = tombstones_for(notes, author).aggregate(Max('pk'))
+    digest = hashlib.sha1(
+        f'{since}|{state}|{last_tombstone}'.encode()
+    ).hexdigest()
+    return f'"{digest}"'
+
+
+def changed_notes(notes, cursor):
+    """
+    Заметки после курсора (страница) и признак следующей страницы.
+
+    К странице добавляются заметки не позже курсора с updated_at
+    от NOTE_SYNC_OVERLAP_SECONDS до выдачи курсора: их транзакции могли
+    закоммититься после прошлого ответа. Выборки не пересекаются
+    по первичному ключу, а признак страницы считается только по первой.
+    """
+    after = (
+        Q(updated_at__gt=cursor.updated_at)
+        | Q(updated_at=cursor.updated_at, pk__gt=cursor.pk)
+    )
+    changed = list(notes.filter(after).order_by('updated_at', 'pk')[
+        :settings.NOTE_SYNC_PAGE_SIZE + 1
+    ])
+    has_more = len(changed) > settings.NOTE_SYNC_PAGE_SIZE
+    changed = changed[:settings.NOTE_SYNC_PAGE_SIZE]
+    if cursor.issued is not None:
+        recheck = cursor.issued - timedelta(
+            seconds=settings.NOTE_SYNC_OVERLAP_SECONDS
+        )
+        late = notes.filter(updated_at__gte=recheck).exclude(after)
+        changed = list(late.order_by('updated_at', 'pk')) + changed
+    return changed, has_more
+
+
+def changes(notes, author, since=None):
+    """Изменения заметок автора после курсора `since` (строки)."""
+    now = timezone.now()
+    cursor = Cursor.parse(since) if since else None
+    ttl = timedelta(days=settings.NOTE_TOMBSTONE_TTL_DAYS)
+    reset = cursor is not None and (
+        cursor.shard != notes.db or cursor.issued < now - ttl
+    )
+    if cursor is None or reset:
+        cursor = Cursor(notes.db)
+    tombstones = tombstones_for(notes, author)
+    changed, has_more = changed_notes(notes, cursor)
+    if changed:
+        cursor.advance(changed[-1])
+    cursor.issued = now
+    if since and not reset:
+        graves = list(tombstones.filter(
+            pk__gt=cursor.tombstone
+        ).order_by('pk').values_list('pk', 'slug'))
+        if graves:
+            cursor.tombstone = graves[-1][0]
+    else:
+        # Первая синхронизация: удалять клиенту нечего.
+        graves = []
+        cursor.tombstone = tombstones.aggregate(Max('pk'))['pk__max'] or 0
+    # Слаг, удалённый и созданный заново, остаётся у клиента.
+    live = set(notes.filter(
+        slug__in=[slug for _, slug in graves]
+    ).values_list('slug', flat=True)) if graves else set()
+    return {
+        'cursor': str(cursor),
+        'reset': reset,
+        'has_more': has_more,
+        'notes': [
+            {
+                'slug': note.slug,
+                'title': note.title,
+                'text': note.text,
+                'updated_at': note.updated_at.isoformat(),
+            }
+            for note in changed
+        ],
+        'deleted': sorted({
+            slug for _, slug in graves if slug not in live
+        }),
+    }
+
+
+def parse_changes(payload):
+    """
+    (upserts, deletes) из тела POST. Списки проверяются явно: строка
+    в deleted иначе разошлась бы на символы для slug__in.
+    """
+    upserts = payload.get('notes', [])
+    deletes = payload.get('deleted', [])
+    if not isinstance(upserts, list) or not isinstance(deletes, list):
+        raise ValueError('notes и deleted должны быть списками.')
+    if not all(
+        isinstance(item, dict) and isinstance(item.get('slug'), str)
+        and item['slug'] for item in upserts
+    ) or not all(isinstance(slug, str) for slug in deletes):
+        raise ValueError('Некорректная заметка или slug.')
+    return upserts, deletes
+
+
+def apply(notes, author, upserts, deletes):
+    """
+    Пакетные изменения клиента одним проходом по шарду автора.
+
+    Возвращает число созданных, обновлённых и удалённых заметок
+    и ошибки по slug.
+    """
+    upserts = {item['slug']: item for item in upserts}
+    existing = {note.slug: note for note in notes.filter(slug__in=upserts)}
+    taken = set()
+    new_slugs = set(upserts) - set(existing)
+    for alias in settings.NOTE_SHARDS:
+        taken.update(Note.objects.using(alias).filter(
+            slug__in=new_slugs
+        ).values_list('slug', flat=True))
+    created, updated, errors = [], [], {}
+    now = timezone.now()
+    for slug, item in upserts.items():
+        if slug in taken:
+            errors[slug] = [slug + WARNING]
+            continue
+        note = existing.get(slug) or Note(author=author, slug=slug)
+        note.title = item.get('title', note.title)
+        note.text = item.get('text', note.text)
+        try:
+            note.clean_fields(exclude=('author',))
+        except ValidationError as error:
+            errors[slug] = [
+                message for messages in error.message_dict.values()
+                for message in messages
+            ]
+            continue
+        note.render_text()
+        note.updated_at = now
+        (updated if slug in existing else created).append(note)
+    with transaction.atomic(using=notes.db):
+        Note.objects.using(notes.db).bulk_create(created)
+        Note.objects.using(notes.db).bulk_update(updated, UPDATED_FIELDS)
+        deleted, _ = notes.filter(slug__in=deletes).delete()
+    return {
+        'created': len(created),
+        'updated': len(updated),
+        'deleted': deleted,
+        'errors': errors,
+    }
@@ -1,9 +1,16 @@
+from unittest import skipUnless
+
+import pytest
+from django.conf import settings
 from django.contrib.auth import get_user_model
-from django.test import TestCase
+from django.template import engines
+from django.test import Client, TestCase, override_settings
 from django.urls import reverse
 
-from notes.forms import NoteForm
-from notes.models import Note
+from notes import factories
+from notes.forms import NOTHING_SELECTED, NoteForm
+from notes.views import NotesList
+from yanote import templating
 
 User = get_user_model()
 
@@ -15,11 +22,11 @@ class TestContent(TestCase):
     def setUpTestData(cls):
         cls.author = User.objects.create(username='Лев Толстой')
         cls.reader = User.objects.create(username='Читатель простой')
-        cls.note = Note.objects.create(
+        cls.note = factories.make_note(
+            cls.author,
             title='Заголовок',
             text='Текст заметки',
             slug='note-slug',
-            author=cls.author,
         )
 
     # Тестирование отображения списка заметок для различных пользователей
@@ -51,3 +58,83 @@ class TestContent(TestCase):
                 response = self.client.get(url)
                 self.assertIn('form', response.context)
                 self.assertIsInstance(response.context['form'], NoteForm)
+
+    # Сессия и пользователь берутся из кэша, а не из БД
+    def test_notes_list_skips_session_and_user_queries(self):
+        url = reverse('notes:list')
+        self.client.force_login(self.author)
+        self.client.get(url)
+        with self.assertNumQueries(1):
+            self.client.get(url)
+        with override_settings(
+            SESSION_ENGINE='django.contrib.sessions.backends.db',
+            AUTHENTICATION_BACKENDS=[
+                'django.contrib.auth.backends.ModelBackend'
+            ],
+        ):
+            client = Client()
+            client.force_login(self.author)
+            with self.assertNumQueries(3):
+                client.get(url)
+
+
+class TestNotesListDataset(TestCase):
+
+    # Большой набор заметок создаётся массово один раз на класс
+    @classmethod
+    def setUpTestData(cls):
+        cls.author, cls.reader = factories.make_users(2)
+        cls.notes = factories.make_notes((cls.author, cls.reader), 30)
+
+    def test_notes_list_contains_only_author_notes(self):
+        self.client.force_login(self.author)
+        response = self.client.get(reverse('notes:list'))
+        object_list = list(response.context['object_list'])
+        expected = [note for note in self.notes if note.author == self.author]
+        self.assertEqual(object_list, expected)
+
+    # Список из 30 заметок укладывается в бюджет памяти вместе
+    # с первым запросом процесса
+    @pytest.mark.memory_budget(512, views=('notes:list',))
+    def test_notes_list_memory_budget(self):
+        self.client.force_login(self.author)
+        response = self.client.get(reverse('notes:list'))
+        self.assertIn('mem;desc="peak ', response['Server-Timing'])
+
+
+class TestTemplates(TestCase):
+
+    def test_templates_are_cached_and_warmed_up(self):
+        self.assertGreaterEqual(templating.warm_up(), len(
+            templating.template_names(settings.BASE_DIR / 'templates')
+        ))
+        engine = engines['django']
+        self.assertIs(engine.get_template('notes/list.html').template,
+                      engine.get_template('notes/list.html').template)
+
+    def test_template_engine_follows_setting(self):
+        self.assertIsNone(NotesList().template_engine)
+        with override_settings(JINJA2_TEMPLATES=('notes/list.html',)):
+            self.assertEqual(NotesList().template_engine, 'jinja2')
+
+    @skipUnless(settings.JINJA2_INSTALLED, 'jinja2 не установлен')
+    @override_settings(JINJA2_TEMPLATES=('notes/list.html',))
+    def test_jinja2_templates_render_through_views(self):
+        self.assertEqual(
+            set(templating.template_names(settings.BASE_DIR / 'jinja2')),
+            {'base.html', 'includes/header.html', 'notes/list.html'}
+        )
+        author = User.objects.create(username='Автор')
+        note = factories.make_note(author, title='Заметка в Jinja2')
+        self.client.force_login(author)
+        listing = self.client.get(reverse('notes:list'))
+        invalid = self.client.post(reverse('notes:bulk_delete'), {})
+        for response in (listing, invalid):
+            self.assertEqual(response.status_code, 200)
+            # Шаблоны Django сигналят о рендеринге, Jinja2 — нет.
+            self.assertNotIn('notes/list.html', [
+                template.name for template in response.templates
+            ])
+            self.assertContains(response, note.title)
+            self.assertContains(response, reverse('notes:add'))
+        self.assertContains(invalid, NOTHING_SELECTED)
@@ -1,10 +1,24 @@
+import os
+import subprocess
+import sys
+from datetime import timedelta
+from io import StringIO
+
+from django.conf import settings
 from django.contrib.auth import get_user_model
-from django.test import Client, TestCase
+from django.core.cache.backends.filebased import FileBasedCache
+from django.core.exceptions import FieldError
+from django.core.management import call_command
+from django.db import connection
+from django.test import Client, TestCase, override_settings
 from django.urls import reverse
+from django.utils import timezone
 from django.utils.text import slugify
 
-from notes.forms import WARNING
+from notes import backends, factories, markdown, purge, sync
+from notes.forms import NOTHING_SELECTED, WARNING
 from notes.models import Note
+from notes.sharding import shard_for
 
 User = get_user_model()
 
@@ -28,16 +42,6 @@ class TestNoteCreationAndEditDelete(TestCase):
             'text': 'Updated text'
         }
 
-    def create_note(self, author=None, **kwargs):
-        default_data = {
-            'title': 'Default title',
-            'text': 'Default text',
-            'slug': 'default-slug',
-        }
-        default_data.update(kwargs)
-        author = author or self.author
-        return Note.objects.create(author=author, **default_data)
-
     def test_user_can_create_note(self):
         Note.objects.all().delete()
         response = self.author_client.post(reverse('notes:add'),
@@ -60,9 +64,9 @@ class TestNoteCreationAndEditDelete(TestCase):
         self.assertEqual(len(notes_after), 0)
 
     def test_slug_must_be_unique(self):
-        self.create_note(title=self.form_data['title'],
-                         text=self.form_data['text'],
-                         slug=self.form_data['slug'])
+        factories.make_note(self.author, title=self.form_data['title'],
+                            text=self.form_data['text'],
+                            slug=self.form_data['slug'])
         response = self.author_client.post(reverse('notes:add'),
                                            data=self.form_data)
         warning = self.form_data['slug'] + WARNING
@@ -82,8 +86,8 @@ class TestNoteCreationAndEditDelete(TestCase):
         self.assertEqual(new_note.slug, expected_slug)
 
     def test_author_can_edit_note(self):
-        note = self.create_note(title='title', text='text',
-                                slug='slug', author=self.author)
+        note = factories.make_note(self.author, title='title', text='text',
+                                   slug='slug')
         edit_url = reverse('notes:edit', args=[note.slug])
         response = self.author_client.post(edit_url, self.new_form_data)
         self.assertRedirects(response, reverse('notes:success'))
@@ -95,8 +99,8 @@ class TestNoteCreationAndEditDelete(TestCase):
         self.assertEqual(new_note.author, note.author)
 
     def test_other_user_cant_edit_note(self):
-        note = self.create_note(title='title', text='text', slug='note-slug',
-                                author=self.author)
+        note = factories.make_note(self.author, title='title', text='text',
+                                   slug='note-slug')
         edit_url = reverse('notes:edit', args=[note.slug])
         response = self.reader_client.post(edit_url, self.new_form_data)
         self.assertEqual(response.status_code, 404)
@@ -107,9 +111,8 @@ class TestNoteCreationAndEditDelete(TestCase):
         self.assertEqual(note.author, note_from_db.author)
 
     def test_author_can_delete_note(self):
-        note = Note.objects.create(title='title',
-                                   text='text', slug='note-slug',
-                                   author=self.author)
+        note = factories.make_note(self.author, title='title', text='text',
+                                   slug='note-slug')
         delete_url = reverse('notes:delete', args=[note.slug])
         response = self.author_client.post(delete_url)
         self.assertRedirects(response, reverse('notes:success'))
@@ -117,12 +120,394 @@ class TestNoteCreationAndEditDelete(TestCase):
         self.assertFalse(note_from_db)
 
     def test_other_user_cant_delete_note(self):
-        note = Note.objects.create(title='title',
-                                   text='text',
-                                   slug='note-slug',
-                                   author=self.author)
+        note = factories.make_note(self.author, title='title', text='text',
+                                   slug='note-slug')
         delete_url = reverse('notes:delete', args=[note.slug])
         response = self.reader_client.post(delete_url)
         self.assertEqual(response.status_code, 404)
         note_exists = Note.objects.filter(id=note.id).exists()
         self.assertTrue(note_exists)
+
+    @override_settings(RATE_LIMITS={'notes:add': (1, 60)})
+    def test_note_creation_is_rate_limited(self):
+        Note.objects.all().delete()
+        url = reverse('notes:add')
+        response = self.author_client.post(url, data=self.form_data)
+        self.assertRedirects(response, reverse('notes:success'))
+        response = self.author_client.post(
+            url, data={**self.form_data, 'slug': 'other-slug'}
+        )
+        self.assertEqual(response.status_code, 429)
+        self.assertIn(int(response['Retry-After']), range(1, 61))
+        self.assertEqual(Note.objects.count(), 1)
+        # Квота пользователя, а не сессии: новый вход её не сбрасывает.
+        other_session = Client()
+        other_session.force_login(self.author)
+        response = other_session.post(
+            url, data={**self.form_data, 'slug': 'third-slug'}
+        )
+        self.assertEqual(response.status_code, 429)
+        # Квота у каждого пользователя своя.
+        response = self.reader_client.post(
+            url, data={**self.form_data, 'slug': 'other-slug'}
+        )
+        self.assertRedirects(response, reverse('notes:success'))
+
+
+class TestNoteMarkdown(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create(username='Автор')
+        cls.note = factories.make_note(
+            cls.author, title='Markdown', text='**Жирный** <script>',
+            slug='markdown',
+        )
+
+    def test_html_is_rendered_on_save_and_escaped(self):
+        self.assertEqual(
+            self.note.text_html,
+            '<p><strong>Жирный</strong> &lt;script&gt;</p>'
+        )
+        self.assertEqual(self.note.renderer_version,
+                         markdown.RENDERER_VERSION)
+
+    def test_edit_rerenders_html_only_for_new_text(self):
+        self.client.force_login(self.author)
+        self.client.post(reverse('notes:edit', args=[self.note.slug]), {
+            'title': self.note.title, 'text': '# Заголовок',
+            'slug': self.note.slug,
+        })
+        note = Note.objects.get(pk=self.note.pk)
+        self.assertEqual(note.text_html, '<h1>Заголовок</h1>')
+        self.assertFalse(note.render_text())
+
+    def test_rerender_command_updates_stale_notes(self):
+        Note.objects.update(renderer_version=0, text_html='')
+        self.client.force_login(self.author)
+        response = self.client.get(reverse('notes:detail',
+                                           args=[self.note.slug]))
+        self.assertContains(response, '<strong>Жирный</strong>')
+        out = StringIO()
+        call_command('rerender_notes', stdout=out)
+        self.assertIn('Обновлено заметок: 1', out.getvalue())
+        note = Note.objects.get(pk=self.note.pk)
+        self.assertEqual(note.text_html, self.note.text_html)
+        out = StringIO()
+        call_command('rerender_notes', stdout=out)
+        self.assertIn('Обновлено заметок: 0', out.getvalue())
+
+
+class TestCompressedText(TestCase):
+    LONG_TEXT = 'Длинный текст заметки. ' * 200
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create(username='Автор')
+
+    def stored_type(self, note):
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT typeof(text) FROM notes_note WHERE id = %s',
+                           [note.pk])
+            return cursor.fetchone()[0]
+
+    def test_text_is_plain_by_default(self):
+        note = factories.make_note(self.author, text=self.LONG_TEXT)
+        self.assertEqual(self.stored_type(note), 'text')
+
+    @override_settings(COMPRESSED_TEXT_THRESHOLD=1024)
+    def test_long_text_is_compressed_and_read_back(self):
+        note = factories.make_note(self.author, text=self.LONG_TEXT)
+        self.assertEqual(self.stored_type(note), 'blob')
+        self.assertEqual(Note.objects.get(pk=note.pk).text, self.LONG_TEXT)
+        self.assertEqual(
+            list(Note.objects.values_list('text', flat=True)),
+            [self.LONG_TEXT]
+        )
+
+    def test_compress_notes_rewrites_existing_texts(self):
+        note = factories.make_note(self.author, text=self.LONG_TEXT)
+        with override_settings(COMPRESSED_TEXT_THRESHOLD=1024):
+            call_command('compress_notes', '--batch-size=1',
+                         stdout=StringIO())
+        self.assertEqual(self.stored_type(note), 'blob')
+        call_command('compress_notes', stdout=StringIO())
+        self.assertEqual(self.stored_type(note), 'text')
+        self.assertEqual(Note.objects.get(pk=note.pk).text, self.LONG_TEXT)
+
+    def test_substring_lookups_are_rejected(self):
+        with self.assertRaises(FieldError):
+            Note.objects.filter(text__icontains='текст')
+
+
+class TestNoteBulkDelete(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author, cls.reader = factories.make_users(2)
+        factories.make_notes([cls.author, cls.reader], 25)
+        cls.url = reverse('notes:bulk_delete')
+
+    def setUp(self):
+        self.client.force_login(self.author)
+
+    def test_selected_notes_are_deleted_only_for_author(self):
+        selected = list(Note.objects.filter(
+            title__in=('Заметка 1', 'Заметка 2')
+        ).values_list('pk', flat=True))
+        response = self.client.post(self.url, {'note': selected})
+        self.assertRedirects(response, reverse('notes:success'))
+        self.assertEqual(Note.objects.filter(author=self.author).count(), 23)
+        self.assertEqual(Note.objects.filter(author=self.reader).count(), 25)
+
+    @override_settings(NOTE_BULK_DELETE_CHUNK=4)
+    def test_select_all_with_filter_deletes_in_chunks(self):
+        # Пользователь, 12 заметок с «1» — три пачки: выборка, следы
+        # и DELETE в точке сохранения, и пустая выборка в конце.
+        with self.assertNumQueries(1 + 5 * 3 + 1):
+            self.client.post(self.url, {'select_all': 'on', 'title': '1'})
+        self.assertFalse(Note.objects.filter(
+            author=self.author, title__contains='1'
+        ).exists())
+        self.assertEqual(Note.objects.filter(author=self.author).count(), 13)
+
+    def test_empty_selection_is_rejected(self):
+        response = self.client.post(self.url, {'title': '1'})
+        self.assertFormError(response, 'bulk_form', None, NOTHING_SELECTED)
+        self.assertEqual(Note.objects.count(), 50)
+
+
+class TestUserPurge(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author, cls.reader = factories.make_users(2)
+        factories.make_notes([cls.author, cls.reader], 7)
+
+    def test_purge_resumes_after_crash(self):
+        job, = purge.schedule([self.author])
+        self.assertFalse(User.objects.get(pk=self.author.pk).is_active)
+
+        def crash(job):
+            raise RuntimeError
+
+        with self.assertRaises(RuntimeError):
+            purge.run(job, batch_size=3, progress=crash)
+        job.refresh_from_db()
+        self.assertEqual(job.deleted, 3)
+        self.assertEqual(Note.objects.filter(author=self.author).count(), 4)
+        call_command('purge_users', '--batch-size=3', stdout=StringIO())
+        job.refresh_from_db()
+        self.assertEqual(job.deleted, 7)
+        self.assertIsNotNone(job.finished)
+        self.assertFalse(User.objects.filter(pk=self.author.pk).exists())
+        self.assertEqual(Note.objects.filter(author=self.reader).count(), 7)
+
+
+@override_settings(NOTE_SHARDS=('default', 'notes_1', 'notes_2'))
+class TestNoteSharding(TestCase):
+    databases = '__all__'
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.users = factories.make_users(3)
+
+    def shards_of(self, slug):
+        return [alias for alias in settings.NOTE_SHARDS
+                if Note.objects.using(alias).filter(slug=slug).exists()]
+
+    def test_notes_live_on_author_shard(self):
+        for user in self.users:
+            self.client.force_login(user)
+            self.client.post(reverse('notes:add'), {
+                'title': 'Заметка', 'text': 'Текст', 'slug': f'n-{user.pk}'
+            })
+            self.assertEqual(self.shards_of(f'n-{user.pk}'),
+                             [shard_for(user.pk)])
+            response = self.client.post(
+                reverse('notes:edit', args=[f'n-{user.pk}']),
+                {'title': 'Новая', 'text': 'Текст', 'slug': f'n-{user.pk}'},
+            )
+            self.assertRedirects(response, reverse('notes:success'))
+            response = self.client.get(reverse('notes:list'))
+            self.assertEqual(
+                [note.title for note in response.context['object_list']],
+                ['Новая'],
+            )
+        self.assertEqual(
+            len({shard_for(user.pk) for user in self.users}), 3
+        )
+
+    def test_slug_is_unique_across_shards(self):
+        first, second = self.users[:2]
+        factories.make_notes([first], 1, prefix='shared')
+        self.client.force_login(second)
+        slug = f'shared-{first.pk}-0'
+        response = self.client.post(reverse('notes:add'), {
+            'title': 'Заметка', 'text': 'Текст', 'slug': slug
+        })
+        self.assertFormError(response, form='form', field='slug',
+                             errors=slug + WARNING)
+
+    def test_rebalance_moves_notes_to_author_shards(self):
+        with self.settings(NOTE_SHARDS=('default',)):
+            notes = factories.make_notes(self.users, 2)
+        self.assertEqual(Note.objects.count(), 6)
+        call_command('rebalance_notes', '--batch-size=4', stdout=StringIO())
+        for note in notes:
+            self.assertEqual(self.shards_of(note.slug),
+                             [shard_for(note.author_id)])
+        call_command('rebalance_notes', stdout=StringIO())
+        self.assertEqual(sum(
+            Note.objects.using(alias).count()
+            for alias in settings.NOTE_SHARDS
+        ), 6)
+
+
+class TestNoteSync(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author, cls.reader = factories.make_users(2)
+        factories.make_notes([cls.author], 3, prefix='mine')
+        factories.make_notes([cls.reader], 1, prefix='other')
+        # Старше окна повторной выдачи NOTE_SYNC_OVERLAP_SECONDS.
+        Note.objects.update(updated_at=timezone.now() - timedelta(minutes=1))
+        cls.url = reverse('notes:sync')
+
+    def setUp(self):
+        self.client.force_login(self.author)
+
+    def sync(self, since=None, **headers):
+        data = {'since': since} if since else {}
+        return self.client.get(self.url, data, **headers)
+
+    def test_sync_returns_only_changes_since_cursor(self):
+        first = self.sync().json()
+        self.assertEqual(len(first['notes']), 3)
+        self.assertFalse(first['deleted'])
+        response = self.sync(first['cursor'])
+        self.assertEqual(response.json()['notes'], [])
+        not_modified = self.sync(first['cursor'],
+                                 HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(not_modified.status_code, 304)
+        note = Note.objects.get(slug=f'mine-{self.author.pk}-0')
+        note.text = 'Новый текст'
+        note.save()
+        Note.objects.get(slug=f'mine-{self.author.pk}-1').delete()
+        second = self.sync(first['cursor']).json()
+        self.assertEqual([item['slug'] for item in second['notes']],
+                         [note.slug])
+        self.assertEqual(second['deleted'], [f'mine-{self.author.pk}-1'])
+        self.assertEqual(self.sync(second['cursor']).json()['deleted'], [])
+
+    def test_user_without_notes_is_not_reset(self):
+        self.client.force_login(factories.make_users(1, prefix='Новый')[0])
+        first = self.sync().json()
+        self.assertEqual(first['notes'], [])
+        self.assertFalse(self.sync(first['cursor']).json()['reset'])
+
+    def test_old_notes_do_not_reset_recent_cursor(self):
+        Note.objects.update(updated_at=timezone.now() - timedelta(days=60))
+        first = self.sync().json()
+        self.assertEqual(len(first['notes']), 3)
+        second = self.sync(first['cursor']).json()
+        self.assertEqual((second['reset'], second['notes']), (False, []))
+
+    def test_expired_cursor_is_reset(self):
+        cursor = sync.Cursor.parse(self.sync().json()['cursor'])
+        cursor.issued -= timedelta(days=settings.NOTE_TOMBSTONE_TTL_DAYS + 1)
+        second = self.sync(str(cursor)).json()
+        self.assertTrue(second['reset'])
+        self.assertEqual(len(second['notes']), 3)
+
+    def test_late_commit_before_cursor_is_not_skipped(self):
+        Note.objects.update(updated_at=timezone.now() - timedelta(seconds=2))
+        first = self.sync().json()
+        # Транзакция получила updated_at раньше последней заметки
+        # ответа, а закоммитилась после него.
+        late = factories.make_note(self.author, slug='late')
+        last = Note.objects.filter(author=self.author).exclude(
+            pk=late.pk
+        ).latest('updated_at', 'pk')
+        Note.objects.filter(pk=late.pk).update(
+            updated_at=last.updated_at - timedelta(microseconds=1)
+        )
+        second = self.sync(first['cursor']).json()
+        # Остальные заметки окна приходят повторно и не дублируются.
+        self.assertEqual(
+            [item['slug'] for item in second['notes']],
+            ['late'] + [item['slug'] for item in first['notes']]
+        )
+
+    def test_batched_upserts(self):
+        payload = {
+            'notes': [
+                {'slug': 'new-1', 'title': 'Новая', 'text': '**Текст**'},
+                {'slug': f'mine-{self.author.pk}-0', 'title': 'Правка',
+                 'text': 'Текст'},
+                {'slug': f'other-{self.reader.pk}-0', 'text': 'Чужая'},
+                {'slug': 'no-text'},
+            ],
+            'deleted': [f'mine-{self.author.pk}-2',
+                        f'other-{self.reader.pk}-0'],
+        }
+        response = self.client.post(self.url, payload,
+                                    content_type='application/json')
+        result = response.json()
+        self.assertEqual(
+            (result['created'], result['updated'], result['deleted']),
+            (1, 1, 1)
+        )
+        self.assertEqual(set(result['errors']),
+                         {f'other-{self.reader.pk}-0', 'no-text'})
+        self.assertEqual(Note.objects.get(slug='new-1').text_html,
+                         '<p><strong>Текст</strong></p>')
+        self.assertTrue(Note.objects.filter(author=self.reader).exists())
+        self.assertEqual(
+            self.client.post(self.url, 'не json',
+                             content_type='application/json').status_code,
+            400
+        )
+
+    def test_malformed_changes_are_rejected(self):
+        factories.make_note(self.author, slug='a')
+        for payload in ({'deleted': 'abc'}, {'notes': {'slug': 'x'}},
+                        {'notes': ['x']}, {'notes': [{'slug': 1}]}, []):
+            with self.subTest(payload=payload):
+                response = self.client.post(self.url, payload,
+                                            content_type='application/json')
+                self.assertEqual(response.status_code, 400)
+        self.assertTrue(Note.objects.filter(slug='a').exists())
+
+
+class TestColdStart(TestCase):
+
+    # Модели, формы, представления и журнал запросов загружаются без
+    # loadtest (около 50 мс на django.test и multiprocessing): он нужен
+    # только командам
+    def test_app_modules_skip_heavy_imports(self):
+        code = (
+            'import sys, django; django.setup(); '
+            'import notes.forms, notes.views, yanote.requestlog; '
+            'print("yanote.loadtest" in sys.modules)'
+        )
+        result = subprocess.run(
+            [sys.executable, '-c', code], cwd=settings.BASE_DIR,
+            capture_output=True, text=True, check=True,
+            env=dict(os.environ, DJANGO_SETTINGS_MODULE='yanote.settings'),
+        )
+        self.assertEqual(result.stdout.strip(), 'False')
+
+
+class TestCachedUser(TestCase):
+
+    # Смена пароля сбрасывает пользователя и в кэше других процессов
+    def test_password_change_invalidates_user_in_other_workers(self):
+        user = User.objects.create(username='Автор')
+        other_worker = FileBasedCache(
+            settings.CACHES['shared']['LOCATION'], {}
+        )
+        key = backends.user_cache_key(user.pk)
+        self.assertEqual(backends.CachedModelBackend().get_user(user.pk),
+                         user)
+        self.assertEqual(other_worker.get(key), user)
+        user.set_password('new-password')
+        user.save()
+        self.assertIsNone(other_worker.get(key))
@@ -1,9 +1,15 @@
+import tempfile
 from http import HTTPStatus
+from io import StringIO
+from pathlib import Path
 
 from django.contrib.auth import get_user_model
-from django.test import TestCase, Client
+from django.core.exceptions import MiddlewareNotUsed
+from django.core.management import call_command
+from django.test import TestCase, Client, override_settings
 from django.urls import reverse
-from notes.models import Note
+from notes import factories, querylog
+from yanote import profiling, requestlog
 
 User = get_user_model()
 
@@ -17,11 +23,11 @@ class TestRoutes(TestCase):
         cls.auth_client.force_login(cls.user)
         cls.author_client = Client()
         cls.author_client.force_login(cls.author)
-        cls.note = Note.objects.create(
+        cls.note = factories.make_note(
+            cls.author,
             title='Заголовок',
             text='Текс записи',
             slug='slug1',
-            author=cls.author,
         )
 
     def test_redirect_for_anonymous_client(self):
@@ -83,3 +89,86 @@ class TestRoutes(TestCase):
                     url = reverse(name, args=args)
                     response = client.get(url)
                     self.assertEqual(response.status_code, status)
+
+
+class TestProfiling(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(username='пользователь')
+
+    def test_only_signed_requests_are_profiled(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        directory = Path(tmp.name)
+        self.client.force_login(self.user)
+        with override_settings(PROFILING_ENABLED=True,
+                               PROFILING_DIR=directory):
+            self.client.get(reverse('notes:list'), HTTP_X_PROFILE='unsigned')
+            self.assertFalse(list(directory.iterdir()))
+            self.client.get(reverse('notes:list'),
+                            HTTP_X_PROFILE=profiling.sign())
+        self.assertEqual({path.suffix for path in directory.iterdir()},
+                         {'.prof', '.txt', '.collapsed'})
+
+    def test_disabled_middleware_is_not_used(self):
+        with self.assertRaises(MiddlewareNotUsed):
+            profiling.ProfilingMiddleware(lambda request: None)
+
+
+class TestSlowQueryLog(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(username='пользователь')
+
+    def test_slow_queries_are_logged_with_view_and_plan(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.client.force_login(self.user)
+        with override_settings(SLOW_QUERY_MS=0,
+                               SLOW_QUERY_LOG=Path(tmp.name, 'slow.jsonl')):
+            querylog.install()
+            self.client.get(reverse('notes:list'))
+            records = [record for record in querylog.read_log()
+                       if '"notes_note"' in record['sql']]
+            out = StringIO()
+            call_command('slow_queries', stdout=out)
+        self.assertEqual(records[0]['view'], 'notes:list')
+        self.assertTrue(records[0]['plan'])
+        self.assertIn(records[0]['fingerprint'], out.getvalue())
+
+    def test_disabled_middleware_is_not_used(self):
+        with self.assertRaises(MiddlewareNotUsed):
+            querylog.QueryLogMiddleware(lambda request: None)
+
+
+class TestRequestLog(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create(username='автор')
+        cls.note = factories.make_note(cls.author, title='Заголовок',
+                                       text='Текст', slug='secret-slug')
+
+    def test_log_is_anonymized_and_planned_for_local_notes(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        path = Path(tmp.name, 'requests.jsonl')
+        self.client.force_login(self.author)
+        url = reverse('notes:edit', args=(self.note.slug,))
+        with override_settings(REQUEST_LOG_ENABLED=True, REQUEST_LOG_RATE=1,
+                               REQUEST_LOG_PATH=path):
+            self.client.post(url, {'title': 'Новый', 'text': 'Текст',
+                                   'slug': self.note.slug})
+            records = requestlog.read_log()
+        self.assertNotIn('secret', path.read_text())
+        self.assertEqual(records[0]['d'], {'title': 5, 'text': 5, 'slug': 11})
+        entries, skipped = requestlog.plan(
+            records, {'user': [self.author]},
+            {('notes:edit', 'slug'): lambda user: ['local-slug']}
+        )
+        self.assertFalse(skipped)
+        _, step, user, method, path, data = entries[0]
+        self.assertEqual((step, user, method, path),
+                         ('notes:edit', self.author, 'POST',
+                          reverse('notes:edit', args=('local-slug',))))
+        self.assertEqual(data['slug'], 'local-slug')
+        self.assertEqual(len(data['title']), 5)
@@ -11,5 +11,8 @@ urlpatterns = [
     path('note/<slug:slug>/', views.NoteDetail.as_view(), name='detail'),
     path('delete/<slug:slug>/', views.NoteDelete.as_view(), name='delete'),
     path('notes/', views.NotesList.as_view(), name='list'),
+    path('notes/delete/', views.NoteBulkDelete.as_view(),
+         name='bulk_delete'),
     path('done/', views.NoteSuccess.as_view(), name='success'),
+    path('api/sync/', views.NoteSync.as_view(), name='sync'),
 ]
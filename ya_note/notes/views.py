@@ -1,9 +1,17 @@
+import json
+
+from django.conf import settings
 from django.contrib.auth.mixins import LoginRequiredMixin
+from django.http import JsonResponse
 from django.urls import reverse_lazy
+from django.utils.cache import get_conditional_response, patch_cache_control
 from django.views import generic
 
-from .forms import NoteForm
-from .models import Note
+from yanote.templating import TemplateEngineMixin
+
+from . import sync
+from .forms import NoteBulkDeleteForm, NoteForm
+from .models import Note, delete_in_chunks
 
 
 class Home(generic.TemplateView):
@@ -23,7 +31,7 @@ class NoteBase(LoginRequiredMixin):
 
     def get_queryset(self):
         """Пользователь может работать только со своими заметками."""
-        return self.model.objects.filter(author=self.request.user)
+        return self.model.objects.for_author(self.request.user)
 
 
 class NoteCreate(NoteBase, generic.CreateView):
@@ -49,11 +57,69 @@ class NoteDelete(NoteBase, generic.DeleteView):
     template_name = 'notes/delete.html'
 
 
-class NotesList(NoteBase, generic.ListView):
+class NotesList(NoteBase, TemplateEngineMixin, generic.ListView):
     """Список всех заметок пользователя."""
     template_name = 'notes/list.html'
 
+    def get_context_data(self, **kwargs):
+        kwargs.setdefault('bulk_form', NoteBulkDeleteForm())
+        return super().get_context_data(**kwargs)
+
+
+class NoteBulkDelete(NoteBase, TemplateEngineMixin, generic.FormView):
+    """Удаление выбранных заметок или всех, подходящих под фильтр."""
+    template_name = 'notes/list.html'
+    form_class = NoteBulkDeleteForm
+    http_method_names = ['post']
+
+    def form_valid(self, form):
+        delete_in_chunks(
+            form.filter(self.get_queryset()),
+            settings.NOTE_BULK_DELETE_CHUNK,
+        )
+        return super().form_valid(form)
+
+    def form_invalid(self, form):
+        return self.render_to_response(self.get_context_data(
+            bulk_form=form, object_list=self.get_queryset()
+        ))
+
 
 class NoteDetail(NoteBase, generic.DetailView):
     """Заметка подробно."""
     template_name = 'notes/detail.html'
+
+
+class NoteSync(NoteBase, generic.View):
+    """
+    JSON API разностной синхронизации, см. notes/sync.py.
+
+    GET ?since=<курсор> отдаёт изменения после курсора и поддерживает
+    If-None-Match. POST {"notes": [{"slug", "title", "text"}],
+    "deleted": [slug]} применяет пачку изменений клиента.
+    """
+
+    def get(self, request):
+        notes = self.get_queryset()
+        since = request.GET.get('since')
+        etag = sync.etag(notes, request.user, since)
+        response = get_conditional_response(request, etag=etag)
+        if response is None:
+            try:
+                payload = sync.changes(notes, request.user, since)
+            except sync.BadCursor:
+                return JsonResponse({'error': 'Некорректный курсор.'},
+                                    status=400)
+            response = JsonResponse(payload)
+        response['ETag'] = etag
+        patch_cache_control(response, private=True, no_cache=True)
+        return response
+
+    def post(self, request):
+        try:
+            upserts, deletes = sync.parse_changes(json.loads(request.body))
+        except (AttributeError, ValueError):
+            return JsonResponse({'error': 'Некорректный запрос.'}, status=400)
+        return JsonResponse(
+            sync.apply(self.get_queryset(), request.user, upserts, deletes)
+        )
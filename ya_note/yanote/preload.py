@@ -0,0 +1,77 @@
+"""
+Прогрев процесса перед fork рабочих процессов.
+
+wsgi.py при WSGI_PRELOAD вызывает preload(): URLconf и представления
+импортируются, шаблоны адресов компилируются, кэши _meta моделей
+и каталог переводов заполняются, шаблоны компилируются (при
+TEMPLATE_WARMUP). Базы прогрев не касается: соединения не должны
+переживать fork. Сервер, загружающий приложение до fork (gunicorn
+--preload, loadtest --workers), отдаёт рабочим процессам уже прогретую
+память; gc.freeze() (PRELOAD_GC_FREEZE) убирает эти объекты из обходов
+сборщика мусора, и страницы не копируются в каждый процесс при записи.
+"""
+import gc
+
+from django.apps import apps
+from django.conf import settings
+from django.urls import URLResolver, get_resolver
+from django.utils import translation
+
+from yanote import templating
+
+# Ленивые свойства _meta, которые ORM читает на каждом запросе.
+META_PROPERTIES = (
+    'concrete_fields', 'related_objects', 'fields_map',
+    'db_returning_fields',
+)
+
+
+def warm_urls(resolver=None):
+    """Компилирует шаблоны адресов URLconf; возвращает их число."""
+    resolver = resolver or get_resolver()
+    count = 0
+    for pattern in resolver.url_patterns:
+        pattern.pattern.regex
+        if isinstance(pattern, URLResolver):
+            count += warm_urls(pattern)
+        else:
+            count += 1
+    # Таблицы reverse() всех уровней.
+    resolver.reverse_dict
+    return count
+
+
+def warm_models():
+    for model in apps.get_models():
+        model._meta.get_fields()
+        for name in META_PROPERTIES:
+            getattr(model._meta, name)
+    return len(apps.get_models())
+
+
+def warm_translations():
+    with translation.override(settings.LANGUAGE_CODE):
+        translation.gettext('')
+    return 1
+
+
+def warm_up():
+    """Прогрев без обращений к базе; возвращает {что: сколько}."""
+    counts = {
+        'urls': warm_urls(),
+        'models': warm_models(),
+        'translations': warm_translations(),
+    }
+    if settings.TEMPLATE_WARMUP:
+        counts['templates'] = templating.warm_up()
+    return counts
+
+
+def preload():
+    """warm_up() и заморозка прогретой кучи для сборщика мусора."""
+    counts = warm_up()
+    if settings.PRELOAD_GC_FREEZE:
+        gc.collect()
+        gc.freeze()
+        counts['frozen'] = gc.get_freeze_count()
+    return counts
@@ -0,0 +1,127 @@
+"""
+Профилирование отдельных запросов.
+
+ProfilingMiddleware включается настройкой PROFILING_ENABLED; при False
+Django исключает её из цепочки (MiddlewareNotUsed), и запросы ничего
+не платят. Профилируется случайная доля запросов PROFILING_RATE и любой
+запрос с заголовком PROFILING_HEADER, содержащим значение из sign():
+
+    python manage.py shell -c \
+        "from yanote.profiling import sign; print(sign())"
+
+Для каждого такого запроса в PROFILING_DIR пишутся три файла:
+<имя>.prof — дамп cProfile для pstats/snakeviz, <имя>.txt — самые дорогие
+функции и <имя>.collapsed — стеки сэмплирующего профайлера в формате
+flamegraph.pl / speedscope.
+"""
+import cProfile
+import io
+import os
+import pstats
+import random
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from pathlib import Path
+
+from django.conf import settings
+from django.core import signing
+from django.core.exceptions import MiddlewareNotUsed
+
+SALT = 'profiling'
+
+
+def sign():
+    """Значение заголовка, включающего профилирование запроса."""
+    return signing.dumps('profile', salt=SALT)
+
+
+def is_signed(value):
+    try:
+        return signing.loads(
+            value, salt=SALT, max_age=settings.PROFILING_HEADER_MAX_AGE
+        ) == 'profile'
+    except signing.BadSignature:
+        return False
+
+
+class Sampler(threading.Thread):
+    """Снимает стек потока запроса каждые `interval` секунд."""
+
+    def __init__(self, thread_id, interval):
+        super().__init__(daemon=True)
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self._done = threading.Event()
+
+    def run(self):
+        while not self._done.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f'{code.co_name} '
+                             f'({code.co_filename}:{code.co_firstlineno})')
+                frame = frame.f_back
+            if stack:
+                self.stacks[';'.join(reversed(stack))] += 1
+
+    def stop(self):
+        self._done.set()
+        self.join()
+
+    def collapsed(self):
+        return ''.join(
+            f'{stack} {count}\n' for stack, count in self.stacks.items()
+        )
+
+
+class ProfilingMiddleware:
+
+    def __init__(self, get_response):
+        if not settings.PROFILING_ENABLED:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.directory = Path(settings.PROFILING_DIR)
+
+    def __call__(self, request):
+        if not self.should_profile(request):
+            return self.get_response(request)
+        profiler = cProfile.Profile()
+        sampler = Sampler(threading.get_ident(), settings.PROFILING_INTERVAL)
+        started = time.perf_counter()
+        sampler.start()
+        try:
+            response = profiler.runcall(self.get_response, request)
+        finally:
+            sampler.stop()
+        self.dump(request, time.perf_counter() - started, profiler, sampler)
+        return response
+
+    def should_profile(self, request):
+        value = request.headers.get(settings.PROFILING_HEADER)
+        if value:
+            return is_signed(value)
+        return random.random() < settings.PROFILING_RATE
+
+    def dump(self, request, duration, profiler, sampler):
+        match = request.resolver_match
+        view = match.view_name if match else 'unresolved'
+        name = (f'{time.strftime("%Y%m%d-%H%M%S")}-{view.replace(":", "-")}-'
+                f'{os.getpid()}-{uuid.uuid4().hex[:8]}')
+        self.directory.mkdir(parents=True, exist_ok=True)
+        base = self.directory / name
+        profiler.dump_stats(f'{base}.prof')
+        Path(f'{base}.collapsed').write_text(sampler.collapsed())
+        summary = io.StringIO()
+        summary.write(
+            f'{request.method} {request.get_full_path()} ({view}) '
+            f'{duration * 1000:.1f} ms\n'
+        )
+        pstats.Stats(profiler, stream=summary).sort_stats(
+            'cumulative'
+        ).print_stats(settings.PROFILING_TOP)
+        Path(f'{base}.txt').write_text(summary.getvalue())
@@ -0,0 +1,255 @@
+"""
+Журнал запросов для воспроизведения нагрузки.
+
+RequestLogMiddleware пишет случайную долю REQUEST_LOG_RATE запросов
+в REQUEST_LOG_PATH — JSON Lines, по строке на запрос:
+
+    {"t": начало (unix-время), "m": метод, "v": имя URL,
+     "k": аргументы URL, "q": параметры GET, "d": длины полей POST,
+     "u": класс пользователя, "i": токен пользователя,
+     "s": статус, "ms": время ответа, "kb": пик памяти, если замерен}
+
+Журнал обезличен: значения аргументов и параметров, кроме
+REQUEST_LOG_PLAIN, и id пользователя заменены токенами HMAC «#…»,
+а от полей формы остаются только длины. Одинаковые значения дают
+одинаковые токены, поэтому при воспроизведении (команда
+replay_requests) повторные обращения к одному объекту остаются
+повторными. REQUEST_LOG_ENABLED = False исключает middleware из цепочки.
+"""
+import itertools
+import json
+import random
+import threading
+import time
+from collections import Counter, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.urls import NoReverseMatch, reverse
+from django.utils.crypto import salted_hmac
+
+SALT = 'requestlog'
+SKIPPED_FIELDS = {'csrfmiddlewaretoken'}
+_lock = threading.Lock()
+
+
+def token(name, value):
+    """Имя входит в HMAC: pk заметки и id пользователя не совпадут."""
+    return '#' + salted_hmac(SALT, f'{name}={value}').hexdigest()[:10]
+
+
+def anonymize(params):
+    return {
+        name: value if name in settings.REQUEST_LOG_PLAIN
+        else token(name, value)
+        for name, value in params.items()
+    }
+
+
+def user_class(user):
+    if not user.is_authenticated:
+        return 'anonymous'
+    return 'staff' if user.is_staff else 'user'
+
+
+def make_record(request, started, duration, status):
+    record = {
+        't': round(started, 3),
+        'm': request.method,
+        'v': request.resolver_match.view_name,
+        'k': anonymize(request.resolver_match.kwargs),
+        'q': anonymize(request.GET.dict()),
+        'd': {
+            name: len(value) for name, value in request.POST.dict().items()
+            if name not in SKIPPED_FIELDS
+        },
+        'u': user_class(request.user),
+        's': status,
+        'ms': round(duration * 1000, 3),
+    }
+    if request.user.is_authenticated:
+        record['i'] = token('user', request.user.pk)
+    # Пик памяти от MemoryMiddleware, если запрос замерялся.
+    if hasattr(request, 'memory'):
+        record['kb'] = request.memory['peak'] // 1024
+    return record
+
+
+def write(records, path=None):
+    path = Path(path or settings.REQUEST_LOG_PATH)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    lines = ''.join(
+        json.dumps(record, ensure_ascii=False, separators=(',', ':')) + '\n'
+        for record in records
+    )
+    with _lock, path.open('a', encoding='utf-8') as log:
+        log.write(lines)
+
+
+def read_log(path=None):
+    path = Path(path or settings.REQUEST_LOG_PATH)
+    with path.open(encoding='utf-8') as log:
+        return sorted((json.loads(line) for line in log),
+                      key=lambda record: record['t'])
+
+
+class RequestLogMiddleware:
+
+    def __init__(self, get_response):
+        if not settings.REQUEST_LOG_ENABLED:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if random.random() >= settings.REQUEST_LOG_RATE:
+            return self.get_response(request)
+        started, wall = time.perf_counter(), time.time()
+        response = self.get_response(request)
+        duration = time.perf_counter() - started
+        # Ненайденные адреса не воспроизвести: у них нет имени URL.
+        if getattr(request, 'resolver_match', None) is not None:
+            write([make_record(request, wall, duration,
+                               response.status_code)])
+        return response
+
+
+def pick(value, candidates):
+    """Кандидат для токена: один токен — всегда один и тот же объект."""
+    if not candidates:
+        return None
+    return candidates[int(value[1:], 16) % len(candidates)]
+
+
+def filler(name, length, counter):
+    if name == 'slug':
+        return f'replay-{next(counter)}'
+    return ('Текст ' * (length // 6 + 1))[:max(length, 1)]
+
+
+def is_token(value):
+    return isinstance(value, str) and value.startswith('#')
+
+
+def resolve_kwargs(record, user, resolvers):
+    """Аргументы URL локальной базы или None, если их не подобрать."""
+    kwargs = {}
+    for name, value in record['k'].items():
+        if is_token(value):
+            resolver = resolvers.get((record['v'], name))
+            value = pick(value, resolver(user)) if resolver else None
+            if value is None:
+                return None
+        kwargs[name] = value
+    return kwargs
+
+
+def plan(records, users, resolvers):
+    """
+    Записи журнала -> (запросы для replay(), пропущенные по имени URL).
+
+    users — {класс пользователя: [пользователи]}; resolvers —
+    {(имя URL, аргумент): функция(пользователь) -> [значения]}: токен
+    аргумента заменяется одним из значений локальной базы.
+    """
+    counter = itertools.count()
+    start = records[0]['t'] if records else 0
+    entries, skipped = [], Counter()
+    for record in records:
+        user = None
+        if record['u'] != 'anonymous':
+            user = pick(record['i'], users.get(record['u']) or users['user'])
+        kwargs = resolve_kwargs(record, user, resolvers)
+        try:
+            if kwargs is None or record['m'] not in ('GET', 'POST'):
+                raise NoReverseMatch
+            path = reverse(record['v'], kwargs=kwargs)
+        except NoReverseMatch:
+            skipped[record['v']] += 1
+            continue
+        query = {
+            name: value for name, value in record['q'].items()
+            if not is_token(value)
+        }
+        if query:
+            path += '?' + urlencode(query)
+        # Поле с именем аргумента URL (slug при правке) — тот же объект.
+        data = {
+            name: kwargs[name] if name in kwargs
+            else filler(name, length, counter)
+            for name, length in record['d'].items()
+        }
+        entries.append((record['t'] - start, record['v'], user,
+                        record['m'], path, data))
+    return entries, skipped
+
+
+def recorded(records):
+    """Задержки из самого журнала — в том же виде, что отчёт replay()."""
+    from yanote import loadtest
+
+    samples = defaultdict(list)
+    for record in records:
+        samples[record['v']].append((record['ms'] / 1000, record['s'] < 400))
+    elapsed = records[-1]['t'] - records[0]['t'] if records else 0
+    return {
+        step: loadtest.summarize(step_samples, elapsed)
+        for step, step_samples in sorted(samples.items())
+    }
+
+
+def compare(report, baseline):
+    """Изменение процентилей по шагам относительно прошлого отчёта."""
+    changes = {}
+    for step, summary in report['steps'].items():
+        old = baseline.get('steps', {}).get(step)
+        if not old:
+            continue
+        changes[step] = {
+            name: f'{(value / old["latency_ms"][name] - 1) * 100:+.1f}%'
+            for name, value in summary['latency_ms'].items()
+            if value is not None and old['latency_ms'].get(name)
+        }
+    return changes
+
+
+def replay(entries, speed=1.0, concurrency=8):
+    """
+    Воспроизводит [(смещение в секундах, шаг, пользователь, метод,
+    путь, данные)] в том же процессе; speed=2 — вдвое быстрее записи,
+    speed=0 — без пауз. Возвращает отчёт как loadtest.run().
+    """
+    # Не на уровне модуля: middleware импортируется каждым рабочим
+    # процессом, а loadtest тянет django.test и multiprocessing.
+    from yanote import loadtest
+
+    samples = defaultdict(list)
+    local = threading.local()
+
+    def send(step, user, method, path, data):
+        sessions = local.__dict__.setdefault('sessions', {})
+        key = getattr(user, 'pk', None)
+        if key not in sessions:
+            sessions[key] = loadtest.ClientSession(samples, user)
+        sessions[key].measure(step, method, path, data)
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(concurrency) as pool:
+        for offset, *request in entries:
+            if speed:
+                delay = offset / speed - (time.perf_counter() - started)
+                if delay > 0:
+                    time.sleep(delay)
+            pool.submit(send, *request)
+    elapsed = time.perf_counter() - started
+    report = {'speed': speed, 'duration': round(elapsed, 3)}
+    report.update(loadtest.summarize(
+        [sample for step in samples.values() for sample in step], elapsed
+    ))
+    report['steps'] = {
+        step: loadtest.summarize(step_samples, elapsed)
+        for step, step_samples in sorted(samples.items())
+    }
+    return report
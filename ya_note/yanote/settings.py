@@ -22,23 +22,38 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'yanote.profiling.ProfilingMiddleware',
+    'yanote.requestlog.RequestLogMiddleware',
+    'yanote.memory.MemoryMiddleware',
+    'notes.querylog.QueryLogMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'yanote.ratelimit.RateLimitMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
 ROOT_URLCONF = 'yanote.urls'
 
+# Шаблоны компилируются один раз на процесс и прогреваются в wsgi.py,
+# см. yanote/templating.py.
+TEMPLATE_LOADERS = [
+    'django.template.loaders.filesystem.Loader',
+    'django.template.loaders.app_directories.Loader',
+]
+
 TEMPLATES = [
     {
         'BACKEND': 'django.template.backends.django.DjangoTemplates',
         'DIRS': [BASE_DIR / 'templates'],
-        'APP_DIRS': True,
+        'APP_DIRS': False,
         'OPTIONS': {
+            'loaders': [
+                ('django.template.loaders.cached.Loader', TEMPLATE_LOADERS),
+            ],
             'context_processors': [
                 'django.template.context_processors.debug',
                 'django.template.context_processors.request',
@@ -49,6 +64,35 @@ TEMPLATES = [
     },
 ]
 
+# Необязательный Jinja2: шаблоны с именами из JINJA2_TEMPLATES берутся
+# из каталога jinja2/ (при установленном пакете jinja2).
+JINJA2_TEMPLATES = ()
+JINJA2_BYTECODE_CACHE = BASE_DIR / '.jinja2_cache'
+try:
+    from jinja2 import Environment  # noqa: F401
+except ImportError:
+    # Без пакета каталог шаблонов jinja2/ виден как пустой
+    # namespace-пакет, поэтому проверяется импорт, а не find_spec.
+    JINJA2_INSTALLED = False
+else:
+    JINJA2_INSTALLED = True
+if JINJA2_INSTALLED:
+    TEMPLATES.append({
+        'BACKEND': 'django.template.backends.jinja2.Jinja2',
+        'DIRS': [BASE_DIR / 'jinja2'],
+        'APP_DIRS': False,
+        'OPTIONS': {
+            'environment': 'yanote.jinja2.environment',
+            'auto_reload': DEBUG,
+            'context_processors': [
+                'django.template.context_processors.request',
+                'django.contrib.auth.context_processors.auth',
+            ],
+        },
+    })
+
+TEMPLATE_WARMUP = True
+
 WSGI_APPLICATION = 'yanote.wsgi.application'
 
 
@@ -56,9 +100,108 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
-    }
+    },
+    # Шарды заметок, см. notes/sharding.py. Файл базы создаётся только
+    # при первом обращении, неиспользуемый шард ничего не стоит.
+    'notes_1': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': BASE_DIR / 'notes_1.sqlite3',
+    },
+    'notes_2': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': BASE_DIR / 'notes_2.sqlite3',
+    },
 }
 
+DATABASE_ROUTERS = ['notes.sharding.NoteShardRouter']
+
+# Базы, по которым раскладываются заметки. После изменения выполните
+# python manage.py rebalance_notes.
+NOTE_SHARDS = ('default',)
+
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    # Общий для всех рабочих процессов: сброс сессии или пользователя
+    # в одном процессе виден остальным.
+    'shared': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': BASE_DIR / 'run' / 'cache',
+    },
+}
+
+# Сессия и пользователь читаются из кэша, а не из БД на каждом запросе.
+# Для хранения сессий только в БД укажите
+# 'django.contrib.sessions.backends.db' и 'django.contrib.auth.backends.ModelBackend'.
+SESSION_ENGINE = 'django.contrib.sessions.backends.cached_db'
+SESSION_CACHE_ALIAS = 'shared'
+
+AUTHENTICATION_BACKENDS = ['notes.backends.CachedModelBackend']
+
+USER_CACHE_ALIAS = 'shared'
+USER_CACHE_TIMEOUT = 60 * 5
+
+# Массовое удаление заметок идёт пачками, каждая — отдельной транзакцией,
+# чтобы не держать блокировку записи на всё удаление.
+NOTE_BULK_DELETE_CHUNK = 500
+
+# Сжатие длинных текстов заметок, см. notes/fields.py: порог в байтах,
+# например 4096. None выключает сжатие. Сжатие замедляет чтение и запись,
+# а поиск по подстроке в тексте заметок не поддерживается.
+COMPRESSED_TEXT_THRESHOLD = None
+
+# Профилирование запросов, см. yanote/profiling.py. Выключенная
+# middleware не участвует в обработке запросов.
+PROFILING_ENABLED = False
+PROFILING_RATE = 0.0
+PROFILING_HEADER = 'X-Profile'
+PROFILING_HEADER_MAX_AGE = 60 * 60
+PROFILING_INTERVAL = 0.005
+PROFILING_TOP = 30
+PROFILING_DIR = BASE_DIR / 'profiles'
+
+# Замер памяти запросов через tracemalloc, см. yanote/memory.py: пик
+# попадает в Server-Timing и журнал запросов. Выключенная middleware
+# не участвует в обработке запросов.
+MEMORY_TRACKING_ENABLED = False
+MEMORY_TRACKING_RATE = 1.0
+
+# Прогрев процесса в wsgi.py до fork рабочих процессов, см.
+# yanote/preload.py: URLconf, метаданные моделей, переводы и шаблоны
+# (TEMPLATE_WARMUP), затем gc.freeze() для прогретых объектов. Включается
+# только для серверов, загружающих приложение до fork (gunicorn --preload):
+# без fork прогрев лишь удлиняет старт каждого процесса.
+WSGI_PRELOAD = False
+PRELOAD_GC_FREEZE = True
+
+# Журнал медленных запросов, см. notes/querylog.py и команду slow_queries.
+# None (по умолчанию) выключает журнал; порог в мс, например 200,
+# включает его при запуске процесса.
+SLOW_QUERY_MS = None
+SLOW_QUERY_LOG = BASE_DIR / 'slow_queries.jsonl'
+
+# Обезличенный журнал запросов для команды replay_requests,
+# см. yanote/requestlog.py. Значения аргументов и параметров из
+# REQUEST_LOG_PLAIN пишутся как есть, остальные — токенами.
+REQUEST_LOG_ENABLED = False
+REQUEST_LOG_RATE = 0.1
+REQUEST_LOG_PATH = BASE_DIR / 'request_log.jsonl'
+REQUEST_LOG_PLAIN = ('page',)
+
+# Синхронизация заметок, см. notes/sync.py.
+NOTE_SYNC_PAGE_SIZE = 500
+# Сколько секунд до ответа изменения отдаются повторно: дольше самой
+# длинной транзакции записи (timeout ожидания блокировки SQLite — 5 с).
+NOTE_SYNC_OVERLAP_SECONDS = 10
+NOTE_TOMBSTONE_TTL_DAYS = 30
+
+TEST_RUNNER = 'yanote.testdb.SnapshotDiscoverRunner'
+
+# Снимки схемы тестовой БД, см. yanote/testdb.py.
+TEST_DB_CACHE_DIR = BASE_DIR / '.test_db_cache'
+
 
 AUTH_PASSWORD_VALIDATORS = [
     {
@@ -87,3 +230,15 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 LOGIN_URL = reverse_lazy('users:login')
 LOGIN_REDIRECT_URL = reverse_lazy('notes:home')
+
+# Ограничение частоты записей, см. yanote/ratelimit.py:
+# {имя URL: (запросов, секунд)} на пользователя или IP анонима.
+RATE_LIMITS = {
+    'notes:add': (20, 60),
+    'notes:edit': (30, 60),
+    'notes:delete': (30, 60),
+    'notes:bulk_delete': (10, 60),
+    'notes:sync': (30, 60),
+}
+RATE_LIMIT_PATH = BASE_DIR / 'run' / 'ratelimit.bin'
+RATE_LIMIT_SLOTS = 1 << 14
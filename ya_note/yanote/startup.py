@@ -0,0 +1,78 @@
+"""
+Замер холодного старта.
+
+Каждый этап `runs` раз запускается в новом интерпретаторе из BASE_DIR:
+python — пустой интерпретатор, setup — django.setup(), wsgi — импорт
+yanote.wsgi (с прогревом при WSGI_PRELOAD), command — manage.py
+check. Ещё один запуск этапа wsgi с -X importtime показывает, на что
+уходит время импорта: собственное время модулей по пакетам верхнего
+уровня и самые медленные модули.
+"""
+import statistics
+import subprocess
+import sys
+import time
+from collections import Counter
+
+from django.conf import settings
+
+STAGES = {
+    'python': ['-c', 'pass'],
+    'setup': ['-c', 'import django; django.setup()'],
+    'wsgi': ['-c', 'import yanote.wsgi'],
+    'command': ['manage.py', 'check'],
+}
+IMPORTTIME_PREFIX = 'import time:'
+
+
+def parse_importtime(output):
+    """[(модуль, собственное время в мкс)] из вывода -X importtime."""
+    modules = []
+    for line in output.splitlines():
+        if not line.startswith(IMPORTTIME_PREFIX) or 'self [us]' in line:
+            continue
+        own, _, name = line[len(IMPORTTIME_PREFIX):].split('|')
+        modules.append((name.strip(), int(own)))
+    return modules
+
+
+def start(arguments, importtime=False):
+    """Время запуска в секундах и вывод stderr; ошибка — CalledProcessError."""
+    options = ['-X', 'importtime'] if importtime else []
+    started = time.perf_counter()
+    result = subprocess.run(
+        [sys.executable, *options, *arguments], cwd=settings.BASE_DIR,
+        capture_output=True, text=True, check=True,
+    )
+    return time.perf_counter() - started, result.stderr
+
+
+def breakdown(modules, top):
+    packages = Counter()
+    for name, own in modules:
+        packages[name.split('.')[0]] += own
+    slowest = sorted(modules, key=lambda module: module[1], reverse=True)
+    return {
+        'modules': len(modules),
+        'packages_ms': {
+            name: round(own / 1000, 1)
+            for name, own in packages.most_common(top)
+        },
+        'slowest_ms': {
+            name: round(own / 1000, 1) for name, own in slowest[:top]
+        },
+    }
+
+
+def run(runs=5, top=10):
+    """Отчёт: медиана и минимум времени этапов, разбор импортов wsgi."""
+    report = {'runs': runs, 'stages': {}}
+    for stage, arguments in STAGES.items():
+        timings = [start(arguments)[0] * 1000 for _ in range(runs)]
+        report['stages'][stage] = {
+            'median_ms': round(statistics.median(timings), 1),
+            'min_ms': round(min(timings), 1),
+        }
+    _, output = start(STAGES['wsgi'], importtime=True)
+    report['imports'] = breakdown(parse_importtime(output), top)
+    return report
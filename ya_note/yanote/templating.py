@@ -0,0 +1,43 @@
+"""
+Загрузка шаблонов.
+
+Шаблоны Django компилируются один раз на процесс (cached.Loader, см.
+TEMPLATES); runserver сбрасывает этот кэш при правке шаблона. warm_up()
+вызывается из preload() в wsgi.py и компилирует шаблоны заранее, чтобы
+первый запрос к странице не платил за разбор.
+
+Шаблоны из JINJA2_TEMPLATES представления с TemplateEngineMixin
+рендерят движком Jinja2 из каталога jinja2/, если он установлен.
+"""
+from pathlib import Path
+
+from django.conf import settings
+from django.template import engines
+
+
+def template_names(directory):
+    root = Path(directory)
+    return sorted(
+        path.relative_to(root).as_posix() for path in root.rglob('*.html')
+    )
+
+
+def warm_up():
+    """Компилирует шаблоны из DIRS всех движков; возвращает их число."""
+    count = 0
+    for engine in engines.all():
+        for directory in engine.template_dirs:
+            for name in template_names(directory):
+                engine.get_template(name)
+                count += 1
+    return count
+
+
+class TemplateEngineMixin:
+    """Выбор движка по имени шаблона представления."""
+
+    @property
+    def template_engine(self):
+        if self.template_name in settings.JINJA2_TEMPLATES:
+            return 'jinja2'
+        return None